@@ -1,76 +1,156 @@
-from flask import Flask
+from flask import Flask, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS
+from flask_marshmallow import Marshmallow # Import Marshmallow
+from marshmallow.exceptions import ValidationError
+from flask_swagger_ui import get_swaggerui_blueprint
+from services.json_provider import create_json_provider, JSON_PROVIDER
+import importlib
 import os
 
-# Initialize Flask app
-app = Flask(__name__)
-
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
-# Configure database
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-from flask_marshmallow import Marshmallow # Import Marshmallow
-
-# Initialize extensions
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-CORS(app)
-ma = Marshmallow(app) # Initialize Marshmallow
-
-# Import models to ensure they are registered with SQLAlchemy
-# This needs to come after db initialization.
-from models import models
+# Initialize extensions. They are bound to each app in create_app(), so models, schemas, routes and
+# services keep importing them from here (from app import db) whichever app variant is running.
+db = SQLAlchemy()
+migrate = Migrate()
+cors = CORS()
+ma = Marshmallow()
+
+# Blueprints by name: (module, blueprint attribute, URL prefix). A module is only imported when its
+# blueprint is registered, so e.g. an API-only worker never loads routes.ai and the Gemini services.
+BLUEPRINTS = {
+    "researchers": ("routes.researchers", "researcher_bp", "/api/researchers"),
+    "labs": ("routes.labs", "lab_bp", "/api/labs"),
+    "projects": ("routes.projects", "project_bp", "/api/projects"),
+    "compute-resources": ("routes.compute_resources", "compute_resource_bp", "/api/compute-resources"),
+    "grants": ("routes.grants", "grant_bp", "/api/grants"),
+    "search": ("routes.search", "search_bp", "/api/search"),
+    "data": ("routes.data", "data_bp", "/api/data"),
+    "ai": ("routes.ai", "ai_bp", "/api/ai"),
+    "docs": None, # Swagger UI, built by _swagger_ui_blueprint()
+}
+
+# Named sets of blueprints for specialized worker pools; BLUEPRINTS accepts these and single names
+BLUEPRINT_GROUPS = {
+    "api": ["researchers", "labs", "projects", "compute-resources", "grants", "search", "docs"],
+    "ai": ["ai"],
+    "export": ["data"], # Import/export and change feed
+    "all": list(BLUEPRINTS),
+}
 
-# Register Blueprints
-from routes.researchers import researcher_bp
-app.register_blueprint(researcher_bp, url_prefix='/api/researchers')
+# Swagger UI Configuration
+SWAGGER_URL = '/api/docs'  # URL for exposing Swagger UI (without trailing slash)
+API_URL = '/static/swagger.json'  # URL for your Swagger JSON spec (relative to static folder)
 
-from routes.labs import lab_bp
-app.register_blueprint(lab_bp, url_prefix='/api/labs')
 
-from routes.projects import project_bp
-app.register_blueprint(project_bp, url_prefix='/api/projects')
+def create_app(config=None):
+    """
+    Builds and configures a Flask app.
+    Args:
+        config (dict or object, optional): Settings applied over the defaults, which come from the environment
+            (DATABASE_URL, APP_BLUEPRINTS, JSON_PROVIDER). A dict is applied with config.update, anything else
+            (an object or import path) with config.from_object. BLUEPRINTS selects what the app serves:
+            a list or comma-separated string of blueprint names (see BLUEPRINTS) and groups
+            (see BLUEPRINT_GROUPS), e.g. "api", "ai,export" or "all" (the default).
+    Returns:
+        Flask: The new app. Apps are independent, so several can exist in one process (tests, benchmarks).
+    Raises ValueError for an unknown blueprint name.
+    """
+    app = Flask(__name__)
+
+    # Configure database
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['BLUEPRINTS'] = os.environ.get('APP_BLUEPRINTS', 'all')
+    app.config['JSON_PROVIDER'] = JSON_PROVIDER # "orjson" or "stdlib", see services/json_provider.py
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    # Used by jsonify, request.get_json and the NDJSON export
+    app.json = create_json_provider(app, app.config['JSON_PROVIDER'])
+
+    db.init_app(app)
+    migrate.init_app(app, db)
+    cors.init_app(app)
+    ma.init_app(app) # Initialize Marshmallow
+
+    # Import models to ensure they are registered with SQLAlchemy.
+    # Every variant registers the session listeners that keep the search index and the AI search context
+    # version (data_version table) current (models, services.context_snapshot): writes made through an
+    # API-only worker must still be seen by the AI workers.
+    from models import models
+    from services import context_snapshot
+
+    # Register Blueprints
+    for name in resolve_blueprints(app.config['BLUEPRINTS']):
+        if name == "docs":
+            app.register_blueprint(_swagger_ui_blueprint()) # url_prefix is SWAGGER_URL by default
+            continue
+        module_name, attribute, url_prefix = BLUEPRINTS[name]
+        app.register_blueprint(getattr(importlib.import_module(module_name), attribute), url_prefix=url_prefix)
+
+    # Error Handler for Marshmallow ValidationErrors
+    app.register_error_handler(ValidationError, handle_marshmallow_validation)
+    return app
+
+
+def resolve_blueprints(selection) -> list[str]:
+    """Expands a list or comma-separated string of blueprint and group names into blueprint names, in order."""
+    if isinstance(selection, str):
+        selection = selection.split(",")
+    names = []
+    for entry in selection:
+        entry = entry.strip()
+        if not entry:
+            continue
+        if entry in BLUEPRINT_GROUPS:
+            expanded = BLUEPRINT_GROUPS[entry]
+        elif entry in BLUEPRINTS:
+            expanded = [entry]
+        else:
+            raise ValueError(f"Unknown blueprint or group '{entry}'. Choose from: {', '.join(dict.fromkeys(list(BLUEPRINT_GROUPS) + list(BLUEPRINTS)))}")
+        names.extend(name for name in expanded if name not in names)
+    return names
+
+
+def _swagger_ui_blueprint():
+    return get_swaggerui_blueprint(
+        SWAGGER_URL,
+        API_URL,
+        config={
+            'app_name': "UCR Research Computing Dashboard API",
+            'layout': "BaseLayout", # Other options: "StandaloneLayout"
+            'docExpansion': "list", # Options: "none", "list", "full"
+            'persistAuthorization': True,
+        }
+    )
 
-from routes.compute_resources import compute_resource_bp
-app.register_blueprint(compute_resource_bp, url_prefix='/api/compute-resources')
 
-from routes.grants import grant_bp
-app.register_blueprint(grant_bp, url_prefix='/api/grants')
+def handle_marshmallow_validation(err):
+    return jsonify(err.messages), 400
 
-from routes.data import data_bp
-app.register_blueprint(data_bp, url_prefix='/api/data')
 
-from routes.ai import ai_bp
-app.register_blueprint(ai_bp, url_prefix='/api/ai')
+# `app` (what gunicorn app:app and flask run load) is the default app, created on first access rather
+# than on import, so importing this module for db / ma or create_app() doesn't build it.
+# APP_BLUEPRINTS selects its blueprints, e.g. APP_BLUEPRINTS=ai gunicorn app:app for an AI-only pool.
+_default_app = None
 
-# Swagger UI Configuration
-from flask_swagger_ui import get_swaggerui_blueprint
-SWAGGER_URL = '/api/docs'  # URL for exposing Swagger UI (without trailing slash)
-API_URL = '/static/swagger.json'  # URL for your Swagger JSON spec (relative to static folder)
+def __getattr__(name):
+    global _default_app
+    if name == "app":
+        if _default_app is None:
+            _default_app = create_app()
+        return _default_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-swaggerui_blueprint = get_swaggerui_blueprint(
-    SWAGGER_URL,
-    API_URL,
-    config={
-        'app_name': "UCR Research Computing Dashboard API",
-        'layout': "BaseLayout", # Other options: "StandaloneLayout"
-        'docExpansion': "list", # Options: "none", "list", "full"
-        'persistAuthorization': True,
-    }
-)
-app.register_blueprint(swaggerui_blueprint) # Register with app, url_prefix is SWAGGER_URL by default
-
-# Error Handler for Marshmallow ValidationErrors
-from marshmallow.exceptions import ValidationError
-@app.errorhandler(ValidationError)
-def handle_marshmallow_validation(err):
-    return jsonify(err.messages), 400
 
 if __name__ == '__main__':
-    app.run()
+    # Import through the module name so routes and models share this module's extensions
+    from app import create_app as create_default_app
+    create_default_app().run()
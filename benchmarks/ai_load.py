@@ -0,0 +1,188 @@
+"""
+Load benchmark for the /api/ai/* endpoints, runnable offline.
+
+By default the app runs in-process against a seeded temporary SQLite database, with the local fake
+model (GEMINI_MODEL_BACKEND=fake, see services/model_backends.py) answering after --latency seconds.
+Every endpoint is driven at each --concurrency level, and the script reports p50/p95/p99 latency
+and throughput per endpoint and level.
+
+    python benchmarks/ai_load.py
+    python benchmarks/ai_load.py --concurrency 1,8,32 --requests 400 --latency 0.5 --jitter 0.2
+    python benchmarks/ai_load.py --distinct 10 --cache memory   # repeated prompts: cache and coalescing
+    python benchmarks/ai_load.py --url http://localhost:5000    # a running server (start it with the fake backend)
+
+GEMINI_* settings (GEMINI_MAX_CONCURRENCY, GEMINI_CALL_TIMEOUT, ...) are read from the environment as usual.
+The rate limiter is off unless GEMINI_RATE_LIMIT_PER_MINUTE is set, so it doesn't dominate the numbers.
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import tempfile
+import threading
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ENDPOINTS = ("summarize-text", "analyze-notes", "global-search", "search-external-grants", "match-researchers", "generate-grant-email")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,16,32", help="Comma-separated concurrent client counts")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Comma-separated endpoints under /api/ai/")
+    parser.add_argument("--distinct", type=int, default=0, help="Distinct payloads per endpoint (0: every request differs)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake model latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra fake model latency, up to this many seconds")
+    parser.add_argument("--cache", default="none", choices=("none", "memory", "sqlite"), help="GEMINI_CACHE_BACKEND")
+    parser.add_argument("--researchers", type=int, default=200, help="Researchers (and as many projects, grants and notes) to seed")
+    parser.add_argument("--stream", action="store_true", help="Request SSE for the endpoints that support it")
+    parser.add_argument("--url", help="Benchmark a running server instead of an in-process app")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file as JSON")
+    return parser.parse_args()
+
+
+# --- Clients ---
+class InProcessClient:
+    """Flask test client per thread against an in-process app."""
+    def __init__(self, flask_app):
+        self.app = flask_app
+        self._local = threading.local()
+
+    def post(self, path, payload, headers):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.post(path, json=payload, headers=headers)
+        response.get_data() # Drain streamed responses
+        return response.status_code
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def post(self, path, payload, headers):
+        request = urllib.request.Request(self.base_url + path, data=json.dumps(payload).encode("utf-8"), method="POST",
+                                         headers={"Content-Type": "application/json", **headers})
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def first_researcher_id(self):
+        with urllib.request.urlopen(self.base_url + "/api/researchers?limit=1", timeout=30) as response:
+            return json.loads(response.read())["researchers"][0]["id"]
+
+
+def setup_in_process(args):
+    """Configures the environment, creates an AI-only app and seeds a temporary database."""
+    workdir = tempfile.mkdtemp(prefix="ai_load_")
+    os.environ.update(
+        GEMINI_MODEL_BACKEND="fake",
+        FAKE_MODEL_LATENCY=str(args.latency),
+        FAKE_MODEL_JITTER=str(args.jitter),
+        GEMINI_CACHE_BACKEND=args.cache,
+        GEMINI_CACHE_PATH=os.path.join(workdir, "cache.sqlite3"),
+        CONTEXT_SNAPSHOT_DIR=os.path.join(workdir, "snapshot"),
+    )
+    os.environ.setdefault("GEMINI_RATE_LIMIT_PER_MINUTE", "0")
+
+    from app import create_app, db
+    from benchmarks.fixtures import seed_database
+
+    # An app with only the AI blueprint, on its own database
+    flask_app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(workdir, "bench.db"), "BLUEPRINTS": "ai"})
+    with flask_app.app_context():
+        db.create_all()
+        pi_id = seed_database(args.researchers)[0]
+    return InProcessClient(flask_app), pi_id
+
+
+# --- Payloads ---
+def make_payload(endpoint, k, pi_id):
+    if endpoint == "summarize-text":
+        return {"text": f"Report {k}. The cluster ran {k} jobs this week. Utilization was steady and no outages occurred."}
+    if endpoint == "analyze-notes":
+        return {"notesText": f"Meeting {k}: the team discussed quantum materials and genomics pipelines. Progress is good."}
+    if endpoint == "global-search":
+        return {"query": f"topic{k} quantum"}
+    if endpoint == "search-external-grants":
+        return {"searchCriteria": {"keywords": f"climate modeling {k}", "focusArea": "Earth sciences"}}
+    if endpoint == "match-researchers":
+        return {"grantDescription": f"Funding for research on topic{k} and quantum materials."}
+    if endpoint == "generate-grant-email":
+        return {"grant": {"title": f"Program {k}", "agency": "NSF", "description": "Supports quantum materials research."}, "piId": pi_id}
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+# --- Measurement ---
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, max(math.ceil(p / 100 * len(sorted_values)) - 1, 0))]
+
+def run_level(client, endpoint, concurrency, args, pi_id):
+    headers = {"Accept": "text/event-stream"} if args.stream and endpoint in ("summarize-text", "generate-grant-email") else {}
+    path = f"/api/ai/{endpoint}"
+
+    def one(i):
+        k = i % args.distinct if args.distinct else i
+        payload = make_payload(endpoint, f"{concurrency}-{k}" if not args.distinct else k, pi_id)
+        started = time.perf_counter()
+        status = client.post(path, payload, headers)
+        return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in outcomes)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(outcomes),
+        "errors": sum(1 for _, status in outcomes if status >= 400),
+        "p50Ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95Ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99Ms": round(percentile(latencies, 99) * 1000, 1),
+        "throughputRps": round(len(outcomes) / elapsed, 1),
+    }
+
+
+def main():
+    args = parse_args()
+    if args.url:
+        client = HttpClient(args.url)
+        pi_id = client.first_researcher_id()
+    else:
+        client, pi_id = setup_in_process(args)
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip()]
+
+    print(f"{'endpoint':<24}{'conc':>6}{'reqs':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    results = []
+    for endpoint in endpoints:
+        for concurrency in levels:
+            row = run_level(client, endpoint, concurrency, args, pi_id)
+            results.append(row)
+            print(f"{endpoint:<24}{concurrency:>6}{row['requests']:>7}{row['errors']:>8}"
+                  f"{row['p50Ms']:>10}{row['p95Ms']:>10}{row['p99Ms']:>10}{row['throughputRps']:>9}", flush=True)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Synthetic data shared by the benchmarks: a database with every entity type and relationship filled in."""
+import datetime
+
+from app import db
+from models.models import (Researcher, Lab, Project, ComputeResource, Grant, Note,
+                           ComputeResourceType, ComputeResourceStatus, GrantStatus)
+
+DEPARTMENTS = 12
+LABS = 20
+COMPUTE_RESOURCES = 30
+
+
+def seed_database(researchers=200, notes_per_researcher=1):
+    """
+    Creates `researchers` researchers with as many projects and grants (one each as PI), LABS labs,
+    COMPUTE_RESOURCES compute resources and `notes_per_researcher` notes per researcher (on their project),
+    plus the project/lab/compute resource/grant links and co-PIs. Call inside an app context with empty tables.
+    Returns:
+        list[int]: The researcher ids.
+    """
+    now = datetime.datetime.now()
+    people = [Researcher(name=f"Researcher {i}", email=f"researcher{i}@example.edu", department=f"Department {i % DEPARTMENTS}",
+                         bio=f"Works on topic{i} and topic{i + 1}: quantum materials, genomics and climate models.")
+              for i in range(researchers)]
+    db.session.add_all(people)
+    db.session.flush()
+
+    labs = [Lab(name=f"Lab {i}", description=f"Research lab {i}.", principal_investigator_id=people[i % researchers].id)
+            for i in range(LABS)]
+    resources = [ComputeResource(name=f"Cluster {i}", resource_type=list(ComputeResourceType)[i % 3],
+                                 specification=f"{8 * (i + 1)} cores, {32 * (i + 1)} GB", status=list(ComputeResourceStatus)[i % 4],
+                                 cluster_type="Slurm", nodes=i + 1, cpus_per_node=64, gpus_per_node=i % 5,
+                                 memory_per_node="512GB", storage_per_node="4TB", network_bandwidth="100Gbps")
+                 for i in range(COMPUTE_RESOURCES)]
+    db.session.add_all(labs + resources)
+    db.session.flush()
+    for i, person in enumerate(people):
+        person.lab_id = labs[i % LABS].id
+
+    grants = [Grant(title=f"Grant topic{i}", description=f"Funding for topic{i}.", agency="NSF", amount=100000.0 + i,
+                    status=list(GrantStatus)[i % 4], pi_id=person.id, grant_number=f"BENCH-{i}",
+                    proposal_due_date=now, award_date=now, start_date=now, end_date=now + datetime.timedelta(days=365))
+              for i, person in enumerate(people)]
+    db.session.add_all(grants)
+    db.session.flush()
+
+    projects = []
+    for i, person in enumerate(people):
+        project = Project(name=f"Project topic{i}", description=f"Study of topic{i} at scale.", pi_id=person.id,
+                          start_date=now, end_date=now + datetime.timedelta(days=730))
+        project.labs.append(labs[i % LABS])
+        project.compute_resources.append(resources[i % COMPUTE_RESOURCES])
+        project.grants.append(grants[i])
+        grants[i].co_pis.append(people[(i + 1) % researchers])
+        projects.append(project)
+    db.session.add_all(projects)
+    db.session.flush()
+
+    for i, person in enumerate(people):
+        for n in range(notes_per_researcher):
+            db.session.add(Note(content=f"Meeting {n} about topic{i}; progress is steady.", researcher_id=person.id,
+                                project_id=projects[i].id))
+    db.session.commit()
+    return [person.id for person in people]
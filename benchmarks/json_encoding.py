@@ -0,0 +1,94 @@
+"""
+JSON encoding benchmark: the stdlib and orjson providers (JSON_PROVIDER, see services/json_provider.py)
+on the export payload, offline.
+
+Two export-only apps, one per provider, share a seeded temporary SQLite database. For each provider the
+script times encoding the GET /api/data/export payload alone (provider.response(), what jsonify does)
+and the whole request through the test client, checks both produce the same JSON, and prints the
+median times and the speedup.
+
+    python benchmarks/json_encoding.py
+    python benchmarks/json_encoding.py --researchers 2000 --runs 20
+    python benchmarks/json_encoding.py --json json_encoding.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROVIDERS = ("stdlib", "orjson")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--researchers", type=int, default=500, help="Researchers (and as many projects, grants and notes) to seed")
+    parser.add_argument("--runs", type=int, default=10, help="Timed runs per measurement")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file as JSON")
+    return parser.parse_args()
+
+
+def median_ms(fn, runs):
+    fn() # Warm up
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 2)
+
+
+def export_payload():
+    """The dict GET /api/data/export passes to jsonify. Call inside an app context."""
+    from routes.data import _export_plan
+    return {key: serialize_many(query.all(), whole_table=True) for key, query, serialize_many in _export_plan()}
+
+
+def main():
+    args = parse_args()
+    from app import create_app, db
+    from benchmarks.fixtures import seed_database
+
+    database_uri = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="json_encoding_"), "bench.db")
+    apps = {name: create_app({"SQLALCHEMY_DATABASE_URI": database_uri, "BLUEPRINTS": "export", "JSON_PROVIDER": name})
+            for name in PROVIDERS}
+    with apps["stdlib"].app_context():
+        db.create_all()
+        seed_database(args.researchers)
+
+    results, bodies = [], {}
+    for name, flask_app in apps.items():
+        provider = type(flask_app.json).__name__
+        with flask_app.app_context():
+            payload = export_payload()
+            encode = lambda: flask_app.json.response(payload).get_data()
+            bodies[name] = encode()
+            encode_ms = median_ms(encode, args.runs)
+        client = flask_app.test_client()
+        request_ms = median_ms(lambda: client.get("/api/data/export").get_data(), args.runs)
+        results.append({"provider": name, "class": provider, "bytes": len(bodies[name]),
+                        "encodeMs": encode_ms, "requestMs": request_ms})
+
+    print(f"{'provider':<10}{'class':<22}{'bytes':>11}{'encode ms':>11}{'request ms':>12}")
+    for row in results:
+        print(f"{row['provider']:<10}{row['class']:<22}{row['bytes']:>11}{row['encodeMs']:>11}{row['requestMs']:>12}")
+
+    same = json.loads(bodies["stdlib"]) == json.loads(bodies["orjson"])
+    baseline, fast = results
+    print(f"\nSame JSON from both providers: {'yes' if same else 'NO'}")
+    print(f"Speedup, encoding: {baseline['encodeMs'] / fast['encodeMs']:.1f}x; "
+          f"whole request: {baseline['requestMs'] / fast['requestMs']:.1f}x")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"settings": vars(args), "sameJson": same, "results": results}, f, indent=2)
+    if not same:
+        raise SystemExit("The providers produced different JSON")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Serializer benchmark: marshmallow's schema.dump against the compiled dump functions (routes/serializers.py)
+used by the list endpoints, offline.
+
+The script seeds a temporary SQLite database, then for each list endpoint's schema checks that both produce
+the same output for every row (parity) and times serializing one page of rows (--page-size) with each.
+Dumping model instances also loads relationships (e.g. project notes and the PI) from the database, which
+costs the same with either serializer, so each page is also timed as plain copies of the rows with their
+relationships already read ("serializer only").
+
+    python benchmarks/serializers.py
+    python benchmarks/serializers.py --researchers 2000 --page-size 1000 --runs 20
+    python benchmarks/serializers.py --json serializers.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import types
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--researchers", type=int, default=500, help="Researchers (and as many projects and grants) to seed")
+    parser.add_argument("--notes", type=int, default=3, help="Notes per researcher, each on their project")
+    parser.add_argument("--page-size", type=int, default=100, help="Rows per timed dump (a list endpoint page)")
+    parser.add_argument("--runs", type=int, default=10, help="Timed runs per serializer")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file as JSON")
+    return parser.parse_args()
+
+
+def snapshot(obj, schema):
+    """
+    A plain copy of `obj` holding every attribute `schema` dumps, with relationships read once (nested
+    schemas recursively), so dumping it runs no SQL and times only the serializer.
+    """
+    from marshmallow import fields
+    if obj is None:
+        return None
+    copy = types.SimpleNamespace()
+    for field_name, field in schema.dump_fields.items():
+        attribute = field.attribute or field_name
+        value = getattr(obj, attribute)
+        if isinstance(field, fields.Nested):
+            value = [snapshot(item, field.schema) for item in value] if field.many else snapshot(value, field.schema)
+        elif isinstance(field, fields.List) and isinstance(field.inner, fields.Nested):
+            value = [snapshot(item, field.inner.schema) for item in value]
+        elif hasattr(value, "__iter__") and not isinstance(value, (str, bytes)):
+            value = list(value) # Dynamic relationships (queries) and collections for RelatedList
+        setattr(copy, attribute, value)
+    return copy
+
+
+def median_ms(fn, runs):
+    fn() # Warm up
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 2)
+
+
+def main():
+    args = parse_args()
+    from app import create_app, db
+    from benchmarks.fixtures import seed_database
+
+    flask_app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="serializers_"), "bench.db"),
+                            "BLUEPRINTS": "api"})
+    results, mismatches = [], []
+    with flask_app.app_context():
+        db.create_all()
+        seed_database(args.researchers, args.notes)
+
+        # The list endpoints' schemas and compiled dumps, as the routes build them
+        from models.models import Researcher, Lab, Project, ComputeResource, Grant
+        from routes import researchers, labs, projects, compute_resources, grants
+        endpoints = [
+            ("researchers", Researcher, researchers.researchers_schema, researchers.researchers_dump),
+            ("labs", Lab, labs.labs_schema, labs.labs_dump),
+            ("projects", Project, projects.projects_schema, projects.projects_dump),
+            ("compute-resources", ComputeResource, compute_resources.compute_resources_schema, compute_resources.compute_resources_dump),
+            ("grants", Grant, grants.grants_schema, grants.grants_dump),
+        ]
+
+        print(f"{'endpoint':<19}{'rows':>6}{'parity':>8}{'with loading ms':>25}{'serializer only ms':>25}{'speedup':>9}")
+        print(f"{'':<33}{'marshmallow':>13}{'compiled':>12}{'marshmallow':>13}{'compiled':>12}")
+        for name, model, schema, compiled in endpoints:
+            all_rows = model.query.order_by(model.id).all()
+            same = schema.dump(all_rows) == compiled(all_rows)
+            if not same:
+                mismatches.append(name)
+            rows = all_rows[:args.page_size]
+            copies = [snapshot(row, schema) for row in rows]
+            row = {
+                "endpoint": name,
+                "rows": len(rows),
+                "sameOutput": same,
+                "marshmallowMs": median_ms(lambda: schema.dump(rows), args.runs),
+                "compiledMs": median_ms(lambda: compiled(rows), args.runs),
+                "marshmallowSerializerMs": median_ms(lambda: schema.dump(copies), args.runs),
+                "compiledSerializerMs": median_ms(lambda: compiled(copies), args.runs),
+            }
+            row["serializerSpeedup"] = round(row["marshmallowSerializerMs"] / max(row["compiledSerializerMs"], 0.01), 1)
+            results.append(row)
+            print(f"{name:<19}{len(rows):>6}{'ok' if same else 'DIFF':>8}{row['marshmallowMs']:>13}{row['compiledMs']:>12}"
+                  f"{row['marshmallowSerializerMs']:>13}{row['compiledSerializerMs']:>12}{str(row['serializerSpeedup']) + 'x':>9}", flush=True)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+    if mismatches:
+        raise SystemExit(f"Compiled output differs from schema.dump for: {', '.join(mismatches)}")
+
+
+if __name__ == "__main__":
+    main()
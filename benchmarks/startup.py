@@ -0,0 +1,114 @@
+"""
+Cold-start benchmark: how long a fresh interpreter takes to import app.py and create the app
+(what every gunicorn worker, or a Cloud Run instance, does before serving its first request),
+for each app variant (blueprint selection, see create_app in app.py).
+
+Each run is a new process, so nothing is shared between runs. The script reports min/median/max
+startup time per variant, whether the Gemini SDK was loaded at startup, and optionally the slowest
+imports from `python -X importtime`.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --variants all,api --runs 20 --top 15
+    python benchmarks/startup.py --json startup.json
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child process with the variant as argv[1]; prints one JSON line
+_MEASURE = """
+import sys, time, json
+started = time.perf_counter()
+import app
+app.create_app({"BLUEPRINTS": sys.argv[1]})
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "geminiSdkLoaded": "google.generativeai" in sys.modules, "modules": len(sys.modules)}))
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", default="all,api,ai,export", help="Comma-separated BLUEPRINTS values to time")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh processes to time per variant")
+    parser.add_argument("--top", type=int, default=0, help="Also list the N slowest imports (cumulative, from -X importtime)")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file as JSON")
+    return parser.parse_args()
+
+
+def child_env():
+    env = dict(os.environ)
+    # Startup shouldn't depend on a reachable database; the engine connects lazily anyway
+    env.setdefault("DATABASE_URL", "sqlite://")
+    env.setdefault("PYTHONWARNINGS", "ignore")
+    return env
+
+
+def measure_once(variant):
+    completed = subprocess.run([sys.executable, "-c", _MEASURE, variant], cwd=PROJECT_ROOT, env=child_env(),
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise SystemExit(f"Creating the '{variant}' app failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(variant, top):
+    """(cumulative microseconds, module) for the `top` slowest imports when creating the `variant` app."""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", _MEASURE, variant], cwd=PROJECT_ROOT,
+                               env=child_env(), capture_output=True, text=True)
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), module.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def measure_variant(variant, runs):
+    measure_once(variant) # Warm the OS file cache and write .pyc files, which a deployed image already has
+    results = [measure_once(variant) for _ in range(runs)]
+    seconds = [result["seconds"] for result in results]
+    return {
+        "variant": variant,
+        "runs": runs,
+        "minMs": round(min(seconds) * 1000, 1),
+        "medianMs": round(statistics.median(seconds) * 1000, 1),
+        "maxMs": round(max(seconds) * 1000, 1),
+        "geminiSdkLoaded": results[-1]["geminiSdkLoaded"],
+        "modulesLoaded": results[-1]["modules"],
+    }
+
+
+def main():
+    args = parse_args()
+    variants = [variant.strip() for variant in args.variants.split(",") if variant.strip()]
+
+    print(f"{'variant':<10}{'min ms':>9}{'median ms':>11}{'max ms':>9}{'modules':>9}  Gemini SDK loaded")
+    results = []
+    for variant in variants:
+        row = measure_variant(variant, args.runs)
+        results.append(row)
+        print(f"{variant:<10}{row['minMs']:>9}{row['medianMs']:>11}{row['maxMs']:>9}{row['modulesLoaded']:>9}  "
+              f"{'yes' if row['geminiSdkLoaded'] else 'no'}", flush=True)
+
+    if args.top:
+        for row in results:
+            row["slowestImports"] = [{"module": module, "cumulativeMs": round(us / 1000, 1)}
+                                     for us, module in slowest_imports(row["variant"], args.top)]
+            print(f"\nSlowest imports ({row['variant']}):\n{'cumulative ms':>14}  module")
+            for entry in row["slowestImports"]:
+                print(f"{entry['cumulativeMs']:>14}  {entry['module']}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Add import job table
+
+Revision ID: 5b2c8e4d7f10
+Revises: e413589fa5ce
+Create Date: 2026-10-17 04:30:12.418305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2c8e4d7f10'
+down_revision = 'e413589fa5ce'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('import_job',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('phase', sa.String(length=50), nullable=True),
+    sa.Column('payload_bytes', sa.BigInteger(), nullable=False),
+    sa.Column('rows_processed', sa.Integer(), nullable=False),
+    sa.Column('total_rows', sa.Integer(), nullable=True),
+    sa.Column('rows_per_second', sa.Float(), nullable=True),
+    sa.Column('imported', sa.JSON(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('submitted_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('import_job', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_import_job_status'), ['status'], unique=False)
+        batch_op.create_index(batch_op.f('ix_import_job_finished_at'), ['finished_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_import_job_heartbeat_at'), ['heartbeat_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('import_job', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_import_job_heartbeat_at'))
+        batch_op.drop_index(batch_op.f('ix_import_job_finished_at'))
+        batch_op.drop_index(batch_op.f('ix_import_job_status'))
+
+    op.drop_table('import_job')
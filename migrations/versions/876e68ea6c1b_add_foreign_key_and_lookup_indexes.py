@@ -0,0 +1,57 @@
+"""Add foreign key and lookup indexes
+
+Revision ID: 876e68ea6c1b
+Revises: a1eccd4fe505
+Create Date: 2026-10-17 03:31:47.209114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '876e68ea6c1b'
+down_revision = 'a1eccd4fe505'
+branch_labels = None
+depends_on = None
+
+
+# (table, column) pairs; index names follow SQLAlchemy's index=True convention ix_<table>_<column>
+INDEXED_COLUMNS = [
+    ('researcher', 'lab_id'),
+    ('researcher', 'updated_at'),
+    ('lab', 'principal_investigator_id'),
+    ('lab', 'updated_at'),
+    ('project', 'pi_id'),
+    ('project', 'updated_at'),
+    ('compute_resource', 'resource_type'),
+    ('compute_resource', 'status'),
+    ('compute_resource', 'updated_at'),
+    ('grant', 'pi_id'),
+    ('grant', 'status'),
+    ('grant', 'updated_at'),
+    ('note', 'researcher_id'),
+    ('note', 'project_id'),
+    # Reverse lookups on association tables (the composite PKs cover the first column)
+    ('project_labs', 'lab_id'),
+    ('project_compute_resources', 'compute_resource_id'),
+    ('project_grants', 'grant_id'),
+    ('grant_co_pis', 'researcher_id'),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction block, so on PostgreSQL the
+    # indexes are built in autocommit mode without locking the tables against writes.
+    # postgresql_concurrently is ignored by other dialects.
+    with op.get_context().autocommit_block():
+        for table_name, column_name in INDEXED_COLUMNS:
+            op.create_index(f'ix_{table_name}_{column_name}', table_name, [column_name],
+                            unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table_name, column_name in reversed(INDEXED_COLUMNS):
+            op.drop_index(f'ix_{table_name}_{column_name}', table_name=table_name,
+                          postgresql_concurrently=True)
@@ -0,0 +1,28 @@
+"""Add data version table
+
+Revision ID: 9d41f3a6c2e8
+Revises: 5b2c8e4d7f10
+Create Date: 2026-10-17 05:02:47.903114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d41f3a6c2e8'
+down_revision = '5b2c8e4d7f10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('data_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('data_version')
@@ -0,0 +1,70 @@
+"""Add search document full-text index
+
+Revision ID: e413589fa5ce
+Revises: 876e68ea6c1b
+Create Date: 2026-10-17 04:12:36.551802
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e413589fa5ce'
+down_revision = '876e68ea6c1b'
+branch_labels = None
+depends_on = None
+
+
+# Same statements as models.SEARCH_INDEX_DDL, frozen here
+INDEX_DDL = {
+    'postgresql': [
+        "ALTER TABLE search_document ADD COLUMN tsv tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', body), 'B')) STORED",
+        "CREATE INDEX ix_search_document_tsv ON search_document USING GIN (tsv)",
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE search_document_fts USING fts5("
+        "title, body, content='search_document', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE TRIGGER search_document_ai AFTER INSERT ON search_document BEGIN "
+        "INSERT INTO search_document_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+        "CREATE TRIGGER search_document_ad AFTER DELETE ON search_document BEGIN "
+        "INSERT INTO search_document_fts(search_document_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END",
+        "CREATE TRIGGER search_document_au AFTER UPDATE ON search_document BEGIN "
+        "INSERT INTO search_document_fts(search_document_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+        "INSERT INTO search_document_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    ],
+}
+
+# Index the rows that already exist: (entity_type, table, title expression, body expression)
+BACKFILL = [
+    ('researchers', 'researcher', "coalesce(name, '')", "trim(coalesce(department, '') || ' ' || coalesce(bio, ''))"),
+    ('projects', 'project', "coalesce(name, '')", "coalesce(description, '')"),
+    ('grants', '"grant"', "coalesce(title, '')",
+     "trim(coalesce(agency, '') || ' ' || coalesce(grant_number, '') || ' ' || coalesce(description, ''))"),
+    ('notes', 'note', "''", "coalesce(content, '')"),
+]
+
+
+def upgrade():
+    op.create_table('search_document',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity_type', sa.String(length=50), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.Text(), nullable=False),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('entity_type', 'entity_id', name='uq_search_document_entity')
+    )
+    for statement in INDEX_DDL.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+    for entity_type, table_name, title, body in BACKFILL:
+        op.execute(f"INSERT INTO search_document (entity_type, entity_id, title, body) "
+                   f"SELECT '{entity_type}', id, {title}, {body} FROM {table_name}")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS search_document_fts")
+    op.drop_table('search_document')
@@ -1,5 +1,7 @@
 import enum
 from app import db # Assuming db is initialized in app.py
+from sqlalchemy import event, select, insert, delete, DDL
+from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
 
 class ComputeResourceType(enum.Enum):
@@ -21,24 +23,26 @@ class GrantStatus(enum.Enum):
     REJECTED = "REJECTED"
 
 # Association Tables
+# The composite primary keys already index lookups by their first column (project_id / grant_id);
+# the reverse lookups (e.g. all projects of a lab) need their own index.
 project_labs_table = db.Table('project_labs',
     db.Column('project_id', db.Integer, db.ForeignKey('project.id'), primary_key=True),
-    db.Column('lab_id', db.Integer, db.ForeignKey('lab.id'), primary_key=True)
+    db.Column('lab_id', db.Integer, db.ForeignKey('lab.id'), primary_key=True, index=True)
 )
 
 project_compute_resources_table = db.Table('project_compute_resources',
     db.Column('project_id', db.Integer, db.ForeignKey('project.id'), primary_key=True),
-    db.Column('compute_resource_id', db.Integer, db.ForeignKey('compute_resource.id'), primary_key=True)
+    db.Column('compute_resource_id', db.Integer, db.ForeignKey('compute_resource.id'), primary_key=True, index=True)
 )
 
 project_grants_table = db.Table('project_grants',
     db.Column('project_id', db.Integer, db.ForeignKey('project.id'), primary_key=True),
-    db.Column('grant_id', db.Integer, db.ForeignKey('grant.id'), primary_key=True)
+    db.Column('grant_id', db.Integer, db.ForeignKey('grant.id'), primary_key=True, index=True)
 )
 
 grant_co_pis_table = db.Table('grant_co_pis',
     db.Column('grant_id', db.Integer, db.ForeignKey('grant.id'), primary_key=True),
-    db.Column('researcher_id', db.Integer, db.ForeignKey('researcher.id'), primary_key=True)
+    db.Column('researcher_id', db.Integer, db.ForeignKey('researcher.id'), primary_key=True, index=True)
 )
 
 class Researcher(db.Model):
@@ -47,7 +51,8 @@ class Researcher(db.Model):
     email = db.Column(db.String(100), unique=True, nullable=False)
     bio = db.Column(db.Text, nullable=True)
     department = db.Column(db.String(120), nullable=False) # Added
-    lab_id = db.Column(db.Integer, db.ForeignKey('lab.id'), nullable=True)
+    lab_id = db.Column(db.Integer, db.ForeignKey('lab.id'), nullable=True, index=True)
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
     notes = db.relationship('Note', backref='researcher', lazy=True)
     # projects_pi defined in Project model backref
     # grants_pi defined in Grant model backref
@@ -57,7 +62,8 @@ class Lab(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, unique=True)
     description = db.Column(db.Text, nullable=True)
-    principal_investigator_id = db.Column(db.Integer, db.ForeignKey('researcher.id'), nullable=True) # Added
+    principal_investigator_id = db.Column(db.Integer, db.ForeignKey('researcher.id'), nullable=True, index=True) # Added
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
     principal_investigator = db.relationship('Researcher', backref=db.backref('led_labs', lazy='dynamic'), foreign_keys=[principal_investigator_id]) # Added dynamic lazy loading
     members = db.relationship('Researcher', backref='lab', lazy='dynamic', foreign_keys=[Researcher.lab_id]) # Added dynamic lazy loading
     # projects defined in Project model backref
@@ -68,7 +74,8 @@ class Project(db.Model):
     description = db.Column(db.Text, nullable=True)
     start_date = db.Column(db.DateTime, nullable=True)
     end_date = db.Column(db.DateTime, nullable=True)
-    pi_id = db.Column(db.Integer, db.ForeignKey('researcher.id'), nullable=False)
+    pi_id = db.Column(db.Integer, db.ForeignKey('researcher.id'), nullable=False, index=True)
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
     principal_investigator = db.relationship('Researcher', backref=db.backref('projects_pi', lazy='dynamic'), foreign_keys=[pi_id])
     labs = db.relationship('Lab', secondary=project_labs_table, lazy='subquery',
                            backref=db.backref('projects', lazy='dynamic'))
@@ -81,11 +88,11 @@ class Project(db.Model):
 class ComputeResource(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    resource_type = db.Column(db.Enum(ComputeResourceType), nullable=False) # Maps to 'type'
+    resource_type = db.Column(db.Enum(ComputeResourceType), nullable=False, index=True) # Maps to 'type'
     description = db.Column(db.Text, nullable=True)
     # New fields based on types.ts
     specification = db.Column(db.String(255), nullable=False)
-    status = db.Column(db.Enum(ComputeResourceStatus), nullable=False)
+    status = db.Column(db.Enum(ComputeResourceStatus), nullable=False, index=True)
     cluster_type = db.Column(db.String(100), nullable=True) # 'clusterType'
     nodes = db.Column(db.Integer, nullable=True)
     cpus_per_node = db.Column(db.Integer, nullable=True) # 'cpusPerNode'
@@ -93,6 +100,7 @@ class ComputeResource(db.Model):
     memory_per_node = db.Column(db.String(50), nullable=True) # 'memoryPerNode'
     storage_per_node = db.Column(db.String(50), nullable=True) # 'storagePerNode'
     network_bandwidth = db.Column(db.String(50), nullable=True) # 'networkBandwidth'
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
     # projects relationship defined in Project model backref ('compute_resources')
 
 class Grant(db.Model):
@@ -100,7 +108,7 @@ class Grant(db.Model):
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
     amount = db.Column(db.Float, nullable=False)
-    status = db.Column(db.Enum(GrantStatus), nullable=False, default=GrantStatus.PENDING)
+    status = db.Column(db.Enum(GrantStatus), nullable=False, default=GrantStatus.PENDING, index=True)
     # New fields
     agency = db.Column(db.String(150), nullable=False)
     grant_number = db.Column(db.String(100), nullable=True, unique=True)
@@ -110,7 +118,8 @@ class Grant(db.Model):
     start_date = db.Column(db.DateTime, nullable=True)
     end_date = db.Column(db.DateTime, nullable=True)
     # PI and Co-PIs
-    pi_id = db.Column(db.Integer, db.ForeignKey('researcher.id'), nullable=False) # principalInvestigatorId
+    pi_id = db.Column(db.Integer, db.ForeignKey('researcher.id'), nullable=False, index=True) # principalInvestigatorId
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
     principal_investigator = db.relationship('Researcher', backref=db.backref('grants_pi', lazy='dynamic'), foreign_keys=[pi_id])
     co_pis = db.relationship('Researcher', secondary=grant_co_pis_table, lazy='dynamic', # Changed to dynamic
                              backref=db.backref('grants_co_pi', lazy='dynamic'))
@@ -121,9 +130,193 @@ class Note(db.Model):
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
     updated_at = db.Column(db.DateTime(timezone=True), onupdate=func.now())
-    researcher_id = db.Column(db.Integer, db.ForeignKey('researcher.id'), nullable=False)
-    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=True)
+    researcher_id = db.Column(db.Integer, db.ForeignKey('researcher.id'), nullable=False, index=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=True, index=True)
     project = db.relationship('Project', backref=db.backref('notes', lazy='dynamic'))
 
     def __repr__(self):
         return f'<Note {self.id}>'
+
+# --- Change Tracking ---
+# Deleted rows leave a tombstone so /api/data/changes can report deletions.
+# entity_type holds the export key of the entity ("researchers", "notes", ...). A row with
+# entity_type RESET_ENTITY_TYPE marks a full data replace (import): clients must resync.
+RESET_ENTITY_TYPE = '*'
+
+class Tombstone(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=True)
+    deleted_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<Tombstone {self.entity_type} {self.entity_id}>'
+
+# Insert-only log with one row per transaction that wrote through the ORM, added right after it commits.
+# max(id) is the data version: caches of derived data (services/context_snapshot.py) compare it to decide
+# whether they are current, on any instance. Inserts don't block each other, unlike updating a shared row.
+class DataVersion(db.Model):
+    __tablename__ = 'data_version'
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f'<DataVersion {self.id}>'
+
+# --- Import Jobs ---
+# Status of asynchronous imports (POST /api/data/import?mode=async), so any instance can answer a poll.
+# Written by services/import_jobs.py outside the ORM session, which holds the import's own transaction.
+class ImportJob(db.Model):
+    __tablename__ = 'import_job'
+    id = db.Column(db.String(32), primary_key=True) # uuid4 hex
+    status = db.Column(db.String(20), nullable=False, index=True) # queued, running, succeeded, failed
+    phase = db.Column(db.String(50), nullable=True)
+    payload_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    total_rows = db.Column(db.Integer, nullable=True)
+    rows_per_second = db.Column(db.Float, nullable=True)
+    imported = db.Column(db.JSON, nullable=True) # Rows imported per entity / association
+    error = db.Column(db.Text, nullable=True)
+    submitted_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    started_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True, index=True)
+    heartbeat_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True) # Last sign of life of the worker
+
+    def __repr__(self):
+        return f'<ImportJob {self.id} {self.status}>'
+
+# Model -> export key for every entity whose deletions are tracked
+TRACKED_ENTITY_TYPES = {
+    Researcher: 'researchers',
+    Lab: 'labs',
+    Project: 'projects',
+    ComputeResource: 'computeResources',
+    Grant: 'grants',
+    Note: 'notes',
+}
+
+# Set session.info[SKIP_TOMBSTONES] = True to suppress per-row tombstones (e.g. during a full import)
+SKIP_TOMBSTONES = 'skip_tombstones'
+
+@event.listens_for(Session, 'before_flush')
+def _track_changes_before_flush(session, flush_context, instances):
+    # Changing only a relationship collection (e.g. project.labs) doesn't UPDATE the parent row,
+    # so onupdate wouldn't fire. Touch updated_at explicitly so the change is visible to sync clients.
+    for obj in session.dirty:
+        if type(obj) in TRACKED_ENTITY_TYPES and hasattr(obj, 'updated_at') and session.is_modified(obj, include_collections=True):
+            obj.updated_at = func.now()
+
+    if session.info.get(SKIP_TOMBSTONES):
+        return
+    for obj in session.deleted:
+        entity_type = TRACKED_ENTITY_TYPES.get(type(obj))
+        if entity_type and obj.id is not None:
+            session.add(Tombstone(entity_type=entity_type, entity_id=obj.id))
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_deletes(orm_execute_state):
+    # Query(...).delete() bypasses the unit of work, so read the affected ids before the DELETE runs.
+    if not orm_execute_state.is_delete or orm_execute_state.session.info.get(SKIP_TOMBSTONES):
+        return
+    mapper = orm_execute_state.bind_mapper
+    entity_type = TRACKED_ENTITY_TYPES.get(mapper.class_) if mapper is not None else None
+    if not entity_type:
+        return
+    id_query = select(mapper.primary_key[0])
+    if orm_execute_state.statement.whereclause is not None:
+        id_query = id_query.where(orm_execute_state.statement.whereclause)
+    deleted_ids = orm_execute_state.session.execute(id_query).scalars().all()
+    if deleted_ids:
+        orm_execute_state.session.execute(
+            insert(Tombstone), [{"entity_type": entity_type, "entity_id": entity_id} for entity_id in deleted_ids])
+        if mapper.class_ in SEARCHABLE_FIELDS:
+            orm_execute_state.session.execute(
+                delete(SearchDocument).where(SearchDocument.entity_type == entity_type,
+                                             SearchDocument.entity_id.in_(deleted_ids)))
+
+# --- Full-Text Search ---
+# One search_document row per searchable entity holds its text; the database indexes it:
+#   PostgreSQL: a generated tsvector column (title weighted A, body B) with a GIN index.
+#   SQLite: an FTS5 external-content table (search_document_fts) kept in sync by triggers.
+# Rows are written by the flush listener below, so every ORM write keeps the index current.
+# Bulk paths that bypass the unit of work (the import) call services.search_index.rebuild_search_index().
+
+# Model -> (title attribute, body attributes)
+SEARCHABLE_FIELDS = {
+    Researcher: ('name', ('department', 'bio')),
+    Project: ('name', ('description',)),
+    Grant: ('title', ('agency', 'grant_number', 'description')),
+    Note: (None, ('content',)),
+}
+
+class SearchDocument(db.Model):
+    __tablename__ = 'search_document'
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(50), nullable=False) # Export key, e.g. "researchers"
+    entity_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.Text, nullable=False, default='')
+    body = db.Column(db.Text, nullable=False, default='')
+    __table_args__ = (db.UniqueConstraint('entity_type', 'entity_id', name='uq_search_document_entity'),)
+
+    def __repr__(self):
+        return f'<SearchDocument {self.entity_type} {self.entity_id}>'
+
+# Dialect-specific index DDL, run after CREATE TABLE (migration e413589fa5ce runs the same statements)
+SEARCH_INDEX_DDL = {
+    'postgresql': [
+        "ALTER TABLE search_document ADD COLUMN tsv tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', body), 'B')) STORED",
+        "CREATE INDEX ix_search_document_tsv ON search_document USING GIN (tsv)",
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE search_document_fts USING fts5("
+        "title, body, content='search_document', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE TRIGGER search_document_ai AFTER INSERT ON search_document BEGIN "
+        "INSERT INTO search_document_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+        "CREATE TRIGGER search_document_ad AFTER DELETE ON search_document BEGIN "
+        "INSERT INTO search_document_fts(search_document_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END",
+        "CREATE TRIGGER search_document_au AFTER UPDATE ON search_document BEGIN "
+        "INSERT INTO search_document_fts(search_document_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+        "INSERT INTO search_document_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    ],
+}
+
+for _dialect, _statements in SEARCH_INDEX_DDL.items():
+    for _statement in _statements:
+        event.listen(SearchDocument.__table__, 'after_create', DDL(_statement).execute_if(dialect=_dialect))
+event.listen(SearchDocument.__table__, 'before_drop',
+             DDL("DROP TABLE IF EXISTS search_document_fts").execute_if(dialect='sqlite'))
+
+def search_document_values(obj):
+    """Returns the search_document column values for a searchable model instance."""
+    title_attr, body_attrs = SEARCHABLE_FIELDS[type(obj)]
+    return {
+        "entity_type": TRACKED_ENTITY_TYPES[type(obj)],
+        "entity_id": obj.id,
+        "title": (getattr(obj, title_attr) or '') if title_attr else '',
+        "body": " ".join(str(value) for value in (getattr(obj, attr) for attr in body_attrs) if value),
+    }
+
+def _search_text_changed(obj):
+    title_attr, body_attrs = SEARCHABLE_FIELDS[type(obj)]
+    state = db.inspect(obj)
+    return any(state.attrs[attr].history.has_changes() for attr in ((title_attr,) if title_attr else ()) + body_attrs)
+
+@event.listens_for(Session, 'after_flush')
+def _sync_search_documents(session, flush_context):
+    # Runs inside the flush's transaction, so the index commits or rolls back with the data.
+    # Core statements on the flush's connection, since the ORM can't flush again from here.
+    stale = [obj for obj in session.dirty if type(obj) in SEARCHABLE_FIELDS and _search_text_changed(obj)]
+    removed = [obj for obj in session.deleted if type(obj) in SEARCHABLE_FIELDS]
+    added = [obj for obj in session.new if type(obj) in SEARCHABLE_FIELDS]
+
+    by_type = {}
+    for obj in stale + removed:
+        by_type.setdefault(TRACKED_ENTITY_TYPES[type(obj)], []).append(obj.id)
+    table = SearchDocument.__table__
+    connection = session.connection()
+    for entity_type, entity_ids in by_type.items():
+        connection.execute(table.delete().where(table.c.entity_type == entity_type, table.c.entity_id.in_(entity_ids)))
+    documents = [search_document_values(obj) for obj in stale + added]
+    if documents:
+        connection.execute(table.insert(), documents)
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from services.gemini_service import (
     summarize_text,
     analyze_notes_text,
@@ -6,29 +6,84 @@ from services.gemini_service import (
     search_external_grants_via_ai,
     match_researchers_to_grant_via_ai,
     generate_grant_intro_email_via_ai, # Added this
-    GeminiServiceError
+    stream_summarize_text,
+    stream_grant_intro_email_via_ai,
+    GeminiServiceError,
+    GeminiTimeoutError,
+    GeminiUnavailableError,
+    circuit_breaker,
+    rate_limiter,
+    json_repairs,
+    set_request_deadline,
+    clear_request_deadline,
+    response_cache,
+    model_calls
 )
 import json # For JSONDecodeError
+import math
 
-# Import models and serializers (or assume they are accessible)
-# This is a bit tricky as serializers are in each route file.
-# For this exercise, we might need to either:
-# 1. Re-define simplified serializers here.
-# 2. Assume a refactor where serializers are in a shared module.
-# 3. Temporarily import directly from other route files (can lead to circular dependencies if not careful).
-
-# Let's try to import them directly, assuming it works for this context.
-# If not, simplified local serializers would be the fallback.
-from models.models import Researcher, Lab, Project, ComputeResource, Grant, Note
-from routes.researchers import researcher_to_json, note_to_json # Assuming these can be imported
-from routes.labs import lab_to_json
-from routes.projects import project_to_json
-from routes.compute_resources import compute_resource_to_json
-from routes.grants import grant_to_json
+# The AI endpoints use their own compact serializers (services/context_snapshot.py), so this module
+# doesn't depend on the other route modules and can be registered on its own (see create_app in app.py).
+from models.models import Researcher
+from services.context_snapshot import get_search_context
 
 
 ai_bp = Blueprint('ai_bp', __name__)
 
+@ai_bp.before_request
+def _start_request_deadline():
+    # Every model call and retry made for this request shares one deadline. Clients may ask for a
+    # shorter one with X-Request-Timeout (seconds); it can't exceed GEMINI_REQUEST_DEADLINE.
+    requested = request.headers.get('X-Request-Timeout', type=float)
+    set_request_deadline(requested if requested and requested > 0 else None)
+
+@ai_bp.teardown_request
+def _end_request_deadline(exc):
+    clear_request_deadline()
+
+def _service_error_response(message, e):
+    """
+    Response for a GeminiServiceError: 503 with Retry-After when the call was rejected up front
+    (circuit breaker open or rate limit exhausted), 504 when it timed out, 502 otherwise.
+    """
+    response = jsonify({"error": message, "details": str(e)})
+    if isinstance(e, GeminiUnavailableError):
+        response.status_code = 503
+        response.headers['Retry-After'] = str(max(1, math.ceil(e.retry_after)))
+    elif isinstance(e, GeminiTimeoutError):
+        response.status_code = 504
+    else:
+        response.status_code = 502 # 502 Bad Gateway for upstream service error
+    return response
+
+# --- Server-Sent Events ---
+# Endpoints that support streaming send SSE when the client prefers text/event-stream
+# (Accept: text/event-stream); otherwise they keep returning a single JSON response.
+# Stream events: "delta" ({"text": ...}) per model chunk, then "done" with the same payload as the
+# JSON response, or "error" ({"error": ..., "details": ...}) if generation fails midway.
+
+def _wants_event_stream():
+    return request.accept_mimetypes.best_match(['application/json', 'text/event-stream']) == 'text/event-stream'
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _event_stream_response(events, error_message):
+    def generate():
+        try:
+            for event, data in events:
+                yield _sse_event(event, data)
+        except (GeminiServiceError, ValueError) as e:
+            current_app.logger.error(f"Gemini service error while streaming: {str(e)}")
+            yield _sse_event("error", {"error": error_message, "details": str(e)})
+        except Exception as e:
+            current_app.logger.error(f"Unexpected error while streaming: {str(e)}")
+            yield _sse_event("error", {"error": "An unexpected error occurred."})
+
+    # No caching or proxy buffering, so each event reaches the client as soon as it is produced
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @ai_bp.route('/summarize-text', methods=['POST'])
 def handle_summarize_text():
     data = request.get_json()
@@ -40,13 +95,15 @@ def handle_summarize_text():
         return jsonify({"error": "'text' must be a non-empty string"}), 400
 
     try:
+        if _wants_event_stream():
+            return _event_stream_response(stream_summarize_text(text_to_summarize), "Failed to summarize text via AI service.")
         summary = summarize_text(text_to_summarize)
         return jsonify({"summary": summary}), 200
     except GeminiServiceError as e:
         # Log the error for server-side review
         current_app.logger.error(f"Gemini service error: {str(e)}")
         # Return a generic error to the client
-        return jsonify({"error": "Failed to summarize text via AI service.", "details": str(e)}), 502 # 502 Bad Gateway for upstream service error
+        return _service_error_response("Failed to summarize text via AI service.", e)
     except ValueError as ve: # Catch input validation errors from the service
         return jsonify({"error": str(ve)}), 400
     except Exception as e:
@@ -69,7 +126,7 @@ def handle_analyze_notes():
         return jsonify(analysis_result), 200
     except GeminiServiceError as e:
         current_app.logger.error(f"Gemini service error during notes analysis: {str(e)}")
-        return jsonify({"error": "Failed to analyze notes via AI service.", "details": str(e)}), 502
+        return _service_error_response("Failed to analyze notes via AI service.", e)
     except ValueError as ve: # Catch input validation errors from the service itself
         return jsonify({"error": str(ve)}), 400
     except json.JSONDecodeError as jde: # Should be caught by GeminiServiceError in service, but as fallback
@@ -90,53 +147,15 @@ def handle_global_search():
         return jsonify({"error": "'query' must be a non-empty string"}), 400
 
     try:
-        # Fetch and serialize all context data
-        # NOTE: Using .all() on relationships within serializers if they are dynamic
-        # The serializers imported should ideally handle this.
-
-        # Simplified serialization for context to pass to Gemini (matching export structure)
-        # Using the export-oriented serializers from data.py would be more consistent if they were easily importable.
-        # For now, re-using existing _to_json from each entity's route file.
-
-        # Need to be careful with `researcher_to_json` if it nests all notes,
-        # as the prompt asks for a separate top-level `notes` list.
-        # For the context_data, we'll provide a flat list of all notes.
-
-        # Using simplified/adapted serializers for context to avoid excessive nesting/size issues.
-        # These are distinct from the ones used for direct API responses for individual entities.
-        def context_researcher_to_json(r):
-            return {"id": str(r.id), "name": r.name, "email": r.email, "department": r.department, "bio": r.bio or ""}
-
-        def context_lab_to_json(l):
-            return {"id": str(l.id), "name": l.name, "description": l.description or "", "principalInvestigatorId": str(l.principal_investigator_id) if l.principal_investigator_id else None}
-
-        def context_project_to_json(p):
-            return {"id": str(p.id), "name": p.name, "description": p.description or "", "leadResearcherId": str(p.pi_id) if p.pi_id else None}
-
-        def context_compute_resource_to_json(cr):
-            return {"id": str(cr.id), "name": cr.name, "type": cr.resource_type.value, "specification": cr.specification or ""}
-
-        def context_grant_to_json(g):
-            return {"id": str(g.id), "title": g.title, "agency": g.agency, "amount": g.amount, "status": g.status.value}
-
-        def context_note_to_json(n): # For the flat list of all notes
-            return {"id": str(n.id), "content": n.content or "", "researcherId": str(n.researcher_id), "projectId": str(n.project_id) if n.project_id else None}
-
-        context_data = {
-            "researchers": [context_researcher_to_json(r) for r in Researcher.query.all()],
-            "labs": [context_lab_to_json(l) for l in Lab.query.all()],
-            "projects": [context_project_to_json(p) for p in Project.query.all()],
-            "computeResources": [context_compute_resource_to_json(cr) for cr in ComputeResource.query.all()],
-            "grants": [context_grant_to_json(g) for g in Grant.query.all()],
-            "notes": [context_note_to_json(n) for n in Note.query.all()] # All notes, flat list
-        }
+        # Serialized data of every entity, rebuilt only after writes (see services/context_snapshot.py)
+        context_data = get_search_context()
 
         search_results = perform_global_search(search_query, context_data)
         return jsonify(search_results), 200
 
     except GeminiServiceError as e:
         current_app.logger.error(f"Gemini service error during global search: {str(e)}")
-        return jsonify({"error": "Failed to perform global search via AI service.", "details": str(e)}), 502
+        return _service_error_response("Failed to perform global search via AI service.", e)
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
     except Exception as e:
@@ -163,7 +182,7 @@ def handle_search_external_grants():
 
     except GeminiServiceError as e:
         current_app.logger.error(f"Gemini service error during external grant search: {str(e)}")
-        return jsonify({"error": "Failed to search external grants via AI service.", "details": str(e)}), 502
+        return _service_error_response("Failed to search external grants via AI service.", e)
     except ValueError as ve: # Catches validation errors from service (e.g. bad criteria dict)
         return jsonify({"error": str(ve)}), 400
     except Exception as e:
@@ -181,23 +200,8 @@ def handle_match_researchers_to_grant():
         return jsonify({"error": "'grantDescription' must be a non-empty string"}), 400
 
     try:
-        # Fetch and serialize researcher context data
-        # Using the same context serializers defined in handle_global_search for consistency
-        # Ensure these local serializers are accessible or redefine them if they are not.
-        # For this case, I'll assume they are accessible or can be redefined if needed.
-        # The `perform_global_search` already has these; let's ensure they are available.
-        # Re-defining for clarity or use from a shared context_serializers module if it existed.
-
-        def context_researcher_to_json_for_matching(r): # Slightly different from global search one, includes bio fully
-            return {
-                "id": str(r.id), # Ensure ID is string for AI context consistency
-                "name": r.name,
-                "email": r.email, # Though AI might not need email for matching
-                "department": r.department,
-                "bio": r.bio or "" # Bio is crucial for matching
-            }
-
-        researchers_context = [context_researcher_to_json_for_matching(r) for r in Researcher.query.all()]
+        # Researchers from the shared context snapshot (id, name, email, department, bio)
+        researchers_context = get_search_context()["researchers"]
 
         if not researchers_context:
             return jsonify({"message": "No researchers available in the system to match.", "matches": []}), 200
@@ -208,7 +212,7 @@ def handle_match_researchers_to_grant():
 
     except GeminiServiceError as e:
         current_app.logger.error(f"Gemini service error during researcher matching: {str(e)}")
-        return jsonify({"error": "Failed to match researchers to grant via AI service.", "details": str(e)}), 502
+        return _service_error_response("Failed to match researchers to grant via AI service.", e)
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
     except Exception as e:
@@ -250,14 +254,39 @@ def handle_generate_grant_email():
     }
 
     try:
+        if _wants_event_stream():
+            return _event_stream_response(stream_grant_intro_email_via_ai(grant_details_payload, pi_details_for_service),
+                                          "Failed to generate email via AI service.")
         email_draft = generate_grant_intro_email_via_ai(grant_details_payload, pi_details_for_service)
         return jsonify(email_draft), 200
 
     except GeminiServiceError as e:
         current_app.logger.error(f"Gemini service error during email generation: {str(e)}")
-        return jsonify({"error": "Failed to generate email via AI service.", "details": str(e)}), 502
+        return _service_error_response("Failed to generate email via AI service.", e)
     except ValueError as ve: # Catches validation errors from service (e.g. bad grant_details)
         return jsonify({"error": str(ve)}), 400
     except Exception as e:
         current_app.logger.error(f"Unexpected error in email generation endpoint: {str(e)}")
         return jsonify({"error": "An unexpected error occurred during email generation."}), 500
+
+@ai_bp.route('/cache-stats', methods=['GET'])
+def get_cache_stats():
+    # Counters are per worker process; entries/evictions are shared when the sqlite backend is used.
+    try:
+        stats = response_cache.stats()
+        stats["coalescedCalls"] = model_calls.coalesced # Callers that shared an identical in-flight model call
+        stats["inFlightCalls"] = model_calls.in_flight()
+        return jsonify(stats), 200
+    except Exception as e:
+        current_app.logger.error(f"Error reading AI response cache stats: {str(e)}")
+        return jsonify({"error": "Failed to read cache stats."}), 500
+
+@ai_bp.route('/upstream-stats', methods=['GET'])
+def get_upstream_stats():
+    # Circuit breaker state and transition counts, rate limiter counters and malformed-JSON repair calls (per worker process)
+    try:
+        return jsonify({"circuitBreaker": circuit_breaker.stats(), "rateLimiter": rate_limiter.stats(),
+                        "jsonRepairs": dict(json_repairs)}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error reading AI upstream stats: {str(e)}")
+        return jsonify({"error": "Failed to read upstream stats."}), 500
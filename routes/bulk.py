@@ -0,0 +1,153 @@
+from flask import jsonify
+from marshmallow import ValidationError
+from collections import defaultdict
+from app import db
+from routes.resolvers import resolve_ids
+
+# Shared engine behind the POST /api/<entity>/bulk endpoints.
+# Items without an "id" are created, items with an "id" update that row (partial update).
+# Everything is validated first (schemas, uniqueness, referenced ids) using a fixed number of
+# queries per request rather than per item; if any item fails, nothing is written and the
+# response lists the errors by item index. Otherwise all items are saved in one transaction.
+
+MAX_BULK_ITEMS = 5000
+
+class UniqueField:
+    """A column whose values must be unique, e.g. UniqueField("email", "Email")."""
+    def __init__(self, attr, label):
+        self.attr = attr
+        self.label = label
+
+class Reference:
+    """A foreign key attribute on the loaded object that must point at an existing row."""
+    def __init__(self, attr, model, label, data_key):
+        self.attr = attr
+        self.model = model
+        self.label = label
+        self.data_key = data_key
+
+class Relation:
+    """A many-to-many collection linked from an id list in the payload, e.g. "labIds" -> Project.labs."""
+    def __init__(self, data_key, attr, model, label):
+        self.data_key = data_key
+        self.attr = attr
+        self.model = model
+        self.label = label
+
+
+def _add_error(errors, index, field, message):
+    errors[index].setdefault(field, []).append(message)
+
+def bulk_save(model, create_schema, update_schema, items, unique_fields=(), references=(), relations=()):
+    """
+    Validates and saves a list of payload items for `model`.
+    Returns:
+        tuple: (saved objects in input order, list of {"index": i, "errors": {...}}).
+        When the error list is non-empty the session has been rolled back and nothing was saved.
+    """
+    errors = defaultdict(dict)
+    loaded = [None] * len(items)
+
+    with db.session.no_autoflush:
+        # Rows being updated, fetched with one query
+        update_ids = [item.get("id") for item in items if isinstance(item, dict) and item.get("id") is not None]
+        existing, _ = resolve_ids(model, update_ids)
+        existing_by_id = {obj.id: obj for obj in existing}
+
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                _add_error(errors, index, "_schema", "Item must be a JSON object.")
+                continue
+            data = {k: v for k, v in item.items() if k != "id"}
+            instance = None
+            if item.get("id") is not None:
+                try:
+                    instance = existing_by_id.get(int(item["id"]))
+                except (TypeError, ValueError):
+                    pass
+                if instance is None:
+                    _add_error(errors, index, "id", f"{model.__name__} with id {item['id']} not found.")
+                    continue
+            try:
+                if instance is not None:
+                    loaded[index] = update_schema.load(data, instance=instance, partial=True)
+                else:
+                    loaded[index] = create_schema.load(data)
+            except ValidationError as err:
+                errors[index].update(err.messages)
+
+        # Uniqueness: duplicates inside the payload, then one IN query against the table per field
+        for unique in unique_fields:
+            column = getattr(model, unique.attr)
+            seen = {}
+            for index, obj in enumerate(loaded):
+                value = getattr(obj, unique.attr, None) if obj is not None else None
+                if value is None:
+                    continue
+                if value in seen:
+                    _add_error(errors, index, unique.attr, f"{unique.label} '{value}' is duplicated in this request (item {seen[value]}).")
+                else:
+                    seen[value] = index
+            if seen:
+                taken = dict(db.session.query(column, model.id).filter(column.in_(list(seen))).all())
+                for value, index in seen.items():
+                    if value in taken and taken[value] != loaded[index].id:
+                        _add_error(errors, index, unique.attr, f"{unique.label} '{value}' already exists.")
+
+        # Foreign keys set by the schema (e.g. pi_id), one query per referenced model
+        for reference in references:
+            wanted = [getattr(obj, reference.attr, None) for obj in loaded if obj is not None]
+            _, missing = resolve_ids(reference.model, [value for value in wanted if value is not None])
+            missing = set(missing)
+            for index, obj in enumerate(loaded):
+                if obj is not None and getattr(obj, reference.attr, None) in missing:
+                    _add_error(errors, index, reference.data_key, f"{reference.label} with id {getattr(obj, reference.attr)} not found.")
+
+        # Many-to-many id lists, one query per relation across all items
+        for relation in relations:
+            all_ids = [entity_id for item in items if isinstance(item, dict) for entity_id in (item.get(relation.data_key) or [])]
+            found, _ = resolve_ids(relation.model, all_ids)
+            found_by_id = {obj.id: obj for obj in found}
+            for index, obj in enumerate(loaded):
+                if obj is None or relation.data_key not in items[index]:
+                    continue
+                ids = items[index].get(relation.data_key) or []
+                targets, missing = [], []
+                for entity_id in ids:
+                    try:
+                        target = found_by_id.get(int(entity_id))
+                    except (TypeError, ValueError):
+                        target = None
+                    if target is None:
+                        missing.append(entity_id)
+                    elif target not in targets:
+                        targets.append(target)
+                if missing:
+                    _add_error(errors, index, relation.data_key, f"{relation.label} with id(s) {', '.join(str(m) for m in missing)} not found.")
+                elif index not in errors:
+                    setattr(obj, relation.attr, targets)
+
+    if errors:
+        db.session.rollback()
+        return [], [{"index": index, "errors": errors[index]} for index in sorted(errors)]
+
+    db.session.add_all(loaded)
+    db.session.flush()
+    saved_ids = [obj.id for obj in loaded]
+    db.session.commit()
+    # Reload with one query; the committed objects are expired and would otherwise be refreshed one by one
+    saved, _ = resolve_ids(model, saved_ids)
+    return saved, []
+
+def bulk_request_error(json_data):
+    """Returns an error response if the payload is not a non-empty list within the size limit, else None."""
+    if not json_data:
+        return jsonify({"error": "No input data provided"}), 400
+    if not isinstance(json_data, list):
+        return jsonify({"error": "Bulk payload must be a JSON array of items"}), 400
+    if len(json_data) > MAX_BULK_ITEMS:
+        return jsonify({"error": f"Bulk payload exceeds the limit of {MAX_BULK_ITEMS} items"}), 400
+    return None
+
+def bulk_error_response(errors):
+    return jsonify({"error": "One or more items failed validation. Nothing was saved.", "errors": errors}), 400
@@ -3,12 +3,17 @@ from models.models import ComputeResource, Project # Enums are handled by schema
 from app import db
 from schemas import ComputeResourceSchema # Import schema
 from marshmallow import ValidationError
+from routes.pagination import paginate_query
+from routes.serializers import compile_dump
+from routes.resolvers import resolve_ids, missing_ids_response
+from routes.bulk import bulk_save, bulk_request_error, bulk_error_response, Relation
 
 compute_resource_bp = Blueprint('compute_resource_bp', __name__)
 
 # Instantiate schemas
 compute_resource_schema = ComputeResourceSchema()
 compute_resources_schema = ComputeResourceSchema(many=True)
+compute_resources_dump = compile_dump(compute_resources_schema) # Same output as compute_resources_schema.dump, for the list endpoint
 # For updates, use compute_resource_schema(partial=True)
 
 @compute_resource_bp.route('', methods=['POST'])
@@ -24,13 +29,10 @@ def create_compute_resource():
 
         # Manual handling for 'project_ids' relationship
         if 'projectIds' in json_data and json_data['projectIds']:
-            new_cr.projects.clear() # Should be empty for new instance, but good practice
-            for project_id in json_data['projectIds']:
-                project = Project.query.get(project_id)
-                if not project:
-                    # No rollback here as instance not yet added to session by us
-                    return jsonify({"error": f"Project with id {project_id} not found"}), 404
-                new_cr.projects.append(project)
+            projects, missing = resolve_ids(Project, json_data['projectIds'])
+            if missing:
+                return missing_ids_response("Project", missing)
+            new_cr.projects = projects
 
         db.session.add(new_cr) # Add if schema doesn't auto-add
         db.session.commit()
@@ -40,18 +42,25 @@ def create_compute_resource():
 
 @compute_resource_bp.route('', methods=['GET'])
 def get_compute_resources():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
+    # Offset pagination (?page=&per_page=) or keyset pagination (?after=&limit=); see routes/pagination.py
+    try:
+        return jsonify(paginate_query(ComputeResource.query, ComputeResource, "compute_resources", compute_resources_dump))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
 
-    resources_page = ComputeResource.query.paginate(page=page, per_page=per_page, error_out=False)
-    result = compute_resources_schema.dump(resources_page.items)
+@compute_resource_bp.route('/bulk', methods=['POST'])
+def bulk_save_compute_resources():
+    json_data = request.get_json()
+    error_response = bulk_request_error(json_data)
+    if error_response:
+        return error_response
 
-    return jsonify({
-        "compute_resources": result,
-        "total_pages": resources_page.pages,
-        "current_page": resources_page.page,
-        "total_items": resources_page.total
-    })
+    saved, errors = bulk_save(
+        ComputeResource, compute_resource_schema, compute_resource_schema, json_data,
+        relations=[Relation("projectIds", "projects", Project, "Project")])
+    if errors:
+        return bulk_error_response(errors)
+    return jsonify({"compute_resources": compute_resources_schema.dump(saved)}), 201
 
 @compute_resource_bp.route('/<int:id>', methods=['GET'])
 def get_compute_resource(id):
@@ -72,12 +81,10 @@ def update_compute_resource(id):
 
         # Manual handling for 'project_ids' relationship
         if 'projectIds' in json_data:
-            updated_cr.projects.clear()
-            for project_id in json_data['projectIds']:
-                project = Project.query.get(project_id)
-                if not project:
-                    return jsonify({"error": f"Project with id {project_id} not found"}), 404
-                updated_cr.projects.append(project)
+            projects, missing = resolve_ids(Project, json_data['projectIds'])
+            if missing:
+                return missing_ids_response("Project", missing)
+            updated_cr.projects = projects
 
         db.session.commit()
         return jsonify(compute_resource_schema.dump(updated_cr))
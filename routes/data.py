@@ -1,8 +1,16 @@
-from flask import Blueprint, request, jsonify, current_app, make_response
+from flask import Blueprint, request, jsonify, current_app, make_response, Response, stream_with_context, url_for
 from app import db
-from models.models import Researcher, Lab, Project, ComputeResource, Grant, Note, \
-    ComputeResourceType, GrantStatus, ComputeResourceStatus # Enums too
-from datetime import datetime
+from models.models import Researcher, Lab, Project, ComputeResource, Grant, Note, Tombstone, RESET_ENTITY_TYPE, \
+    project_labs_table, project_compute_resources_table, project_grants_table, grant_co_pis_table # Association tables
+from sqlalchemy.orm import lazyload
+from sqlalchemy.sql import func
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from services.import_service import import_application_data
+from services.import_jobs import submit_import_job, get_import_job
+from collections import defaultdict
+from datetime import datetime, timedelta
+import base64
+import json
 
 # Import serialization helpers from other route files
 # Ideally, these would be in a shared 'serializers.py' or similar module
@@ -12,6 +20,10 @@ from datetime import datetime
 
 data_bp = Blueprint('data_bp', __name__)
 
+# Rows fetched per round trip when streaming an export. yield_per keeps only one batch
+# of ORM objects alive at a time (and uses a server-side cursor on PostgreSQL).
+EXPORT_BATCH_SIZE = 1000
+
 # --- Export Serialization Helpers ---
 def export_note_to_json(note):
     return {
@@ -23,7 +35,10 @@ def export_note_to_json(note):
         "updatedAt": note.updated_at.isoformat() if note.updated_at else None,
     }
 
-def export_researcher_to_json(researcher):
+def export_researcher_to_json(researcher, notes=None):
+    # `notes` can be passed pre-serialized (see export_researchers) to avoid a lazy load per researcher
+    if notes is None:
+        notes = [export_note_to_json(note) for note in researcher.notes.all()] if hasattr(researcher.notes, 'all') else [export_note_to_json(note) for note in researcher.notes]
     return {
         "id": str(researcher.id),
         "name": researcher.name,
@@ -31,7 +46,7 @@ def export_researcher_to_json(researcher):
         "department": researcher.department,
         "bio": researcher.bio,
         "labId": str(researcher.lab_id) if researcher.lab_id else None,
-        "notes": [export_note_to_json(note) for note in researcher.notes.all()] if hasattr(researcher.notes, 'all') else [export_note_to_json(note) for note in researcher.notes]
+        "notes": notes
         # led_labs is not part of ApplicationData.Researcher in types.ts typically
     }
 
@@ -45,7 +60,14 @@ def export_lab_to_json(lab):
         # 'projectIds' are implicitly defined by Project.labIds
     }
 
-def export_project_to_json(project):
+def export_project_to_json(project, lab_ids=None, compute_resource_ids=None, grant_ids=None):
+    # The id lists can be passed in from bulk association-table reads (see export_projects)
+    if lab_ids is None:
+        lab_ids = [str(lab.id) for lab in project.labs.all()] if hasattr(project.labs, 'all') else [str(lab.id) for lab in project.labs]
+    if compute_resource_ids is None:
+        compute_resource_ids = [str(cr.id) for cr in project.compute_resources.all()] if hasattr(project.compute_resources, 'all') else [str(cr.id) for cr in project.compute_resources]
+    if grant_ids is None:
+        grant_ids = [str(grant.id) for grant in project.grants.all()] if hasattr(project.grants, 'all') else [str(grant.id) for grant in project.grants]
     return {
         "id": str(project.id),
         "name": project.name,
@@ -53,9 +75,9 @@ def export_project_to_json(project):
         "startDate": project.start_date.isoformat() if project.start_date else None,
         "endDate": project.end_date.isoformat() if project.end_date else None,
         "leadResearcherId": str(project.pi_id) if project.pi_id else None, # pi_id in model
-        "labIds": [str(lab.id) for lab in project.labs.all()] if hasattr(project.labs, 'all') else [str(lab.id) for lab in project.labs],
-        "computeResourceIds": [str(cr.id) for cr in project.compute_resources.all()] if hasattr(project.compute_resources, 'all') else [str(cr.id) for cr in project.compute_resources],
-        "grantIds": [str(grant.id) for grant in project.grants.all()] if hasattr(project.grants, 'all') else [str(grant.id) for grant in project.grants]
+        "labIds": lab_ids,
+        "computeResourceIds": compute_resource_ids,
+        "grantIds": grant_ids
         # notes are linked from Note.projectId, not directly listed here in types.ts usually
     }
 
@@ -77,7 +99,9 @@ def export_compute_resource_to_json(cr):
         # 'projectIds' are implicitly defined by Project.computeResourceIds
     }
 
-def export_grant_to_json(grant):
+def export_grant_to_json(grant, co_pi_ids=None):
+    if co_pi_ids is None:
+        co_pi_ids = [str(pi.id) for pi in grant.co_pis.all()] if hasattr(grant.co_pis, 'all') else [str(pi.id) for pi in grant.co_pis]
     return {
         "id": str(grant.id),
         "title": grant.title,
@@ -91,19 +115,123 @@ def export_grant_to_json(grant):
         "startDate": grant.start_date.isoformat() if grant.start_date else None,
         "endDate": grant.end_date.isoformat() if grant.end_date else None,
         "principalInvestigatorId": str(grant.pi_id) if grant.pi_id else None,
-        "coPiIds": [str(pi.id) for pi in grant.co_pis.all()] if hasattr(grant.co_pis, 'all') else [str(pi.id) for pi in grant.co_pis],
+        "coPiIds": co_pi_ids,
         # 'projectIds' are implicitly defined by Project.grantIds
     }
 
+# --- Bulk Export Helpers ---
+# Serializing entities one at a time lazy-loads each relationship per row (notes per researcher,
+# labs/compute resources/grants per project, co-PIs per grant). These helpers instead read each
+# related table once per list of entities and group the rows in Python, so the number of queries
+# does not depend on the number of rows.
+# `whole_table=True` reads the related tables without an IN (...) filter, which is cheaper for a
+# full export; otherwise only rows belonging to the given entities are read (streaming batches).
+def _association_ids(table, owner_column, target_column, owner_ids=None):
+    """Returns {owner_id: [target_id as str, ...]} from one read of an association table."""
+    stmt = db.select(table.c[owner_column], table.c[target_column]).order_by(table.c[owner_column], table.c[target_column])
+    if owner_ids is not None:
+        stmt = stmt.where(table.c[owner_column].in_(owner_ids))
+    grouped = defaultdict(list)
+    for owner_id, target_id in db.session.execute(stmt):
+        grouped[owner_id].append(str(target_id))
+    return grouped
+
+def export_researchers(researchers, whole_table=False):
+    query = Note.query.order_by(Note.id)
+    if not whole_table:
+        query = query.filter(Note.researcher_id.in_([r.id for r in researchers]))
+    notes_by_researcher = defaultdict(list)
+    for note in query:
+        notes_by_researcher[note.researcher_id].append(export_note_to_json(note))
+    return [export_researcher_to_json(r, notes=notes_by_researcher.get(r.id, [])) for r in researchers]
+
+def export_labs(labs, whole_table=False):
+    return [export_lab_to_json(l) for l in labs]
+
+def export_projects(projects, whole_table=False):
+    project_ids = None if whole_table else [p.id for p in projects]
+    lab_ids = _association_ids(project_labs_table, 'project_id', 'lab_id', project_ids)
+    compute_resource_ids = _association_ids(project_compute_resources_table, 'project_id', 'compute_resource_id', project_ids)
+    grant_ids = _association_ids(project_grants_table, 'project_id', 'grant_id', project_ids)
+    return [
+        export_project_to_json(p, lab_ids=lab_ids.get(p.id, []),
+                               compute_resource_ids=compute_resource_ids.get(p.id, []),
+                               grant_ids=grant_ids.get(p.id, []))
+        for p in projects
+    ]
+
+def export_compute_resources(compute_resources, whole_table=False):
+    return [export_compute_resource_to_json(cr) for cr in compute_resources]
+
+def export_grants(grants, whole_table=False):
+    co_pi_ids = _association_ids(grant_co_pis_table, 'grant_id', 'researcher_id', None if whole_table else [g.id for g in grants])
+    return [export_grant_to_json(g, co_pi_ids=co_pi_ids.get(g.id, [])) for g in grants]
+
+# Each entity type is paired with the top-level key it has in the JSON export.
+# Project.labs/compute_resources/grants default to lazy='subquery'; they are not needed here
+# (export_projects reads the association tables) and subquery loading cannot be combined with yield_per.
+def _export_plan():
+    return [
+        ("researchers", Researcher.query.order_by(Researcher.id), export_researchers),
+        ("labs", Lab.query.order_by(Lab.id), export_labs),
+        ("projects", Project.query.order_by(Project.id).options(
+            lazyload(Project.labs), lazyload(Project.compute_resources), lazyload(Project.grants)), export_projects),
+        ("computeResources", ComputeResource.query.order_by(ComputeResource.id), export_compute_resources),
+        ("grants", Grant.query.order_by(Grant.id), export_grants),
+    ]
+
+# --- Streaming (NDJSON) Export ---
+def _batched(iterable, batch_size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def generate_ndjson_export(batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields the export one record per line as {"entity": <top-level key>, "record": {...}}.
+    Rows are read in batches of `batch_size`, so memory use does not grow with the database.
+    """
+    for entity_key, query, serialize_many in _export_plan():
+        for batch in _batched(query.yield_per(batch_size), batch_size):
+            for record in serialize_many(batch):
+                yield current_app.json.dumps_compact({"entity": entity_key, "record": record}) + "\n"
+        # Drop the batch's objects from the identity map before moving on to the next entity
+        db.session.expunge_all()
+
+def _stream_ndjson_export():
+    def generate():
+        try:
+            yield from generate_ndjson_export()
+        except Exception as e:
+            # Headers are already sent at this point, so the client sees a truncated stream.
+            current_app.logger.error(f"Error during streaming data export: {str(e)}")
+            raise
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers["Content-Disposition"] = "attachment; filename=ucr_research_data_export.ndjson"
+    return response
+
 # --- Export Route ---
 @data_bp.route('/export', methods=['GET'])
 def export_data():
+    # ?format=ndjson streams newline-delimited records instead of one JSON document
+    if request.args.get('format', 'json').lower() == 'ndjson':
+        return _stream_ndjson_export()
+
     try:
-        researchers = [export_researcher_to_json(r) for r in Researcher.query.all()]
-        labs = [export_lab_to_json(l) for l in Lab.query.all()]
-        projects = [export_project_to_json(p) for p in Project.query.all()]
-        compute_resources = [export_compute_resource_to_json(cr) for cr in ComputeResource.query.all()]
-        grants = [export_grant_to_json(g) for g in Grant.query.all()]
+        # One query per entity type plus one per related table, independent of row count
+        exported = {entity_key: serialize_many(query.all(), whole_table=True)
+                    for entity_key, query, serialize_many in _export_plan()}
+        researchers = exported["researchers"]
+        labs = exported["labs"]
+        projects = exported["projects"]
+        compute_resources = exported["computeResources"]
+        grants = exported["grants"]
         # Notes are part of researchers in this export structure, but if ApplicationData expects a top-level notes array:
         # notes = [export_note_to_json(n) for n in Note.query.all()]
 
@@ -126,141 +254,118 @@ def export_data():
         current_app.logger.error(f"Error during data export: {str(e)}")
         return jsonify({"error": "Failed to export data", "details": str(e)}), 500
 
-# --- Import Route (Complex - initial structure) ---
+# --- Incremental Sync ("changes since") ---
+# Tokens are opaque to clients; internally they hold the database time the previous sync started.
+# The next token is moved back by CHANGES_SAFETY_WINDOW so rows written by transactions that were
+# still open when the sync ran are picked up next time. Clients should treat records as upserts.
+CHANGES_SAFETY_WINDOW = timedelta(seconds=5)
+
+def _encode_sync_token(moment):
+    return base64.urlsafe_b64encode(json.dumps({"t": moment.isoformat()}).encode()).decode().rstrip("=")
+
+def _decode_sync_token(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        return datetime.fromisoformat(json.loads(base64.urlsafe_b64decode(padded.encode()))["t"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid sync token")
+
+def _changed_since(query, changed_at, since):
+    if since is not None:
+        query = query.filter(changed_at >= since)
+    return query.all()
+
+@data_bp.route('/changes', methods=['GET'])
+def get_changes():
+    token = request.args.get('since')
+    try:
+        since = _decode_sync_token(token) if token else None
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    try:
+        sync_started = db.session.execute(db.select(func.now())).scalar()
+        next_token = _encode_sync_token(sync_started - CHANGES_SAFETY_WINDOW)
+
+        if since is not None and Tombstone.query.filter(
+                Tombstone.entity_type == RESET_ENTITY_TYPE, Tombstone.deleted_at >= since).first():
+            # All data was replaced (e.g. by an import) after the client's last sync
+            return jsonify({"fullResyncRequired": True, "changes": {}, "deleted": [], "nextToken": next_token}), 200
+
+        note_changed_at = func.coalesce(Note.updated_at, Note.created_at) # updated_at is only set on edit
+        changes = {
+            "researchers": export_researchers(_changed_since(Researcher.query.order_by(Researcher.id), Researcher.updated_at, since)),
+            "labs": export_labs(_changed_since(Lab.query.order_by(Lab.id), Lab.updated_at, since)),
+            "projects": export_projects(_changed_since(Project.query.order_by(Project.id).options(
+                lazyload(Project.labs), lazyload(Project.compute_resources), lazyload(Project.grants)), Project.updated_at, since)),
+            "computeResources": export_compute_resources(_changed_since(ComputeResource.query.order_by(ComputeResource.id), ComputeResource.updated_at, since)),
+            "grants": export_grants(_changed_since(Grant.query.order_by(Grant.id), Grant.updated_at, since)),
+            "notes": [export_note_to_json(n) for n in _changed_since(Note.query.order_by(Note.id), note_changed_at, since)],
+        }
+
+        deleted = []
+        if since is not None:
+            tombstones = Tombstone.query.filter(Tombstone.deleted_at >= since, Tombstone.entity_type != RESET_ENTITY_TYPE) \
+                .order_by(Tombstone.id).all()
+            deleted = [{"entity": t.entity_type, "id": str(t.entity_id),
+                        "deletedAt": t.deleted_at.isoformat() if t.deleted_at else None} for t in tombstones]
+
+        return jsonify({"fullResyncRequired": False, "changes": changes, "deleted": deleted, "nextToken": next_token}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error computing data changes: {str(e)}")
+        return jsonify({"error": "Failed to compute changes", "details": str(e)}), 500
+
+# --- Import Route ---
 @data_bp.route('/import', methods=['POST'])
 def import_data():
+    # ?mode=async spools the payload to disk and imports it in a background thread,
+    # so large imports don't hold a gunicorn worker for their whole duration.
+    if request.args.get('mode', '').lower() == 'async':
+        return _submit_async_import()
+
     try:
         data = request.get_json()
         if not data:
             return jsonify({"error": "No data provided"}), 400
 
-        # Basic structural validation
-        expected_keys = ["researchers", "labs", "projects", "computeResources", "grants"]
-        if not all(key in data for key in expected_keys):
-            return jsonify({"error": "Invalid data structure. Missing one or more top-level keys."}), 400
-
-        # **DELETION STRATEGY (Order is crucial due to Foreign Keys)**
-        # 1. Notes (depend on Researchers, Projects)
-        Note.query.delete()
-        # 2. Many-to-Many association tables must be cleared or handled by cascades if parents are deleted.
-        #    SQLAlchemy handles this if objects are removed from collections or if parent is deleted with cascade.
-        #    Alternatively, clear tables directly:
-        #    db.session.execute(project_labs_table.delete()) # etc. for all many-to-many tables.
-        #    This is often cleaner if doing a full wipe.
-        #    However, for this ORM-based import, we'll delete parent objects and expect cascades or clear collections.
-
-        # Clear relationships for objects about to be deleted, or rely on DB cascade / SQLAlchemy cascade.
-        # For instance, before deleting all projects, clear their M2M links if not handled by cascades.
-        for p in Project.query.all(): p.labs.clear(); p.compute_resources.clear(); p.grants.clear()
-        for g in Grant.query.all(): g.co_pis.clear(); g.projects.clear() # Grant.projects is backref from Project.grants
-        for cr in ComputeResource.query.all(): cr.projects.clear()
-        # For Lab.members (Researcher.lab_id) and Lab.principal_investigator_id, these will be set by new data.
-        # If a researcher is deleted, their lab_id FK needs to be nullable or handled.
-
-        # 3. Delete main entities in reverse order of strong dependency or where FKs might cause issues
-        Project.query.delete()
-        Grant.query.delete()
-        ComputeResource.query.delete()
-        # Labs and Researchers have a circular dependency (PI and member).
-        # Nullify Lab.principal_investigator_id and Researcher.lab_id before deleting all.
-        for lab_obj in Lab.query.all(): lab_obj.principal_investigator_id = None
-        for res_obj in Researcher.query.all(): res_obj.lab_id = None
-        db.session.commit() # Commit nullifications
-
-        Lab.query.delete()
-        Researcher.query.delete()
-        db.session.commit() # Commit deletions
-
-
-        # **IMPORTING DATA (Order can also be important)**
-        # Create objects without linking them first if IDs are strings from JSON
-
-        researchers_data = data.get("researchers", [])
-        labs_data = data.get("labs", [])
-        projects_data = data.get("projects", [])
-        compute_resources_data = data.get("computeResources", [])
-        grants_data = data.get("grants", [])
-        all_notes_data = [] # Collect all notes
-
-        # Create Researchers (pass 1 - no lab_id, no notes yet)
-        created_researchers = {} # id_from_json: db_object
-        for r_data in researchers_data:
-            if not r_data.get('name') or not r_data.get('email') or not r_data.get('department'):
-                raise ValueError(f"Researcher data missing required fields: {r_data}")
-            researcher = Researcher(
-                name=r_data['name'], email=r_data['email'], department=r_data['department'], bio=r_data.get('bio')
-            )
-            db.session.add(researcher)
-            # We need to flush to get researcher.id for linking, but commit later.
-            # For now, let's assume we commit in stages or handle linking in a second pass.
-            # To keep it simpler for now, this might fail if not handled carefully with sessions/flushing.
-            # A safer way: create all, then link all.
-            # For now, this example will be simplified and might need refinement for robust ID handling.
-            # This assumes JSON IDs are not reused for DB IDs directly unless they are integers.
-            # The export uses str(id), so import should parse to int or map.
-            # For this simplified version, let's assume we can map them after creation if needed.
-            # Storing notes temporarily:
-            if 'notes' in r_data and r_data['notes']:
-                for note_data in r_data['notes']:
-                    note_data['_researcher_json_id'] = r_data['id'] # Store original ID for later linking
-                    all_notes_data.append(note_data)
-
-
-        # Create Labs (pass 1 - no PI, no projects yet)
-        created_labs = {}
-        for l_data in labs_data:
-            if not l_data.get('name'): raise ValueError(f"Lab data missing name: {l_data}")
-            lab = Lab(name=l_data['name'], description=l_data.get('description'))
-            db.session.add(lab)
-
-        # Create Compute Resources (pass 1 - no projects yet)
-        for cr_data in compute_resources_data:
-            # Basic validation
-            if not all(k in cr_data for k in ['name', 'type', 'specification', 'status']):
-                raise ValueError(f"ComputeResource data missing required fields: {cr_data}")
-            cr = ComputeResource(
-                name=cr_data['name'], resource_type=ComputeResourceType(cr_data['type']),
-                specification=cr_data['specification'], status=ComputeResourceStatus(cr_data['status']),
-                description=cr_data.get('description'), cluster_type=cr_data.get('clusterType'),
-                nodes=cr_data.get('nodes'), cpus_per_node=cr_data.get('cpusPerNode'),
-                gpus_per_node=cr_data.get('gpusPerNode'), memory_per_node=cr_data.get('memoryPerNode'),
-                storage_per_node=cr_data.get('storagePerNode'), network_bandwidth=cr_data.get('networkBandwidth')
-            )
-            db.session.add(cr)
-
-        db.session.flush() # Flush to get IDs for newly created objects above
-
-        # Map JSON IDs to DB IDs (example for researchers)
-        # This is crucial if JSON IDs are strings and DB IDs are integers.
-        # This simplified example assumes a direct mapping or that we handle it.
-        # A more robust way is to build id_map[json_id] = db_object.id after each flush.
-
-        # For this example, let's assume IDs in JSON can be mapped/found.
-        # A full import requires careful ID management (json_id -> db_id).
-        # This is a complex part often requiring multiple passes or temporary ID storage.
-        # Due to tool turn limits, I'll simplify and focus on structure.
-        # The following linking steps would need robust ID mapping.
-
-        # Link Researchers to Labs (pass 2)
-        # Link Labs to PIs (pass 2)
-        # Create Projects, Grants and link them (pass 2)
-        # Create Notes (pass 3)
-
-        # This simplified import will likely fail on relationships without proper ID mapping
-        # and multi-pass processing. The deletion part is also complex.
-        # Given the constraints, providing a fully robust import is challenging.
-        # I will focus on the structure and highlight the complexities.
-
-        # Committing all additions
+        # Structure is validated by import_application_data (ValueError below), as for async jobs.
+        # Deletes and bulk inserts run in a single transaction, so a failed import leaves the old data in place
+        counts = import_application_data(data)
         db.session.commit()
-        # Second commit after linking relationships would be safer.
 
-        return jsonify({"message": "Data import attempted. This is a simplified version and may require refinement for robust relationship handling."}), 200
+        return jsonify({"message": "Data imported successfully", "imported": counts}), 200
 
     except ValueError as ve: # For data validation errors
         db.session.rollback()
         return jsonify({"error": "Invalid data provided", "details": str(ve)}), 400
+    except IntegrityError as ie: # e.g. duplicate emails or grant numbers in the payload
+        db.session.rollback()
+        return jsonify({"error": "Import data violates a database constraint", "details": str(ie.orig)}), 400
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error during data import: {str(e)}")
         return jsonify({"error": "Failed to import data", "details": str(e)}), 500
+
+# --- Asynchronous Import Jobs ---
+def _submit_async_import():
+    # The body is read until EOF, so chunked uploads without Content-Length work too
+    try:
+        job_id = submit_import_job(request.stream, current_app._get_current_object())
+    except ValueError as ve: # Empty body
+        return jsonify({"error": str(ve)}), 400
+    except (OSError, SQLAlchemyError) as e:
+        current_app.logger.error(f"Error queuing import job: {str(e)}")
+        return jsonify({"error": "Failed to queue import job", "details": str(e)}), 500
+
+    return jsonify({
+        "message": "Import job queued",
+        "jobId": job_id,
+        "statusUrl": url_for('data_bp.get_import_job_status', job_id=job_id)
+    }), 202
+
+@data_bp.route('/import/<job_id>', methods=['GET'])
+def get_import_job_status(job_id):
+    status = get_import_job(job_id)
+    if not status:
+        return jsonify({"error": "Import job not found"}), 404
+    return jsonify(status), 200
@@ -3,6 +3,10 @@ from models.models import Grant, Researcher, Project # GrantStatus enum is handl
 from app import db
 from schemas import GrantSchema # Import GrantSchema
 from marshmallow import ValidationError
+from routes.pagination import paginate_query
+from routes.serializers import compile_dump
+from routes.resolvers import resolve_ids, missing_ids_response
+from routes.bulk import bulk_save, bulk_request_error, bulk_error_response, UniqueField, Reference, Relation
 # Removed datetime import as schema handles date parsing/validation
 
 grant_bp = Blueprint('grant_bp', __name__)
@@ -10,6 +14,7 @@ grant_bp = Blueprint('grant_bp', __name__)
 # Instantiate schemas
 grant_schema = GrantSchema()
 grants_schema = GrantSchema(many=True)
+grants_dump = compile_dump(grants_schema) # Same output as grants_schema.dump, for the list endpoint
 # For updates, use grant_schema(partial=True)
 
 @grant_bp.route('', methods=['POST'])
@@ -29,20 +34,16 @@ def create_grant():
             return jsonify({"error": f"Principal Investigator with id {new_grant.pi_id} not found"}), 404
 
         if 'coPiIds' in json_data and json_data['coPiIds']:
-            new_grant.co_pis.clear()
-            for co_pi_id in json_data['coPiIds']:
-                co_pi = Researcher.query.get(co_pi_id)
-                if not co_pi:
-                    return jsonify({"error": f"Co-PI Researcher with id {co_pi_id} not found"}), 404
-                new_grant.co_pis.append(co_pi)
+            co_pis, missing = resolve_ids(Researcher, json_data['coPiIds'])
+            if missing:
+                return missing_ids_response("Co-PI Researcher", missing)
+            new_grant.co_pis = co_pis
 
         if 'projectIds' in json_data and json_data['projectIds']:
-            new_grant.projects.clear()
-            for project_id in json_data['projectIds']:
-                project = Project.query.get(project_id)
-                if not project:
-                    return jsonify({"error": f"Project with id {project_id} not found"}), 404
-                new_grant.projects.append(project)
+            projects, missing = resolve_ids(Project, json_data['projectIds'])
+            if missing:
+                return missing_ids_response("Project", missing)
+            new_grant.projects = projects
 
         # db.session.add(new_grant) # Not needed if load_instance=True and session is bound
         db.session.commit()
@@ -52,18 +53,30 @@ def create_grant():
 
 @grant_bp.route('', methods=['GET'])
 def get_grants():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-
-    grants_page = Grant.query.paginate(page=page, per_page=per_page, error_out=False)
-    result = grants_schema.dump(grants_page.items)
+    # Offset pagination (?page=&per_page=) or keyset pagination (?after=&limit=); see routes/pagination.py
+    try:
+        return jsonify(paginate_query(Grant.query, Grant, "grants", grants_dump))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
 
-    return jsonify({
-        "grants": result,
-        "total_pages": grants_page.pages,
-        "current_page": grants_page.page,
-        "total_items": grants_page.total
-    })
+@grant_bp.route('/bulk', methods=['POST'])
+def bulk_save_grants():
+    json_data = request.get_json()
+    error_response = bulk_request_error(json_data)
+    if error_response:
+        return error_response
+
+    saved, errors = bulk_save(
+        Grant, grant_schema, grant_schema, json_data,
+        unique_fields=[UniqueField("grant_number", "Grant number")],
+        references=[Reference("pi_id", Researcher, "Principal Investigator", "principalInvestigatorId")],
+        relations=[
+            Relation("coPiIds", "co_pis", Researcher, "Co-PI Researcher"),
+            Relation("projectIds", "projects", Project, "Project"),
+        ])
+    if errors:
+        return bulk_error_response(errors)
+    return jsonify({"grants": grants_schema.dump(saved)}), 201
 
 @grant_bp.route('/<int:id>', methods=['GET'])
 def get_grant(id):
@@ -91,20 +104,16 @@ def update_grant(id):
 
         # Manual handling for M2M relationships based on IDs from json_data
         if 'coPiIds' in json_data:
-            updated_grant.co_pis.clear()
-            for co_pi_id in json_data['coPiIds']:
-                co_pi = Researcher.query.get(co_pi_id)
-                if not co_pi:
-                    return jsonify({"error": f"Co-PI Researcher with id {co_pi_id} not found"}), 404
-                updated_grant.co_pis.append(co_pi)
+            co_pis, missing = resolve_ids(Researcher, json_data['coPiIds'])
+            if missing:
+                return missing_ids_response("Co-PI Researcher", missing)
+            updated_grant.co_pis = co_pis
 
         if 'projectIds' in json_data:
-            updated_grant.projects.clear()
-            for project_id in json_data['projectIds']:
-                project = Project.query.get(project_id)
-                if not project:
-                    return jsonify({"error": f"Project with id {project_id} not found"}), 404
-                updated_grant.projects.append(project)
+            projects, missing = resolve_ids(Project, json_data['projectIds'])
+            if missing:
+                return missing_ids_response("Project", missing)
+            updated_grant.projects = projects
 
         db.session.commit()
         return jsonify(grant_schema.dump(updated_grant))
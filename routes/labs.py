@@ -3,12 +3,17 @@ from models.models import Lab, Researcher, Project
 from app import db
 from schemas import LabSchema # Import LabSchema
 from marshmallow import ValidationError
+from routes.pagination import paginate_query
+from routes.serializers import compile_dump
+from routes.resolvers import resolve_ids, missing_ids_response
+from routes.bulk import bulk_save, bulk_request_error, bulk_error_response, UniqueField, Reference, Relation
 
 lab_bp = Blueprint('lab_bp', __name__)
 
 # Instantiate schemas
 lab_schema = LabSchema()
 labs_schema = LabSchema(many=True)
+labs_dump = compile_dump(labs_schema) # Same output as labs_schema.dump, for the list endpoint
 # For updates, we'll use lab_schema with partial=True: LabSchema(partial=True)
 
 @lab_bp.route('', methods=['POST'])
@@ -37,12 +42,10 @@ def create_lab():
 
 
         if 'projectIds' in json_data and json_data['projectIds']:
-            new_lab.projects.clear() # Clear existing before adding new ones, if any
-            for project_id in json_data['projectIds']:
-                project = Project.query.get(project_id)
-                if not project:
-                    return jsonify({"error": f"Project with id {project_id} not found"}), 404
-                new_lab.projects.append(project)
+            projects, missing = resolve_ids(Project, json_data['projectIds'])
+            if missing:
+                return missing_ids_response("Project", missing)
+            new_lab.projects = projects
 
         db.session.add(new_lab) # Add the instance if schema didn't auto-add via session
         db.session.commit()
@@ -52,18 +55,27 @@ def create_lab():
 
 @lab_bp.route('', methods=['GET'])
 def get_labs():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-
-    labs_page = Lab.query.paginate(page=page, per_page=per_page, error_out=False)
-    result = labs_schema.dump(labs_page.items)
+    # Offset pagination (?page=&per_page=) or keyset pagination (?after=&limit=); see routes/pagination.py
+    try:
+        return jsonify(paginate_query(Lab.query, Lab, "labs", labs_dump))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
 
-    return jsonify({
-        "labs": result,
-        "total_pages": labs_page.pages,
-        "current_page": labs_page.page,
-        "total_items": labs_page.total
-    })
+@lab_bp.route('/bulk', methods=['POST'])
+def bulk_save_labs():
+    json_data = request.get_json()
+    error_response = bulk_request_error(json_data)
+    if error_response:
+        return error_response
+
+    saved, errors = bulk_save(
+        Lab, lab_schema, lab_schema, json_data,
+        unique_fields=[UniqueField("name", "Lab name")],
+        references=[Reference("principal_investigator_id", Researcher, "Principal Investigator", "principalInvestigatorId")],
+        relations=[Relation("projectIds", "projects", Project, "Project")])
+    if errors:
+        return bulk_error_response(errors)
+    return jsonify({"labs": labs_schema.dump(saved)}), 201
 
 @lab_bp.route('/<int:id>', methods=['GET'])
 def get_lab(id):
@@ -101,12 +113,10 @@ def update_lab(id):
                 lab_instance.principal_investigator_id = None
 
         if 'projectIds' in json_data:
-            lab_instance.projects.clear() # Clear existing before adding new ones
-            for project_id in json_data['projectIds']:
-                project = Project.query.get(project_id)
-                if not project:
-                    return jsonify({"error": f"Project with id {project_id} not found"}), 404
-                lab_instance.projects.append(project)
+            projects, missing = resolve_ids(Project, json_data['projectIds'])
+            if missing:
+                return missing_ids_response("Project", missing)
+            lab_instance.projects = projects
 
         db.session.commit()
         return jsonify(lab_schema.dump(lab_instance))
@@ -0,0 +1,76 @@
+from flask import request
+import base64
+import json
+
+# Shared list-endpoint pagination.
+# Offset mode (?page=&per_page=) keeps the original response shape.
+# Keyset mode (?after=<cursor>&limit=) seeks past the last id seen instead of using OFFSET,
+# so every page costs the same regardless of depth. Clients pass back the opaque `next_cursor`.
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """Decodes a cursor produced by encode_cursor. A plain integer id is accepted as well."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded.encode()))["id"])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return int(cursor)
+    except ValueError:
+        raise ValueError("Invalid pagination cursor")
+
+def _bool_arg(name, default):
+    value = request.args.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ("0", "false", "no", "off")
+
+def paginate_query(query, model, items_key, dump):
+    """
+    Paginates `query` according to the request args and returns the response dict.
+    Args:
+        query: The base query (unordered); it is ordered by `model.id` here.
+        model: The model class, used for its `id` column.
+        items_key (str): Key under which the serialized items are returned (e.g. "researchers").
+        dump (callable): Serializes a list of model instances (e.g. researchers_schema.dump, or its compile_dump() version).
+    Raises ValueError for an invalid cursor.
+    ?with_total=false skips the COUNT(*) query (defaults to true in offset mode, false in keyset mode).
+    """
+    if 'after' in request.args or 'limit' in request.args:
+        limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+        with_total = _bool_arg('with_total', False)
+
+        keyset_query = query.order_by(model.id)
+        after = request.args.get('after')
+        if after:
+            keyset_query = keyset_query.filter(model.id > decode_cursor(after))
+        # Fetch one extra row to learn whether another page exists without counting
+        rows = keyset_query.limit(limit + 1).all()
+        items = rows[:limit]
+        has_more = len(rows) > limit
+
+        result = {
+            items_key: dump(items),
+            "next_cursor": encode_cursor(items[-1].id) if has_more else None,
+            "has_more": has_more,
+        }
+        if with_total:
+            result["total_items"] = query.order_by(None).count()
+        return result
+
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE)
+    with_total = _bool_arg('with_total', True)
+
+    page_obj = query.order_by(model.id).paginate(page=page, per_page=per_page, error_out=False, count=with_total)
+    return {
+        items_key: dump(page_obj.items),
+        "total_pages": page_obj.pages if with_total else None,
+        "current_page": page_obj.page,
+        "total_items": page_obj.total if with_total else None,
+    }
@@ -3,6 +3,10 @@ from models.models import Project, Researcher, Lab, ComputeResource, Grant, Note
 from app import db
 from schemas import ProjectSchema # Import ProjectSchema
 from marshmallow import ValidationError
+from routes.pagination import paginate_query
+from routes.serializers import compile_dump
+from routes.resolvers import resolve_ids, missing_ids_response
+from routes.bulk import bulk_save, bulk_request_error, bulk_error_response, Reference, Relation
 from datetime import datetime # Keep for manual date parsing if needed, though schema handles it
 
 project_bp = Blueprint('project_bp', __name__)
@@ -10,6 +14,7 @@ project_bp = Blueprint('project_bp', __name__)
 # Instantiate schemas
 project_schema = ProjectSchema()
 projects_schema = ProjectSchema(many=True)
+projects_dump = compile_dump(projects_schema) # Same output as projects_schema.dump, for the list endpoint
 # For updates, use project_schema(partial=True) or define ProjectUpdateSchema
 
 @project_bp.route('', methods=['POST'])
@@ -30,28 +35,22 @@ def create_project():
             return jsonify({"error": f"Lead Researcher (PI) with id {new_project.pi_id} not found"}), 404
 
         if 'labIds' in json_data and json_data['labIds']:
-            new_project.labs.clear()
-            for lab_id in json_data['labIds']: # Use original json_data for IDs
-                lab = Lab.query.get(lab_id)
-                if not lab:
-                    return jsonify({"error": f"Lab with id {lab_id} not found"}), 404
-                new_project.labs.append(lab)
+            labs, missing = resolve_ids(Lab, json_data['labIds'])
+            if missing:
+                return missing_ids_response("Lab", missing)
+            new_project.labs = labs
 
         if 'computeResourceIds' in json_data and json_data['computeResourceIds']:
-            new_project.compute_resources.clear()
-            for cr_id in json_data['computeResourceIds']:
-                cr = ComputeResource.query.get(cr_id)
-                if not cr:
-                    return jsonify({"error": f"Compute Resource with id {cr_id} not found"}), 404
-                new_project.compute_resources.append(cr)
+            compute_resources, missing = resolve_ids(ComputeResource, json_data['computeResourceIds'])
+            if missing:
+                return missing_ids_response("Compute Resource", missing)
+            new_project.compute_resources = compute_resources
 
         if 'grantIds' in json_data and json_data['grantIds']:
-            new_project.grants.clear()
-            for grant_id in json_data['grantIds']:
-                grant = Grant.query.get(grant_id)
-                if not grant:
-                    return jsonify({"error": f"Grant with id {grant_id} not found"}), 404
-                new_project.grants.append(grant)
+            grants, missing = resolve_ids(Grant, json_data['grantIds'])
+            if missing:
+                return missing_ids_response("Grant", missing)
+            new_project.grants = grants
 
         # If not using load_instance=True or if session needs to be aware:
         # db.session.add(new_project)
@@ -62,18 +61,30 @@ def create_project():
 
 @project_bp.route('', methods=['GET'])
 def get_projects():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-
-    projects_page = Project.query.paginate(page=page, per_page=per_page, error_out=False)
-    result = projects_schema.dump(projects_page.items)
+    # Offset pagination (?page=&per_page=) or keyset pagination (?after=&limit=); see routes/pagination.py
+    try:
+        return jsonify(paginate_query(Project.query, Project, "projects", projects_dump))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
 
-    return jsonify({
-        "projects": result,
-        "total_pages": projects_page.pages,
-        "current_page": projects_page.page,
-        "total_items": projects_page.total
-    })
+@project_bp.route('/bulk', methods=['POST'])
+def bulk_save_projects():
+    json_data = request.get_json()
+    error_response = bulk_request_error(json_data)
+    if error_response:
+        return error_response
+
+    saved, errors = bulk_save(
+        Project, project_schema, project_schema, json_data,
+        references=[Reference("pi_id", Researcher, "Lead Researcher (PI)", "leadResearcherId")],
+        relations=[
+            Relation("labIds", "labs", Lab, "Lab"),
+            Relation("computeResourceIds", "compute_resources", ComputeResource, "Compute Resource"),
+            Relation("grantIds", "grants", Grant, "Grant"),
+        ])
+    if errors:
+        return bulk_error_response(errors)
+    return jsonify({"projects": projects_schema.dump(saved)}), 201
 
 @project_bp.route('/<int:id>', methods=['GET'])
 def get_project(id):
@@ -101,28 +112,22 @@ def update_project(id):
                 return jsonify({"error": f"Lead Researcher (PI) with id {updated_project.pi_id} not found"}), 404
 
         if 'labIds' in json_data:
-            updated_project.labs.clear()
-            for lab_id in json_data['labIds']:
-                lab = Lab.query.get(lab_id)
-                if not lab:
-                    return jsonify({"error": f"Lab with id {lab_id} not found"}), 404
-                updated_project.labs.append(lab)
+            labs, missing = resolve_ids(Lab, json_data['labIds'])
+            if missing:
+                return missing_ids_response("Lab", missing)
+            updated_project.labs = labs
 
         if 'computeResourceIds' in json_data:
-            updated_project.compute_resources.clear()
-            for cr_id in json_data['computeResourceIds']:
-                cr = ComputeResource.query.get(cr_id)
-                if not cr:
-                    return jsonify({"error": f"Compute Resource with id {cr_id} not found"}), 404
-                updated_project.compute_resources.append(cr)
+            compute_resources, missing = resolve_ids(ComputeResource, json_data['computeResourceIds'])
+            if missing:
+                return missing_ids_response("Compute Resource", missing)
+            updated_project.compute_resources = compute_resources
 
         if 'grantIds' in json_data:
-            updated_project.grants.clear()
-            for grant_id in json_data['grantIds']:
-                grant = Grant.query.get(grant_id)
-                if not grant:
-                    return jsonify({"error": f"Grant with id {grant_id} not found"}), 404
-                updated_project.grants.append(grant)
+            grants, missing = resolve_ids(Grant, json_data['grantIds'])
+            if missing:
+                return missing_ids_response("Grant", missing)
+            updated_project.grants = grants
 
         db.session.commit()
         return jsonify(project_schema.dump(updated_project))
@@ -4,12 +4,16 @@ from app import db
 from datetime import datetime, timezone # Import timezone
 from schemas import ResearcherSchema, NoteSchema, ResearcherUpdateSchema # Import schemas
 from marshmallow import ValidationError # For explicit error handling if not using app.errorhandler
+from routes.pagination import paginate_query
+from routes.serializers import compile_dump
+from routes.bulk import bulk_save, bulk_request_error, bulk_error_response, UniqueField, Reference
 
 researcher_bp = Blueprint('researcher_bp', __name__)
 
 # Instantiate schemas
 researcher_schema = ResearcherSchema()
 researchers_schema = ResearcherSchema(many=True) # For lists of researchers
+researchers_dump = compile_dump(researchers_schema) # Same output as researchers_schema.dump, for the list endpoint
 researcher_update_schema = ResearcherUpdateSchema()
 note_schema = NoteSchema() # For single note responses
 # notes_schema = NoteSchema(many=True) # If ever needed for lists of notes standalone
@@ -43,19 +47,26 @@ def create_researcher():
 
 @researcher_bp.route('', methods=['GET'])
 def get_researchers():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-
-    researchers_page = Researcher.query.paginate(page=page, per_page=per_page, error_out=False)
-    # Serialize the list of researcher objects
-    result = researchers_schema.dump(researchers_page.items)
-
-    return jsonify({
-        "researchers": result,
-        "total_pages": researchers_page.pages,
-        "current_page": researchers_page.page,
-        "total_items": researchers_page.total
-    })
+    # Offset pagination (?page=&per_page=) or keyset pagination (?after=&limit=); see routes/pagination.py
+    try:
+        return jsonify(paginate_query(Researcher.query, Researcher, "researchers", researchers_dump))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+@researcher_bp.route('/bulk', methods=['POST'])
+def bulk_save_researchers():
+    json_data = request.get_json()
+    error_response = bulk_request_error(json_data)
+    if error_response:
+        return error_response
+
+    saved, errors = bulk_save(
+        Researcher, researcher_schema, researcher_update_schema, json_data,
+        unique_fields=[UniqueField("email", "Email")],
+        references=[Reference("lab_id", Lab, "Lab", "lab_id")])
+    if errors:
+        return bulk_error_response(errors)
+    return jsonify({"researchers": researchers_schema.dump(saved)}), 201
 
 @researcher_bp.route('/<int:id>', methods=['GET'])
 def get_researcher(id):
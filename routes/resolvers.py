@@ -0,0 +1,32 @@
+from flask import jsonify
+
+# Shared helpers for linking relationships from lists of ids in request payloads
+# (labIds, computeResourceIds, grantIds, coPiIds, projectIds).
+# Each list is fetched with a single IN (...) query instead of one .get() per id.
+
+def resolve_ids(model, ids):
+    """
+    Fetches the rows of `model` whose primary keys are in `ids` with one query.
+    Args:
+        model: The model class (e.g. Lab).
+        ids (list): Ids from the request payload; ints or numeric strings. Duplicates are ignored.
+    Returns:
+        tuple: (objects in the order of `ids`, list of ids that were not found or are not valid ids)
+    """
+    wanted = []
+    missing = []
+    for raw_id in ids or []:
+        try:
+            wanted.append(int(raw_id))
+        except (TypeError, ValueError):
+            missing.append(raw_id)
+    wanted = list(dict.fromkeys(wanted))
+
+    found = {obj.id: obj for obj in model.query.filter(model.id.in_(wanted)).all()} if wanted else {}
+    missing += [entity_id for entity_id in wanted if entity_id not in found]
+    return [found[entity_id] for entity_id in wanted if entity_id in found], missing
+
+def missing_ids_response(label, missing):
+    """404 response listing every id that could not be resolved, e.g. label="Compute Resource"."""
+    ids_str = ", ".join(str(entity_id) for entity_id in missing)
+    return jsonify({"error": f"{label} with id(s) {ids_str} not found", "missingIds": missing}), 404
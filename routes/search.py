@@ -0,0 +1,24 @@
+from flask import Blueprint, request, jsonify, current_app
+from services.search_index import search, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT
+
+search_bp = Blueprint('search_bp', __name__)
+
+# Full-text search over researchers, projects, grants and notes using the local database index.
+# GET /api/search?q=<text>[&type=researchers,notes][&limit=20]
+@search_bp.route('', methods=['GET'])
+def search_entities():
+    query = request.args.get('q', '')
+    if not query.strip():
+        return jsonify({"error": "Missing 'q' query parameter"}), 400
+
+    entity_types = [t.strip() for t in request.args.get('type', '').split(',') if t.strip()]
+    limit = min(max(request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int), 1), MAX_SEARCH_LIMIT)
+
+    try:
+        results = search(query, entity_types, limit)
+        return jsonify({"query": query, "results": results}), 200
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error during search: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred during search."}), 500
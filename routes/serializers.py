@@ -0,0 +1,116 @@
+import os
+import keyword
+from marshmallow import fields
+from marshmallow_enum import EnumField, LoadDumpOptions
+from marshmallow_sqlalchemy.fields import Related, RelatedList
+
+# Compiled serializers for the list endpoints.
+# schema.dump walks every field of every nested schema through marshmallow's generic machinery
+# (get_value, serialize, _serialize per field and object). compile_dump() reads a schema's dump fields
+# once and generates a plain Python function per schema (nested schemas included) that builds the same
+# dict with direct attribute access, e.g. for MiniLabSchema:
+#     def _dump_MiniLabSchema_1(obj):
+#         return {'id': obj.id, 'name': obj.name}
+# The output keys, data_keys and value formats are taken from the schemas in schemas.py, so the JSON stays
+# the same when a schema changes. Field types without a compiled form (e.g. Method, Function) and schemas
+# with pre/post dump hooks go through marshmallow for that field or schema.
+# Marshmallow is still used for all input (load/validation).
+# FAST_SERIALIZERS=false makes compile_dump return schema.dump unchanged.
+FAST_SERIALIZERS = os.environ.get("FAST_SERIALIZERS", "true").lower() != "false"
+
+_DUMP_HOOKS = ("pre_dump", "post_dump")
+
+
+class _SchemaCompiler:
+    """Generates the source of one dump function per schema instance and compiles them together."""
+    def __init__(self):
+        self.namespace = {}
+        self.sources = []
+        self.function_names = {} # id(schema) -> generated function name
+
+    def function_for(self, schema) -> str:
+        """Name of the generated function serializing one object with `schema` (generated on first use)."""
+        name = self.function_names.get(id(schema))
+        if name:
+            return name
+        name = f"_dump_{type(schema).__name__}_{len(self.function_names)}"
+        self.function_names[id(schema)] = name # Before the fields, so self-referencing schemas terminate
+
+        if any(schema._hooks.get(tag) for tag in _DUMP_HOOKS):
+            # Hooks can reshape the output; let marshmallow run them
+            self.namespace[f"{name}_schema"] = schema
+            self.sources.append(f"def {name}(obj):\n    return {name}_schema.dump(obj, many=False)\n")
+            return name
+
+        entries = []
+        for field_name, field in schema.dump_fields.items():
+            key = field.data_key if field.data_key is not None else field_name
+            entries.append(f"        {key!r}: {self._expression(schema, field_name, field)},")
+        self.sources.append(f"def {name}(obj):\n    return {{\n" + "\n".join(entries) + "\n    }\n")
+        return name
+
+    def _expression(self, schema, field_name, field) -> str:
+        """Python expression for the field's serialized value, given the object as `obj`."""
+        attribute = field.attribute or field_name
+        if not attribute.isidentifier() or keyword.iskeyword(attribute):
+            return self._fallback(schema, field_name, field) # Dotted paths, dict keys, ...
+        value = f"obj.{attribute}"
+        kind = type(field)
+
+        # Column types already guarantee these values, so marshmallow's int()/str() calls are no-ops
+        if kind in (fields.Field, fields.Raw, fields.String, fields.Email) or (kind is fields.Integer and not field.as_string):
+            return value
+        if kind is fields.Float and not field.as_string:
+            return f"(float(_v) if (_v := {value}) is not None else None)"
+        if kind is fields.DateTime and (field.format or "iso") in ("iso", "iso8601"):
+            return f"(_v.isoformat() if (_v := {value}) is not None else None)"
+        if kind is EnumField:
+            member = "value" if field.dump_by == LoadDumpOptions.value else "name"
+            return f"(_v.{member} if (_v := {value}) is not None else None)"
+        if kind is fields.Nested:
+            dump = self.function_for(field.schema)
+            if field.many or field.schema.many:
+                return f"([{dump}(_i) for _i in _v] if (_v := {value}) is not None else None)"
+            return f"({dump}(_v) if (_v := {value}) is not None else None)"
+        if kind is fields.List and type(field.inner) is fields.Nested and not (field.inner.many or field.inner.schema.many):
+            dump = self.function_for(field.inner.schema)
+            return f"([{dump}(_i) for _i in _v] if (_v := {value}) is not None else None)"
+        # Relationships dumped as their primary key (include_relationships=True), e.g. ResearcherSchema.lab
+        if kind is Related and len(field.related_keys) == 1:
+            return f"(_v.{field.related_keys[0].key} if (_v := {value}) is not None else None)"
+        if kind is RelatedList and type(field.inner) is Related and len(field.inner.related_keys) == 1:
+            return f"([_i.{field.inner.related_keys[0].key} for _i in _v] if (_v := {value}) is not None else None)"
+        return self._fallback(schema, field_name, field)
+
+    def _fallback(self, schema, field_name, field) -> str:
+        """Serializes the field through marshmallow, as Schema.dump would."""
+        field_ref = f"_field_{len(self.namespace)}"
+        accessor_ref = f"{field_ref}_accessor"
+        self.namespace[field_ref] = field
+        self.namespace[accessor_ref] = schema.get_attribute
+        return f"{field_ref}.serialize({field_name!r}, obj, accessor={accessor_ref})"
+
+    def compile(self, schema):
+        name = self.function_for(schema)
+        source = "\n".join(self.sources)
+        exec(compile(source, f"<compiled {type(schema).__name__}>", "exec"), self.namespace)
+        return self.namespace[name]
+
+
+def compile_dump(schema):
+    """
+    Compiles `schema` into a function producing the same output as `schema.dump`.
+    Args:
+        schema: A marshmallow schema instance, e.g. ProjectSchema(many=True).
+    Returns:
+        callable: Takes an object (or an iterable of objects if schema.many) and returns the dict (or list of dicts).
+            schema.dump itself if FAST_SERIALIZERS is off.
+    Objects are expected to have every attribute the schema dumps (model instances do); marshmallow would
+    leave a missing attribute out, while the compiled function raises AttributeError.
+    """
+    if not FAST_SERIALIZERS:
+        return schema.dump
+    dump_one = _SchemaCompiler().compile(schema)
+    if schema.many:
+        return lambda objs: [dump_one(obj) for obj in objs]
+    return dump_one
@@ -1,7 +1,7 @@
 from app import ma, db # Import ma and db from app.py
 # Import all necessary models
 from models.models import Researcher, Note, Lab, Project, ComputeResource, Grant, \
-    ComputeResourceType, ComputeResourceStatus # Enums
+    ComputeResourceType, ComputeResourceStatus, GrantStatus # Enums
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema, auto_field
 from marshmallow import fields
 from marshmallow_enum import EnumField # Import EnumField
@@ -55,6 +55,7 @@ class ResearcherSchema(SQLAlchemyAutoSchema):
         load_instance = True
         sqla_session = db.session
         include_relationships = True # Handles 'notes', 'led_labs', etc. for dumping
+        dump_only = ("updated_at",) # Maintained by the database
 
     name = auto_field(required=True)
     email = fields.Email(required=True)
@@ -76,6 +77,7 @@ class ResearcherUpdateSchema(SQLAlchemyAutoSchema):
         load_instance = True
         sqla_session = db.session
         # partial=True will be used at instantiation in route
+        dump_only = ("updated_at",) # Maintained by the database
 
     name = auto_field(required=False)
     email = fields.Email(required=False, allow_none=True)
@@ -94,6 +96,7 @@ class LabSchema(SQLAlchemyAutoSchema):
         load_instance = True
         sqla_session = db.session
         include_relationships = False # Define explicitly
+        dump_only = ("updated_at",) # Maintained by the database
 
     name = auto_field(required=True)
     description = auto_field(required=False, allow_none=True) # Model has nullable=True
@@ -115,6 +118,7 @@ class ProjectSchema(SQLAlchemyAutoSchema):
         load_instance = True
         sqla_session = db.session
         include_relationships = False
+        dump_only = ("updated_at",) # Maintained by the database
 
     name = auto_field(required=True)
     description = auto_field(required=False, allow_none=True) # Model has nullable=True
@@ -140,6 +144,7 @@ class ComputeResourceSchema(SQLAlchemyAutoSchema):
         load_instance = True
         sqla_session = db.session
         include_relationships = False
+        dump_only = ("updated_at",) # Maintained by the database
 
     name = auto_field(required=True)
     # The model stores 'resource_type', JSON API uses 'type'
@@ -167,6 +172,7 @@ class GrantSchema(SQLAlchemyAutoSchema):
         load_instance = True
         sqla_session = db.session
         include_relationships = False # Define explicitly
+        dump_only = ("updated_at",) # Maintained by the database
 
     # Core fields - required status inferred from model's nullable=False
     # Model fields: title(F), description(T), amount(F), status(F), agency(F)
@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from sqlalchemy import event, select, delete, func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, lazyload
+from app import db
+from models.models import Researcher, Lab, Project, ComputeResource, Grant, Note, DataVersion
+
+# Versioned snapshot of the serialized data that the AI global search (and researcher matching)
+# use as context. Instead of querying and serializing every table per request:
+#   - right after a transaction that wrote through the ORM commits, a row is added to the data_version
+#     table in a short transaction of its own (session events below), so instances on every host see it;
+#     concurrent writers only insert, so they never wait on each other for this;
+#   - a request reads the version, max(data_version.id) (an index lookup), and only rebuilds the
+#     snapshot (six queries) when it differs from the one held in memory;
+#   - a rebuilt snapshot is cached pre-serialized in CONTEXT_SNAPSHOT_DIR, so other gunicorn
+#     workers on the same host load it from disk instead of querying again.
+# The version is read before the tables are, so a write that commits during a rebuild always leaves the
+# snapshot outdated rather than silently stale. A row's id is allocated after its write committed, so
+# data behind a lower id that becomes visible later was already committed when a higher id was read.
+# If a worker dies between committing and adding its row, the snapshot is stale until the max age below.
+# Writes that bypass the ORM (psql, migrations) don't change the version; snapshots older than
+# CONTEXT_SNAPSHOT_MAX_AGE seconds are rebuilt anyway so those show up eventually (0 disables this).
+
+CONTEXT_SNAPSHOT_DIR = os.environ.get("CONTEXT_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "ucr_context_snapshot"))
+CONTEXT_SNAPSHOT_MAX_AGE = float(os.environ.get("CONTEXT_SNAPSHOT_MAX_AGE", 300))
+
+_SNAPSHOT_FILE = "snapshot.json"
+_WROTE = "context_snapshot_wrote" # session.info flag: this transaction changed data
+_PRUNE_EVERY = 1000 # Older data_version rows are deleted whenever an id is a multiple of this
+_versions = DataVersion.__table__
+
+_lock = threading.Lock()
+_snapshot = {"version": None, "context": None, "built_at": 0.0}
+
+
+def _path(name):
+    return os.path.join(CONTEXT_SNAPSHOT_DIR, name)
+
+def _write_atomic(name, text):
+    os.makedirs(CONTEXT_SNAPSHOT_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CONTEXT_SNAPSHOT_DIR, prefix=f".{name}.")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, _path(name))
+
+def _read(name):
+    try:
+        with open(_path(name)) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def _is_fresh(built_at) -> bool:
+    return CONTEXT_SNAPSHOT_MAX_AGE <= 0 or time.time() - built_at < CONTEXT_SNAPSHOT_MAX_AGE
+
+def current_version() -> str:
+    """The shared data version: the newest data_version id ("0" before the first write)."""
+    return str(db.session.execute(select(func.max(_versions.c.id))).scalar() or 0)
+
+def _record_write():
+    """Adds a data_version row in its own transaction, pruning older rows now and then."""
+    try:
+        with db.engine.begin() as conn:
+            version = conn.execute(_versions.insert()).inserted_primary_key[0]
+            if version % _PRUNE_EVERY == 0:
+                conn.execute(delete(_versions).where(_versions.c.id < version))
+    except SQLAlchemyError as e:
+        # The write itself is committed; snapshots catch up after CONTEXT_SNAPSHOT_MAX_AGE
+        print(f"Failed to record a data version: {e}")
+
+
+# --- Write tracking ---
+@event.listens_for(Session, 'after_flush')
+def _note_flush(session, flush_context):
+    if session.new or session.dirty or session.deleted:
+        session.info[_WROTE] = True
+
+@event.listens_for(Session, 'do_orm_execute')
+def _note_bulk_statement(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements (import, Query.delete()) bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_WROTE] = True
+
+@event.listens_for(Session, 'after_commit')
+def _record_after_commit(session):
+    if session.info.pop(_WROTE, False):
+        _record_write()
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop(_WROTE, None)
+
+
+# --- Snapshot ---
+def build_search_context() -> dict:
+    """Queries and serializes every entity in the compact shape the AI prompts use."""
+    # Using simplified/adapted serializers for context to avoid excessive nesting/size issues.
+    # These are distinct from the ones used for direct API responses for individual entities.
+    def context_researcher_to_json(r):
+        return {"id": str(r.id), "name": r.name, "email": r.email, "department": r.department, "bio": r.bio or ""}
+
+    def context_lab_to_json(l):
+        return {"id": str(l.id), "name": l.name, "description": l.description or "", "principalInvestigatorId": str(l.principal_investigator_id) if l.principal_investigator_id else None}
+
+    def context_project_to_json(p):
+        return {"id": str(p.id), "name": p.name, "description": p.description or "", "leadResearcherId": str(p.pi_id) if p.pi_id else None}
+
+    def context_compute_resource_to_json(cr):
+        return {"id": str(cr.id), "name": cr.name, "type": cr.resource_type.value, "specification": cr.specification or ""}
+
+    def context_grant_to_json(g):
+        return {"id": str(g.id), "title": g.title, "agency": g.agency, "amount": g.amount, "status": g.status.value}
+
+    def context_note_to_json(n): # For the flat list of all notes
+        return {"id": str(n.id), "content": n.content or "", "researcherId": str(n.researcher_id), "projectId": str(n.project_id) if n.project_id else None}
+
+    # Projects' relationships are eager-loaded by default but not needed here
+    return {
+        "researchers": [context_researcher_to_json(r) for r in Researcher.query.all()],
+        "labs": [context_lab_to_json(l) for l in Lab.query.all()],
+        "projects": [context_project_to_json(p) for p in Project.query.options(lazyload('*')).all()],
+        "computeResources": [context_compute_resource_to_json(cr) for cr in ComputeResource.query.all()],
+        "grants": [context_grant_to_json(g) for g in Grant.query.all()],
+        "notes": [context_note_to_json(n) for n in Note.query.all()] # All notes, flat list
+    }
+
+def get_search_context() -> dict:
+    """
+    Returns the serialized context for the current data version.
+    Served from memory while the version is unchanged (and the snapshot younger than
+    CONTEXT_SNAPSHOT_MAX_AGE); otherwise loaded from this host's snapshot file, or rebuilt from the
+    database (and written there) if that is outdated too.
+    The returned dict is shared: callers must not modify it.
+    """
+    version = current_version()
+    with _lock:
+        if _snapshot["version"] == version and _is_fresh(_snapshot["built_at"]):
+            return _snapshot["context"]
+
+        stored = _read(_SNAPSHOT_FILE)
+        if stored:
+            try:
+                data = json.loads(stored)
+                if data.get("version") == version and _is_fresh(data.get("builtAt", 0.0)):
+                    _snapshot.update(version=version, context=data["context"], built_at=data["builtAt"])
+                    return data["context"]
+            except ValueError:
+                pass # Half-written or corrupt; rebuild below
+
+        built_at = time.time()
+        context = build_search_context()
+        try:
+            _write_atomic(_SNAPSHOT_FILE, json.dumps({"version": version, "builtAt": built_at, "context": context},
+                                                     separators=(",", ":")))
+        except OSError as e:
+            print(f"Failed to write context snapshot: {e}")
+        _snapshot.update(version=version, context=context, built_at=built_at)
+        return context
@@ -1,6 +1,18 @@
 import os
-import google.generativeai as genai
+import json
 from dotenv import load_dotenv # Should be loaded by app.py, but good for standalone service testing
+from services.model_backends import create_model, GEMINI_MODEL_BACKEND
+from services.retrieval import rank_context_items, fill_with_unranked, pack_ranked_items
+from services.response_cache import create_response_cache, make_cache_key
+from services.single_flight import SingleFlight
+from services.resilience import TokenBucket, SQLiteTokenBucket, CircuitBreaker, RateLimitExceeded, CircuitOpenError, is_transient_error
+from services.structured_output import ObjectSchema, ArraySchema, StructuredOutputError, parse_structured_output, build_repair_prompt
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import time
+import random
+import threading
+import contextvars
 
 # Ensure environment variables are loaded (especially if running this service standalone)
 # In the Flask app context, app.py already calls load_dotenv()
@@ -10,53 +22,360 @@ if os.getenv("FLASK_APP_CONTEXT") != "true": # Avoid double loading if in Flask
 
 API_KEY = os.getenv("API_KEY")
 
-if not API_KEY:
+# Global search prompt size: at most GLOBAL_SEARCH_TOP_K of the best-ranked items,
+# within an estimated GLOBAL_SEARCH_TOKEN_BUDGET tokens of context.
+GLOBAL_SEARCH_TOKEN_BUDGET = int(os.getenv("GLOBAL_SEARCH_TOKEN_BUDGET", "6000"))
+GLOBAL_SEARCH_TOP_K = int(os.getenv("GLOBAL_SEARCH_TOP_K", "40"))
+
+# Researcher matching: the MATCH_SHORTLIST_SIZE best local matches are sent in chunks of
+# MATCH_CHUNK_SIZE, with at most MATCH_MAX_CALLS model calls per request.
+MATCH_SHORTLIST_SIZE = int(os.getenv("MATCH_SHORTLIST_SIZE", "60"))
+MATCH_CHUNK_SIZE = int(os.getenv("MATCH_CHUNK_SIZE", "15"))
+MATCH_MAX_CALLS = int(os.getenv("MATCH_MAX_CALLS", "4"))
+MATCH_MAX_RESULTS = int(os.getenv("MATCH_MAX_RESULTS", "5"))
+MATCH_BIO_CHARS = 600
+
+MODEL_NAME = 'gemini-1.5-flash'
+
+# Per-process limits for model calls (each gunicorn worker has its own pools).
+# GEMINI_MAX_CONCURRENCY bounds how many generate_content calls run at once; further calls queue.
+# GEMINI_CALL_TIMEOUT (seconds) bounds how long a caller waits for one call, including time in the
+# queue, and is passed to the SDK as the HTTP timeout so a hung upstream request is abandoned.
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_CALL_TIMEOUT = float(os.getenv("GEMINI_CALL_TIMEOUT", "30"))
+
+# Model calls run on _model_executor. Multi-call operations (e.g. researcher matching chunks) fan
+# out on _fanout_executor; its tasks wait on model-call futures, so the pools must stay separate
+# or a full pool of fan-out tasks could deadlock waiting for model calls that can't start.
+_model_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix="gemini-call")
+_fanout_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix="gemini-fanout")
+
+# Streaming calls iterate in the request's own thread; they get their own GEMINI_MAX_CONCURRENCY slots.
+_stream_slots = threading.BoundedSemaphore(GEMINI_MAX_CONCURRENCY)
+
+# Upstream protection. GEMINI_RATE_LIMIT_PER_MINUTE (0 disables) with bursts of GEMINI_RATE_LIMIT_BURST,
+# counted per process, or per host with GEMINI_RATE_LIMIT_BACKEND=sqlite (file GEMINI_RATE_LIMIT_PATH).
+# After GEMINI_BREAKER_FAILURES consecutive transient failures calls fail fast for GEMINI_BREAKER_RESET_SECONDS.
+GEMINI_RATE_LIMIT_PER_MINUTE = float(os.getenv("GEMINI_RATE_LIMIT_PER_MINUTE", "300"))
+GEMINI_RATE_LIMIT_BURST = int(os.getenv("GEMINI_RATE_LIMIT_BURST", "20"))
+GEMINI_RATE_LIMIT_BACKEND = os.getenv("GEMINI_RATE_LIMIT_BACKEND", "memory").lower()
+GEMINI_RATE_LIMIT_PATH = os.getenv("GEMINI_RATE_LIMIT_PATH", os.path.join(tempfile.gettempdir(), "ucr_gemini_rate_limit.sqlite3"))
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_RESET_SECONDS = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "30"))
+
+if GEMINI_RATE_LIMIT_BACKEND == "sqlite":
+    rate_limiter = SQLiteTokenBucket(GEMINI_RATE_LIMIT_PER_MINUTE / 60, GEMINI_RATE_LIMIT_BURST, GEMINI_RATE_LIMIT_PATH)
+else:
+    rate_limiter = TokenBucket(GEMINI_RATE_LIMIT_PER_MINUTE / 60, GEMINI_RATE_LIMIT_BURST)
+circuit_breaker = CircuitBreaker(GEMINI_BREAKER_FAILURES, GEMINI_BREAKER_RESET_SECONDS)
+
+# Retries of transient failures (timeouts, 429, 5xx): up to GEMINI_RETRY_ATTEMPTS attempts in total,
+# sleeping a random 0..min(GEMINI_RETRY_MAX_DELAY, GEMINI_RETRY_BASE_DELAY * 2^n) seconds in between
+# ("full jitter"). Calls rejected by the circuit breaker or rate limiter are never retried.
+# All attempts of a request share its deadline (see set_request_deadline), GEMINI_REQUEST_DEADLINE
+# seconds by default, which should stay below the gunicorn worker timeout.
+GEMINI_RETRY_ATTEMPTS = int(os.getenv("GEMINI_RETRY_ATTEMPTS", "3"))
+GEMINI_RETRY_BASE_DELAY = float(os.getenv("GEMINI_RETRY_BASE_DELAY", "0.5"))
+GEMINI_RETRY_MAX_DELAY = float(os.getenv("GEMINI_RETRY_MAX_DELAY", "4"))
+GEMINI_REQUEST_DEADLINE = float(os.getenv("GEMINI_REQUEST_DEADLINE", "25"))
+
+# Structured answers: with GEMINI_JSON_MODE the model is called in JSON response mode, so it returns bare
+# JSON instead of prose or markdown. A reply that still can't be parsed into the declared schema gets one
+# short repair call (only the broken reply and the error, not the original context) if GEMINI_JSON_REPAIR is on.
+GEMINI_JSON_MODE = os.getenv("GEMINI_JSON_MODE", "true").lower() == "true"
+GEMINI_JSON_REPAIR = os.getenv("GEMINI_JSON_REPAIR", "true").lower() == "true"
+# A plain dict, which the SDK accepts in place of GenerationConfig, so the SDK needn't be imported here
+JSON_GENERATION_CONFIG = {"response_mime_type": "application/json"} if GEMINI_JSON_MODE else None
+
+# Declared shapes of the structured answers (see services/structured_output.py)
+NOTES_ANALYSIS_SCHEMA = ObjectSchema("notes analysis", required={"sentiment": str, "keyThemes": list, "summary": str})
+GLOBAL_SEARCH_SCHEMA = ArraySchema("global search results", ObjectSchema(
+    "search result", required={"id": object, "type": object, "name": object, "matchContext": object}))
+# Grant search and researcher matching accept partial items, as before; missing fields are only logged
+EXTERNAL_GRANTS_SCHEMA = ArraySchema("external grant results", ObjectSchema(
+    "grant search result", expected=("id", "title", "agency", "description", "amount", "submissionDate")))
+RESEARCHER_MATCHES_SCHEMA = ArraySchema("researcher matches", ObjectSchema(
+    "matched researcher", expected=("originalId", "name", "matchReason", "research", "matchScore")))
+EMAIL_DRAFT_SCHEMA = ObjectSchema("email draft", required={"subject": str, "body": str})
+
+json_repairs = {"attempted": 0, "succeeded": 0} # Per process, reported by /api/ai/upstream-stats
+
+# time.monotonic() by which the current request must be answered; None outside a request
+_request_deadline = contextvars.ContextVar("gemini_request_deadline", default=None)
+
+# Concurrent identical prompts share one upstream call (keyed like the response cache, by model and prompt)
+model_calls = SingleFlight()
+
+# Validated results of identical prompts are served from here instead of calling the model again.
+# Configured through GEMINI_CACHE_BACKEND / GEMINI_CACHE_TTL / GEMINI_CACHE_MAX_ENTRIES / GEMINI_CACHE_PATH.
+response_cache = create_response_cache()
+
+if not API_KEY and GEMINI_MODEL_BACKEND == "gemini":
     # This will cause an error if the service is loaded and API_KEY is not set.
     # The configure step will fail. Consider raising a custom error or logging.
     print("Warning: API_KEY for Gemini not found in environment variables.")
     # Depending on strictness, could raise an ImproperlyConfigured error here.
 
-try:
-    genai.configure(api_key=API_KEY)
-    # Initialize a generative model
-    # Using gemini-1.5-flash as it's generally available and fast for summarization
-    model = genai.GenerativeModel('gemini-1.5-flash')
-except Exception as e:
-    # Handle cases where API_KEY might be None or invalid at configuration time
-    print(f"Error configuring Gemini API: {e}")
-    # Set model to None or a mock/dummy model to prevent further errors if config fails
-    model = None
+# The Gemini API (using gemini-1.5-flash as it's generally available and fast for summarization), or the
+# local fake with GEMINI_MODEL_BACKEND=fake. Built by get_model() on first use rather than at import:
+# importing google.generativeai takes about a second, which workers that never serve AI traffic
+# shouldn't pay at startup.
+_model = None
+_model_ready = False
+_model_lock = threading.Lock()
+
+def get_model():
+    """The model, created on the first call (thread-safe). None if configuration fails, which every function checks."""
+    global _model, _model_ready
+    if not _model_ready:
+        with _model_lock:
+            if not _model_ready:
+                _model = create_model(GEMINI_MODEL_BACKEND, MODEL_NAME, API_KEY)
+                _model_ready = True
+    return _model
+
+def set_model(new_model):
+    """Replaces the model every function calls, e.g. with a FakeGenerativeModel for benchmarks."""
+    global _model, _model_ready
+    with _model_lock:
+        _model = new_model
+        _model_ready = True
 
 class GeminiServiceError(Exception):
     """Custom exception for Gemini service errors."""
     pass
 
+class GeminiTimeoutError(GeminiServiceError):
+    """A model call didn't finish within its timeout."""
+    pass
+
+class GeminiUnavailableError(GeminiServiceError):
+    """Rejected without calling upstream: the circuit breaker is open or the rate limit is exhausted."""
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def _admit_call(timeout: float):
+    """
+    Circuit breaker and rate limiter gate for one upstream call. Raises GeminiUnavailableError.
+    The breaker goes first, so calls it rejects neither spend nor wait for a rate token.
+    """
+    try:
+        circuit_breaker.before_call()
+    except CircuitOpenError as e:
+        raise GeminiUnavailableError(f"Gemini call rejected: {e}", e.retry_after)
+    try:
+        rate_limiter.acquire(max_wait=timeout)
+    except RateLimitExceeded as e:
+        circuit_breaker.release() # Frees the half-open trial for another call
+        raise GeminiUnavailableError(f"Gemini call rejected: {e}", e.retry_after)
+
+def _call_model(prompt, timeout: float, generation_config=None):
+    """Runs on _model_executor: the only place non-streaming calls reach the SDK."""
+    _admit_call(timeout)
+    try:
+        response = get_model().generate_content(prompt, generation_config=generation_config, request_options={"timeout": timeout})
+    except Exception as e:
+        circuit_breaker.record_failure(e)
+        raise
+    circuit_breaker.record_success()
+    return response
+
+def set_request_deadline(seconds: float = None):
+    """Starts the deadline for the current request: `seconds` from now, at most GEMINI_REQUEST_DEADLINE (the default)."""
+    seconds = min(seconds, GEMINI_REQUEST_DEADLINE) if seconds else GEMINI_REQUEST_DEADLINE
+    _request_deadline.set(time.monotonic() + seconds)
+
+def clear_request_deadline():
+    _request_deadline.set(None)
+
+def _remaining_time():
+    deadline = _request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def _call_timeout(timeout: float = None) -> float:
+    """`timeout` (default GEMINI_CALL_TIMEOUT) shortened to what is left of the request deadline."""
+    timeout = timeout or GEMINI_CALL_TIMEOUT
+    remaining = _remaining_time()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise GeminiTimeoutError("Request deadline exceeded before the Gemini call could start")
+    return min(timeout, remaining)
+
+def _is_retryable(exc) -> bool:
+    if isinstance(exc, GeminiUnavailableError):
+        return False # Retrying while the breaker is open or the quota is spent would only add load
+    return isinstance(exc, GeminiTimeoutError) or is_transient_error(exc)
+
+def _generate_content(prompt, timeout: float = None, generation_config=None):
+    """
+    Calls the model, retrying transient failures with capped exponential backoff and full jitter.
+    Each attempt waits at most `timeout` seconds (default GEMINI_CALL_TIMEOUT), and no attempt or
+    backoff sleep runs past the request deadline. `generation_config` is passed to the SDK
+    (e.g. JSON_GENERATION_CONFIG).
+    Raises the last error once attempts, or time, run out.
+    """
+    attempt = 1
+    while True:
+        try:
+            return _generate_content_once(prompt, _call_timeout(timeout), generation_config)
+        except Exception as e:
+            if attempt >= GEMINI_RETRY_ATTEMPTS or not _is_retryable(e):
+                raise
+            delay = random.uniform(0, min(GEMINI_RETRY_MAX_DELAY, GEMINI_RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+            remaining = _remaining_time()
+            if remaining is not None and delay >= remaining:
+                raise
+            print(f"Transient Gemini error ({e}); attempt {attempt + 1} of {GEMINI_RETRY_ATTEMPTS} in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+
+def _generate_content_once(prompt, timeout: float, generation_config=None):
+    """
+    Runs model.generate_content on the shared bounded pool and waits at most `timeout` seconds.
+    If the same prompt is already in flight, waits for that call instead.
+    Raises GeminiTimeoutError if the call is still queued or running when the timeout expires.
+    """
+    try:
+        circuit_breaker.check() # Fail fast instead of queueing while upstream is known to be down
+    except CircuitOpenError as e:
+        raise GeminiUnavailableError(f"Gemini call rejected: {e}", e.retry_after)
+    # JSON-mode and plain calls of the same prompt give different answers, so they don't coalesce
+    call = model_calls.join(
+        make_cache_key("generate_json" if generation_config else "generate_content", MODEL_NAME, prompt),
+        lambda: _model_executor.submit(_call_model, prompt, timeout, generation_config))
+    try:
+        return model_calls.wait(call, timeout)
+    except FuturesTimeoutError:
+        # The queued call is cancelled once no caller waits for it; a running call ends with its HTTP timeout
+        raise GeminiTimeoutError(f"Gemini call timed out after {timeout:.1f}s")
+
+def _stream_content(prompt, action: str, timeout: float = None, generation_config=None):
+    """
+    Yields the text chunks of a streaming generate_content call as they arrive.
+    `action` names the operation in error messages (e.g. "Text summarization").
+    `generation_config` is passed to the SDK as for _generate_content.
+    Raises GeminiTimeoutError if no stream slot frees up within `timeout` seconds
+    (default GEMINI_CALL_TIMEOUT); the SDK applies the same timeout to the HTTP request.
+    """
+    timeout = _call_timeout(timeout)
+    if not _stream_slots.acquire(timeout=timeout):
+        raise GeminiTimeoutError(f"No Gemini stream slot became free within {timeout:.1f}s")
+    try:
+        _admit_call(timeout)
+        produced_text = False
+        try:
+            response = get_model().generate_content(prompt, stream=True, generation_config=generation_config, request_options={"timeout": timeout})
+            for chunk in response:
+                if chunk.parts:
+                    produced_text = True
+                    yield chunk.text
+        except GeneratorExit:
+            circuit_breaker.release() # Client went away; says nothing about upstream health
+            raise
+        except Exception as e:
+            circuit_breaker.record_failure(e)
+            raise
+        circuit_breaker.record_success()
+        if not produced_text:
+            if response.prompt_feedback and response.prompt_feedback.block_reason:
+                raise GeminiServiceError(f"{action} blocked due to: {response.prompt_feedback.block_reason_message or response.prompt_feedback.block_reason}")
+            raise GeminiServiceError(f"{action} failed: No content generated and no specific block reason.")
+    finally:
+        _stream_slots.release()
+
+def run_concurrently(function, argument_tuples, timeout: float = None) -> list:
+    """
+    Calls function(*arguments) for every tuple in `argument_tuples` in parallel on the shared fan-out pool.
+    Args:
+        function (callable): The operation to run, typically one that makes a model call.
+        argument_tuples (list[tuple]): One tuple of positional arguments per call.
+        timeout (float, optional): Overall seconds to wait for all calls (default GEMINI_CALL_TIMEOUT),
+                                   capped by the request deadline.
+    Returns:
+        list: For each call, in order, its return value or the exception it raised
+              (GeminiTimeoutError if it didn't finish in time).
+    """
+    timeout = _call_timeout(timeout)
+    deadline = time.monotonic() + timeout
+    # Each task runs in a copy of the caller's context so it sees the same request deadline
+    futures = [_fanout_executor.submit(contextvars.copy_context().run, function, *arguments) for arguments in argument_tuples]
+    outcomes = []
+    for future in futures:
+        try:
+            outcomes.append(future.result(timeout=max(deadline - time.monotonic(), 0)))
+        except FuturesTimeoutError:
+            future.cancel()
+            outcomes.append(GeminiTimeoutError(f"Gemini call timed out after {timeout:.1f}s"))
+        except Exception as e:
+            outcomes.append(e)
+    return outcomes
+
+def _response_text(response, action: str) -> str:
+    """The generated text, or GeminiServiceError if the model produced none (e.g. blocked by safety filters)."""
+    if not response.parts:
+        if response.prompt_feedback and response.prompt_feedback.block_reason:
+            raise GeminiServiceError(f"{action} blocked due to: {response.prompt_feedback.block_reason_message or response.prompt_feedback.block_reason}")
+        raise GeminiServiceError(f"{action} failed: No content generated and no specific block reason.")
+    return response.text
+
+def _generate_structured(prompt, schema, action: str):
+    """
+    Calls the model (in JSON response mode if enabled) and returns its answer parsed and validated against `schema`.
+    `action` names the operation in error messages (e.g. "Global search").
+    Raises GeminiServiceError if the answer is unusable even after a repair call.
+    """
+    response = _generate_content(prompt, generation_config=JSON_GENERATION_CONFIG)
+    return _parse_structured(_response_text(response, action), schema, action)
+
+def _parse_structured(generated_text: str, schema, action: str):
+    """
+    Parses a structured answer. If that fails and GEMINI_JSON_REPAIR is on, asks the model once to
+    correct the reply (a short prompt without the original context) and parses the correction instead.
+    """
+    try:
+        return parse_structured_output(generated_text, schema)
+    except StructuredOutputError as e:
+        error = e
+    print(f"Problematic JSON string from {action.lower()}: {generated_text[:500]}")
+    if GEMINI_JSON_REPAIR:
+        json_repairs["attempted"] += 1
+        try:
+            response = _generate_content(build_repair_prompt(generated_text, error, schema), generation_config=JSON_GENERATION_CONFIG)
+            result = parse_structured_output(_response_text(response, action), schema)
+            json_repairs["succeeded"] += 1
+            return result
+        except Exception as repair_error: # Report the original parse error, not the repair's
+            print(f"Repairing the {action.lower()} response failed: {repair_error}")
+    raise GeminiServiceError(f"Failed to parse AI response for {action.lower()} as JSON: {error} Response snippet: {generated_text[:200]}...")
+
+def _summarize_prompt(text_to_summarize: str) -> str:
+    return f"Please provide a concise summary of the following text:\n\n---\n{text_to_summarize}\n---\n\nSummary:"
+
 def summarize_text(text_to_summarize: str) -> str:
     """
     Summarizes the given text using the Gemini API.
     Raises GeminiServiceError if the API call fails or the model is not configured.
     """
-    if not model:
+    if not get_model():
         raise GeminiServiceError("Gemini model is not configured or API key is missing.")
     if not text_to_summarize or not isinstance(text_to_summarize, str) or not text_to_summarize.strip():
         raise ValueError("Input text cannot be empty or invalid.")
 
-    prompt = f"Please provide a concise summary of the following text:\n\n---\n{text_to_summarize}\n---\n\nSummary:"
+    prompt = _summarize_prompt(text_to_summarize)
 
-    try:
-        response = model.generate_content(prompt)
+    cache_key = make_cache_key("summarize_text", MODEL_NAME, prompt)
+    cached_result = response_cache.get(cache_key)
+    if cached_result is not None:
+        return cached_result
 
-        # Check for empty response or parts
-        if not response.parts:
-            # Check for safety ratings if parts are empty
-            if response.prompt_feedback and response.prompt_feedback.block_reason:
-                 raise GeminiServiceError(f"Text summarization blocked due to: {response.prompt_feedback.block_reason_message or response.prompt_feedback.block_reason}")
-            raise GeminiServiceError("Failed to summarize text: No content generated and no specific block reason.")
-
-        # Assuming the first part contains the text if multiple parts exist
-        summary = response.text # .text accessor usually combines text parts
+    try:
+        response = _generate_content(prompt)
+        summary = _response_text(response, "Text summarization") # Same wording as the streaming variant
         if not summary.strip():
              raise GeminiServiceError("Failed to summarize text: Empty summary generated.")
+        response_cache.set(cache_key, summary)
         return summary
 
     except Exception as e:
@@ -64,11 +383,52 @@ def summarize_text(text_to_summarize: str) -> str:
         # Log the actual error e for debugging
         # For example: current_app.logger.error(f"Gemini API error: {str(e)}")
         print(f"Gemini API error: {str(e)}") # Placeholder for proper logging
+        if isinstance(e, GeminiServiceError):
+            raise
         raise GeminiServiceError(f"Failed to summarize text via AI service: {str(e)}")
 
+def stream_summarize_text(text_to_summarize: str):
+    """
+    Streaming variant of summarize_text. Validation happens on call, so errors surface before any output.
+    Returns:
+        generator: ("delta", {"text": chunk}) events as the model produces them, then
+                   ("done", {"summary": full_summary}). A cached summary is sent as a single delta.
+    Raises GeminiServiceError or ValueError (from the call itself, or from the generator while streaming).
+    """
+    if not get_model():
+        raise GeminiServiceError("Gemini model is not configured or API key is missing.")
+    if not text_to_summarize or not isinstance(text_to_summarize, str) or not text_to_summarize.strip():
+        raise ValueError("Input text cannot be empty or invalid.")
+
+    prompt = _summarize_prompt(text_to_summarize)
+    cache_key = make_cache_key("summarize_text", MODEL_NAME, prompt) # Shared with summarize_text
+
+    def events():
+        summary = response_cache.get(cache_key)
+        if summary is not None:
+            yield "delta", {"text": summary}
+        else:
+            chunks = []
+            try:
+                for text in _stream_content(prompt, "Text summarization"):
+                    chunks.append(text)
+                    yield "delta", {"text": text}
+            except GeminiServiceError:
+                raise
+            except Exception as e:
+                print(f"Gemini API error while streaming summary: {str(e)}")
+                raise GeminiServiceError(f"Failed to summarize text via AI service: {str(e)}")
+            summary = "".join(chunks)
+            if not summary.strip():
+                raise GeminiServiceError("Failed to summarize text: Empty summary generated.")
+            response_cache.set(cache_key, summary)
+        yield "done", {"summary": summary}
+
+    return events()
+
 if __name__ == '__main__':
     # Example usage (requires API_KEY to be set in .env or environment)
-    if API_KEY and model:
+    if API_KEY and get_model():
         print("Gemini Service Initialized with key:", API_KEY[:5] + "...")
 
         example_text_short = "This is a test sentence. It is short."
@@ -125,16 +485,13 @@ if __name__ == '__main__':
         print("API_KEY=your_actual_api_key_here")
 
 # --- New function: analyze_notes_text ---
-import json
-from google.generativeai.types import GenerationConfig # For specifying JSON output
-
 def analyze_notes_text(notes_text: str) -> dict:
     """
     Analyzes the given text (researcher notes) using the Gemini API.
     Returns a dictionary with sentiment, keyThemes, and summary.
     Raises GeminiServiceError or ValueError for issues.
     """
-    if not model:
+    if not get_model():
         raise GeminiServiceError("Gemini model is not configured or API key is missing.")
     if not notes_text or not isinstance(notes_text, str) or not notes_text.strip():
         raise ValueError("Input notes_text cannot be empty or invalid.")
@@ -154,41 +511,15 @@ Text to analyze:
 
 JSON Output:"""
 
-    try:
-        # Specify JSON output if the model/API version supports it directly in GenerationConfig
-        # For gemini-1.5-flash, this is done by instructing in the prompt and parsing.
-        # Some newer models might have a specific response_mime_type setting in GenerationConfig.
-        # generation_config = GenerationConfig(response_mime_type="application/json")
-        # response = model.generate_content(prompt, generation_config=generation_config)
-
-        response = model.generate_content(prompt)
-
-        if not response.parts:
-            if response.prompt_feedback and response.prompt_feedback.block_reason:
-                raise GeminiServiceError(f"Notes analysis blocked due to: {response.prompt_feedback.block_reason_message or response.prompt_feedback.block_reason}")
-            raise GeminiServiceError("Failed to analyze notes: No content generated and no specific block reason.")
-
-        generated_text = response.text.strip()
-
-        # The model is asked for JSON, but it might be wrapped in markdown (```json ... ```)
-        if generated_text.startswith("```json"):
-            generated_text = generated_text[7:] # Remove ```json\n
-            if generated_text.endswith("```"):
-                generated_text = generated_text[:-3] # Remove ```
+    cache_key = make_cache_key("analyze_notes_text", MODEL_NAME, prompt)
+    cached_result = response_cache.get(cache_key)
+    if cached_result is not None:
+        return cached_result
 
-        generated_text = generated_text.strip() # Clean up any extra whitespace
-
-        try:
-            analysis_result = json.loads(generated_text)
-        except json.JSONDecodeError as jde:
-            # Log the problematic text for debugging: print(f"Problematic JSON string: {generated_text}")
-            raise GeminiServiceError(f"Failed to parse AI response as JSON: {jde}. Response was: {generated_text[:200]}...") # Show partial response
-
-        # Validate structure of the parsed JSON
-        if not all(key in analysis_result for key in ["sentiment", "keyThemes", "summary"]):
-            raise GeminiServiceError("AI response is missing one or more required keys (sentiment, keyThemes, summary).")
-        if not isinstance(analysis_result["keyThemes"], list):
-            raise GeminiServiceError("AI response 'keyThemes' is not a list.")
+    try:
+        # JSON response mode (GEMINI_JSON_MODE) plus the prompt instructions above; the shared parser
+        # also copes with fenced or prefixed replies and checks the keys and the keyThemes list.
+        analysis_result = _generate_structured(prompt, NOTES_ANALYSIS_SCHEMA, "Notes analysis")
 
         # Further validation for sentiment value if desired
         allowed_sentiments = ["Positive", "Negative", "Neutral", "Mixed", "Unknown"]
@@ -197,6 +528,7 @@ JSON Output:"""
              print(f"Warning: Sentiment '{analysis_result['sentiment']}' not in allowed list. Defaulting or flagging.")
              # analysis_result["sentiment"] = "Unknown" # Example of defaulting
 
+        response_cache.set(cache_key, analysis_result)
         return analysis_result
 
     except Exception as e:
@@ -215,11 +547,13 @@ def perform_global_search(query: str, context_data: dict) -> list[dict]:
         query (str): The search query.
         context_data (dict): A dictionary containing lists of researchers, labs, projects, etc.
                              Each item in these lists should be a dictionary itself (serialized).
+                             All items are ranked locally (BM25); the best ones go into the prompt,
+                             topped up with unmatched items up to the prompt's size limits.
     Returns:
         list[dict]: A list of search result items, each a dictionary.
     Raises GeminiServiceError or ValueError for issues.
     """
-    if not model:
+    if not get_model():
         raise GeminiServiceError("Gemini model is not configured or API key is missing.")
     if not query or not isinstance(query, str) or not query.strip():
         raise ValueError("Search query cannot be empty or invalid.")
@@ -227,22 +561,30 @@ def perform_global_search(query: str, context_data: dict) -> list[dict]:
         # Basic check; more detailed validation of context_data structure might be needed.
         raise ValueError("Context data must be a valid dictionary.")
 
-    # Prepare context data strings for the prompt (truncate if too long for token limits)
-    # This is a simplified representation; real-world usage might need more sophisticated truncation
-    # or summarization if context_data is very large.
-    researchers_str = json.dumps(context_data.get("researchers", [])[:5], indent=2) # Example: first 5
-    labs_str = json.dumps(context_data.get("labs", [])[:5], indent=2)
-    projects_str = json.dumps(context_data.get("projects", [])[:5], indent=2)
-    compute_resources_str = json.dumps(context_data.get("computeResources", [])[:3], indent=2)
-    grants_str = json.dumps(context_data.get("grants", [])[:3], indent=2)
-    notes_str = json.dumps(context_data.get("notes", [])[:10], indent=2) # Example: first 10 notes
+    # Retrieval stage: rank every item locally and send the most relevant ones first, packed under a
+    # token budget. Items without a query term fill any remaining room in their default order, so a query
+    # with few or no literal matches (synonyms, inflections) still reaches the model with candidates.
+    ranked_items = fill_with_unranked(rank_context_items(query, context_data), context_data)
+    if not ranked_items:
+        return [] # No data to search
+    relevant = pack_ranked_items(ranked_items, GLOBAL_SEARCH_TOKEN_BUDGET, GLOBAL_SEARCH_TOP_K)
+
+    def section(key):
+        return json.dumps(relevant.get(key, []), separators=(",", ":"))
+
+    researchers_str = section("researchers")
+    labs_str = section("labs")
+    projects_str = section("projects")
+    compute_resources_str = section("computeResources")
+    grants_str = section("grants")
+    notes_str = section("notes")
 
     prompt = f"""Please perform a global search across the provided UCR Research Computing data context.
 Your task is to identify items from the context that are relevant to the search query.
 
 Search Query: "{query}"
 
-Data Context (some data might be truncated for brevity):
+Data Context (a selection of items; those sharing terms with the query come first):
 Researchers:
 {researchers_str}
 
@@ -258,7 +600,7 @@ Compute Resources:
 Grants:
 {grants_str}
 
-All Notes:
+Notes:
 {notes_str}
 
 Based *only* on the provided Data Context, identify items that directly match or are highly relevant to the search query.
@@ -273,44 +615,15 @@ If no items match the query, return an empty JSON array ([]).
 Ensure the output is a valid JSON array.
 """
 
-    try:
-        response = model.generate_content(prompt)
-
-        if not response.parts:
-            if response.prompt_feedback and response.prompt_feedback.block_reason:
-                raise GeminiServiceError(f"Global search blocked due to: {response.prompt_feedback.block_reason_message or response.prompt_feedback.block_reason}")
-            raise GeminiServiceError("Global search failed: No content generated and no specific block reason.")
-
-        generated_text = response.text.strip()
-
-        if generated_text.startswith("```json"):
-            generated_text = generated_text[7:]
-            if generated_text.endswith("```"):
-                generated_text = generated_text[:-3]
-        generated_text = generated_text.strip()
-
-        try:
-            search_results = json.loads(generated_text)
-        except json.JSONDecodeError as jde:
-            print(f"Problematic JSON string from global search: {generated_text}") # Log for debugging
-            raise GeminiServiceError(f"Failed to parse AI response for global search as JSON: {jde}. Response snippet: {generated_text[:200]}...")
-
-        if not isinstance(search_results, list):
-            # If the API didn't return a list (e.g., returned a single object or error message in JSON)
-            print(f"Unexpected AI response format for global search (not a list): {search_results}")
-            raise GeminiServiceError(f"AI response for global search was not a list as expected. Got: {type(search_results)}")
-
-        # Validate structure of each item in the list
-        validated_results = []
-        for item in search_results:
-            if not isinstance(item, dict):
-                print(f"Warning: Search result item is not a dictionary: {item}")
-                continue # Skip this item
-            if not all(key in item for key in ["id", "type", "name", "matchContext"]):
-                print(f"Warning: Search result item missing required keys: {item}")
-                continue # Skip this item
-            validated_results.append(item)
+    cache_key = make_cache_key("perform_global_search", MODEL_NAME, prompt)
+    cached_result = response_cache.get(cache_key)
+    if cached_result is not None:
+        return cached_result
 
+    try:
+        # Items missing id, type, name or matchContext are skipped
+        validated_results = _generate_structured(prompt, GLOBAL_SEARCH_SCHEMA, "Global search")
+        response_cache.set(cache_key, validated_results)
         return validated_results
 
     except Exception as e:
@@ -330,7 +643,7 @@ def search_external_grants_via_ai(search_criteria: dict) -> list[dict]:
         list[dict]: A list of potential grant opportunities.
     Raises GeminiServiceError or ValueError for issues.
     """
-    if not model:
+    if not get_model():
         raise GeminiServiceError("Gemini model is not configured or API key is missing.")
     if not search_criteria or not isinstance(search_criteria, dict):
         raise ValueError("Search criteria must be a valid dictionary.")
@@ -366,50 +679,14 @@ If no relevant grants are found based on the criteria, return an empty JSON arra
 Ensure the output is a valid JSON array.
 """
 
-    try:
-        response = model.generate_content(prompt)
-
-        if not response.parts:
-            if response.prompt_feedback and response.prompt_feedback.block_reason:
-                raise GeminiServiceError(f"External grant search blocked due to: {response.prompt_feedback.block_reason_message or response.prompt_feedback.block_reason}")
-            raise GeminiServiceError("External grant search failed: No content generated and no specific block reason.")
-
-        generated_text = response.text.strip()
-
-        if generated_text.startswith("```json"):
-            generated_text = generated_text[7:]
-            if generated_text.endswith("```"):
-                generated_text = generated_text[:-3]
-        generated_text = generated_text.strip()
-
-        # Handle empty array case explicitly if model might return non-JSON for it
-        if generated_text == "[]":
-            return []
-
-        try:
-            search_results = json.loads(generated_text)
-        except json.JSONDecodeError as jde:
-            print(f"Problematic JSON string from external grant search: {generated_text}")
-            raise GeminiServiceError(f"Failed to parse AI response for external grant search as JSON: {jde}. Response snippet: {generated_text[:200]}...")
-
-        if not isinstance(search_results, list):
-            print(f"Unexpected AI response format for external grant search (not a list): {search_results}")
-            raise GeminiServiceError(f"AI response for external grant search was not a list. Got: {type(search_results)}")
-
-        # Validate structure of each item
-        validated_results = []
-        required_keys = ["id", "title", "agency", "description", "amount", "submissionDate"] # awardNumber and url are optional-ish
-        for item in search_results:
-            if not isinstance(item, dict):
-                print(f"Warning: Grant search result item is not a dictionary: {item}")
-                continue
-            if not all(key in item for key in required_keys):
-                # Could be more lenient here, or AI might sometimes miss fields.
-                # For now, basic check.
-                print(f"Warning: Grant search result item missing some required keys: {item}")
-                # continue # Skip if strict, or append if partial data is acceptable
-            validated_results.append(item)
+    cache_key = make_cache_key("search_external_grants_via_ai", MODEL_NAME, prompt)
+    cached_result = response_cache.get(cache_key)
+    if cached_result is not None:
+        return cached_result
 
+    try:
+        validated_results = _generate_structured(prompt, EXTERNAL_GRANTS_SCHEMA, "External grant search")
+        response_cache.set(cache_key, validated_results)
         return validated_results
 
     except Exception as e:
@@ -423,35 +700,89 @@ Ensure the output is a valid JSON array.
 def match_researchers_to_grant_via_ai(grant_description: str, researchers_context: list[dict]) -> list[dict]:
     """
     Matches internal researchers to a given grant description using the Gemini API.
+    Map-reduce over the whole population: every researcher is scored locally (BM25) against the
+    grant description, the best MATCH_SHORTLIST_SIZE (topped up with unranked researchers if fewer
+    share a term with the description) are split into chunks that are sent to the
+    model concurrently (at most MATCH_MAX_CALLS calls), and the per-chunk matches are merged and
+    re-ranked by the model's matchScore.
     Args:
         grant_description (str): The description of the grant.
         researchers_context (list[dict]): A list of serialized researcher data.
                                           Each researcher dict should have 'id', 'name', 'bio', 'department'.
     Returns:
-        list[dict]: A list of matched researcher objects.
+        list[dict]: Up to MATCH_MAX_RESULTS matched researcher objects, best first.
     Raises GeminiServiceError or ValueError for issues.
     """
-    if not model:
+    if not get_model():
         raise GeminiServiceError("Gemini model is not configured or API key is missing.")
     if not grant_description or not isinstance(grant_description, str) or not grant_description.strip():
         raise ValueError("Grant description cannot be empty or invalid.")
     if not researchers_context or not isinstance(researchers_context, list): # Could be empty list
         raise ValueError("Researchers context must be a list (can be empty).")
 
-    # Prepare researchers_context string for the prompt (truncate if too long)
+    # Map: local prefilter over everyone, then fixed-size chunks of the shortlist. BM25 only sees shared
+    # terms, so a short list is topped up with unranked researchers and the model still judges candidates
+    # that match in meaning (e.g. "neural networks" vs. "deep learning").
+    researchers = {"researchers": researchers_context}
+    shortlist_size = min(MATCH_SHORTLIST_SIZE, MATCH_CHUNK_SIZE * MATCH_MAX_CALLS)
+    ranked = fill_with_unranked(rank_context_items(grant_description, researchers), researchers, shortlist_size)
+    shortlist = [r_data for _, _, r_data in ranked]
+    if not shortlist:
+        return [] # No researchers to match
+    local_rank = {str(r_data.get("id")): position for position, r_data in enumerate(shortlist)}
+    chunks = [shortlist[i:i + MATCH_CHUNK_SIZE] for i in range(0, len(shortlist), MATCH_CHUNK_SIZE)]
+
+    results, errors = [], []
+    # Chunks wait for model calls that also time out individually, so allow some queueing on top
+    for outcome in run_concurrently(_match_researchers_chunk, [(grant_description, chunk) for chunk in chunks],
+                                    timeout=2 * GEMINI_CALL_TIMEOUT):
+        if isinstance(outcome, GeminiServiceError):
+            errors.append(outcome)
+        elif isinstance(outcome, Exception):
+            raise outcome
+        else:
+            results.extend(outcome)
+    if errors and not results:
+        raise errors[0]
+    if errors:
+        print(f"Warning: {len(errors)} of {len(chunks)} researcher matching calls failed; returning partial matches.")
+
+    # Reduce: drop ids that weren't in the shortlist, keep each researcher's best match,
+    # order by the model's score and break ties with the local rank.
+    best = {}
+    for item in results:
+        original_id = str(item.get("originalId"))
+        if original_id not in local_rank:
+            print(f"Warning: Matched researcher id not in context, skipping: {item}")
+            continue
+        item["originalId"] = original_id
+        item["matchScore"] = _as_score(item.get("matchScore"))
+        if original_id not in best or item["matchScore"] > best[original_id]["matchScore"]:
+            best[original_id] = item
+    merged = sorted(best.values(), key=lambda item: (-item["matchScore"], local_rank[item["originalId"]]))
+    return merged[:MATCH_MAX_RESULTS]
+
+def _as_score(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _match_researchers_chunk(grant_description: str, researchers_chunk: list[dict]) -> list[dict]:
+    """One map step of match_researchers_to_grant_via_ai: asks the model to match a single chunk."""
     # Assuming each researcher_dict in researchers_context has 'id', 'name', 'bio', 'department'
     # Adding 'research' field as per prompt requirement (could be derived from bio or dedicated field)
     researchers_context_formatted = []
-    for r_data in researchers_context[:10]: # Example: Max 10 researchers in context for brevity
+    for r_data in researchers_chunk:
         research_info = r_data.get('bio', '') # Use bio as proxy for 'research' interests/area
-        if len(research_info) > 200: research_info = research_info[:197] + "..."
+        if len(research_info) > MATCH_BIO_CHARS: research_info = research_info[:MATCH_BIO_CHARS - 3] + "..."
         researchers_context_formatted.append({
-            "id": r_data.get("id"),
+            "id": str(r_data.get("id")),
             "name": r_data.get("name"),
             "department": r_data.get("department"),
             "research": research_info # Placeholder for more specific research interests
         })
-    researchers_str = json.dumps(researchers_context_formatted, indent=2)
+    researchers_str = json.dumps(researchers_context_formatted, separators=(",", ":"))
 
 
     prompt = f"""Given the following research grant description and a list of internal researchers (with their ID, name, department, and a summary of their research/bio), your task is to identify the most suitable researchers from the list to apply for this grant.
@@ -471,6 +802,7 @@ For each matched researcher, provide a JSON object with the following fields:
 - "name": The name of the researcher.
 - "matchReason": A brief explanation (1-2 sentences) of why this researcher is a good match for the grant, considering their research summary/bio and department against the grant description.
 - "research": The research summary/bio provided for the researcher in the input context.
+- "matchScore": How well the researcher fits the grant, as an integer from 0 (not at all) to 100 (ideal).
 
 Return a JSON array of these objects, ordered from most to least relevant.
 Limit the results to the top 3-5 most relevant researchers. If fewer match, return all matches.
@@ -478,46 +810,14 @@ If no researchers are a good match, return an empty JSON array ([]).
 Ensure the output is a valid JSON array.
 """
 
-    try:
-        response = model.generate_content(prompt)
-
-        if not response.parts:
-            if response.prompt_feedback and response.prompt_feedback.block_reason:
-                raise GeminiServiceError(f"Researcher matching blocked due to: {response.prompt_feedback.block_reason_message or response.prompt_feedback.block_reason}")
-            raise GeminiServiceError("Researcher matching failed: No content generated and no specific block reason.")
-
-        generated_text = response.text.strip()
-
-        if generated_text.startswith("```json"):
-            generated_text = generated_text[7:]
-            if generated_text.endswith("```"):
-                generated_text = generated_text[:-3]
-        generated_text = generated_text.strip()
-
-        if generated_text == "[]":
-            return []
-
-        try:
-            match_results = json.loads(generated_text)
-        except json.JSONDecodeError as jde:
-            print(f"Problematic JSON string from researcher matching: {generated_text}")
-            raise GeminiServiceError(f"Failed to parse AI response for researcher matching as JSON: {jde}. Response snippet: {generated_text[:200]}...")
-
-        if not isinstance(match_results, list):
-            print(f"Unexpected AI response format for researcher matching (not a list): {match_results}")
-            raise GeminiServiceError(f"AI response for researcher matching was not a list. Got: {type(match_results)}")
-
-        validated_results = []
-        required_keys = ["originalId", "name", "matchReason", "research"]
-        for item in match_results:
-            if not isinstance(item, dict):
-                print(f"Warning: Matched researcher item is not a dictionary: {item}")
-                continue
-            if not all(key in item for key in required_keys):
-                print(f"Warning: Matched researcher item missing some required keys ({required_keys}): {item}")
-                # continue # Be lenient for now, or make stricter based on needs
-            validated_results.append(item)
+    cache_key = make_cache_key("match_researchers_to_grant_via_ai", MODEL_NAME, prompt)
+    cached_result = response_cache.get(cache_key)
+    if cached_result is not None:
+        return cached_result
 
+    try:
+        validated_results = _generate_structured(prompt, RESEARCHER_MATCHES_SCHEMA, "Researcher matching")
+        response_cache.set(cache_key, validated_results)
         return validated_results
 
     except Exception as e:
@@ -528,23 +828,7 @@ Ensure the output is a valid JSON array.
 
 
 # --- New function: generate_grant_intro_email_via_ai ---
-def generate_grant_intro_email_via_ai(grant_details: dict, pi_details: dict) -> dict:
-    """
-    Generates a draft introductory email for a PI regarding a grant, using Gemini API.
-    Args:
-        grant_details (dict): Dictionary with grant information (title, agency, description, etc.).
-        pi_details (dict): Dictionary with PI information (name, email, department, research/bio).
-    Returns:
-        dict: A dictionary containing "subject" and "body" for the email draft.
-    Raises GeminiServiceError or ValueError for issues.
-    """
-    if not model:
-        raise GeminiServiceError("Gemini model is not configured or API key is missing.")
-    if not grant_details or not isinstance(grant_details, dict) or not grant_details.get("title"):
-        raise ValueError("Grant details must be a valid dictionary with at least a 'title'.")
-    if not pi_details or not isinstance(pi_details, dict) or not pi_details.get("name"):
-        raise ValueError("PI details must be a valid dictionary with at least a 'name'.")
-
+def _grant_email_prompt(grant_details: dict, pi_details: dict) -> str:
     # Prepare details for the prompt
     grant_title = grant_details.get('title', 'N/A')
     grant_agency = grant_details.get('agency', 'N/A')
@@ -589,33 +873,35 @@ Return the draft as a JSON object with two keys: "subject" and "body".
 Example: {{ "subject": "Inquiry regarding Grant [Grant Title]", "body": "Dear Program Officer,\\n\\nI am writing to..." }}
 Ensure the "body" is a single string, potentially with newline characters (\\n) for paragraph breaks.
 """
+    return prompt
 
-    try:
-        response = model.generate_content(prompt)
-
-        if not response.parts:
-            if response.prompt_feedback and response.prompt_feedback.block_reason:
-                raise GeminiServiceError(f"Email generation blocked due to: {response.prompt_feedback.block_reason_message or response.prompt_feedback.block_reason}")
-            raise GeminiServiceError("Email generation failed: No content generated and no specific block reason.")
-
-        generated_text = response.text.strip()
-
-        if generated_text.startswith("```json"):
-            generated_text = generated_text[7:]
-            if generated_text.endswith("```"):
-                generated_text = generated_text[:-3]
-        generated_text = generated_text.strip()
+def generate_grant_intro_email_via_ai(grant_details: dict, pi_details: dict) -> dict:
+    """
+    Generates a draft introductory email for a PI regarding a grant, using Gemini API.
+    Args:
+        grant_details (dict): Dictionary with grant information (title, agency, description, etc.).
+        pi_details (dict): Dictionary with PI information (name, email, department, research/bio).
+    Returns:
+        dict: A dictionary containing "subject" and "body" for the email draft.
+    Raises GeminiServiceError or ValueError for issues.
+    """
+    if not get_model():
+        raise GeminiServiceError("Gemini model is not configured or API key is missing.")
+    if not grant_details or not isinstance(grant_details, dict) or not grant_details.get("title"):
+        raise ValueError("Grant details must be a valid dictionary with at least a 'title'.")
+    if not pi_details or not isinstance(pi_details, dict) or not pi_details.get("name"):
+        raise ValueError("PI details must be a valid dictionary with at least a 'name'.")
 
-        try:
-            email_draft = json.loads(generated_text)
-        except json.JSONDecodeError as jde:
-            print(f"Problematic JSON string from email generation: {generated_text}")
-            raise GeminiServiceError(f"Failed to parse AI response for email generation as JSON: {jde}. Response snippet: {generated_text[:200]}...")
+    prompt = _grant_email_prompt(grant_details, pi_details)
 
-        if not isinstance(email_draft, dict) or not all(key in email_draft for key in ["subject", "body"]):
-            print(f"Unexpected AI response format for email draft: {email_draft}")
-            raise GeminiServiceError("AI response for email draft missing 'subject' or 'body'.")
+    cache_key = make_cache_key("generate_grant_intro_email_via_ai", MODEL_NAME, prompt)
+    cached_result = response_cache.get(cache_key)
+    if cached_result is not None:
+        return cached_result
 
+    try:
+        email_draft = _generate_structured(prompt, EMAIL_DRAFT_SCHEMA, "Email generation")
+        response_cache.set(cache_key, email_draft)
         return email_draft
 
     except Exception as e:
@@ -623,3 +909,41 @@ Ensure the "body" is a single string, potentially with newline characters (\\n)
         if isinstance(e, GeminiServiceError):
             raise
         raise GeminiServiceError(f"Failed to generate email draft via AI service: {str(e)}")
+
+
+def stream_grant_intro_email_via_ai(grant_details: dict, pi_details: dict):
+    """
+    Streaming variant of generate_grant_intro_email_via_ai. Validation happens on call.
+    Returns:
+        generator: ("delta", {"text": chunk}) events with the raw model output as it arrives, then
+                   ("done", {"subject": ..., "body": ...}) once the complete draft has been parsed.
+    Raises GeminiServiceError or ValueError (from the call itself, or from the generator while streaming).
+    """
+    if not get_model():
+        raise GeminiServiceError("Gemini model is not configured or API key is missing.")
+    if not grant_details or not isinstance(grant_details, dict) or not grant_details.get("title"):
+        raise ValueError("Grant details must be a valid dictionary with at least a 'title'.")
+    if not pi_details or not isinstance(pi_details, dict) or not pi_details.get("name"):
+        raise ValueError("PI details must be a valid dictionary with at least a 'name'.")
+
+    prompt = _grant_email_prompt(grant_details, pi_details)
+    cache_key = make_cache_key("generate_grant_intro_email_via_ai", MODEL_NAME, prompt) # Shared with the JSON variant
+
+    def events():
+        email_draft = response_cache.get(cache_key)
+        if email_draft is None:
+            chunks = []
+            try:
+                for text in _stream_content(prompt, "Email generation", generation_config=JSON_GENERATION_CONFIG):
+                    chunks.append(text)
+                    yield "delta", {"text": text}
+            except GeminiServiceError:
+                raise
+            except Exception as e:
+                print(f"Gemini API error while streaming email draft: {str(e)}")
+                raise GeminiServiceError(f"Failed to generate email draft via AI service: {str(e)}")
+            email_draft = _parse_structured("".join(chunks), EMAIL_DRAFT_SCHEMA, "Email generation")
+            response_cache.set(cache_key, email_draft)
+        yield "done", email_draft
+
+    return events()
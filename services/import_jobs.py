@@ -0,0 +1,302 @@
+import os
+import json
+import re
+import time
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone, timedelta
+from sqlalchemy import select, update, delete, text
+
+try:
+    import fcntl # Used to serialize imports across gunicorn worker processes (POSIX only)
+except ImportError:
+    fcntl = None
+
+from app import db
+from models.models import ImportJob
+from services.import_service import import_application_data, count_import_rows, validate_import_structure
+
+# Job status is kept in the import_job table, so any instance can answer a status poll.
+# Payloads are spooled here, on the instance that received them and runs the job.
+IMPORT_JOB_DIR = os.environ.get("IMPORT_JOB_DIR", os.path.join(tempfile.gettempdir(), "ucr_import_jobs"))
+
+# Minimum seconds between status writes while a job is running.
+STATUS_WRITE_INTERVAL = 0.5
+
+# A queued or running job whose worker hasn't refreshed its heartbeat for this long is marked failed:
+# the instance running it was stopped (e.g. scaled in or redeployed) and the job won't finish.
+IMPORT_JOB_STALE_SECONDS = float(os.environ.get("IMPORT_JOB_STALE_SECONDS", 600))
+# Seconds between heartbeats of a job's worker, sent from a separate thread whatever the import is doing.
+HEARTBEAT_INTERVAL = max(1.0, min(30.0, IMPORT_JOB_STALE_SECONDS / 4))
+# Finished jobs are deleted after this many seconds (default: 7 days).
+IMPORT_JOB_RETENTION_SECONDS = float(os.environ.get("IMPORT_JOB_RETENTION_SECONDS", 7 * 24 * 3600))
+
+INTERRUPTED_ERROR = "Import job was interrupted: the worker running it stopped before it finished."
+
+# Key of the PostgreSQL advisory lock that lets one import run at a time across instances
+IMPORT_ADVISORY_LOCK_KEY = 0x1D0C_1A0B
+
+_ACTIVE_STATUSES = ("queued", "running")
+_LOCK_POLL_INTERVAL = 2.0
+_SPOOL_CHUNK_SIZE = 1024 * 1024
+_JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+_jobs = ImportJob.__table__
+
+# One import at a time per process; the file and advisory locks below cover other processes and instances.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="import-job")
+
+_maintenance_done = False
+_maintenance_lock = threading.Lock()
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+def _payload_path(job_id):
+    return os.path.join(IMPORT_JOB_DIR, f"{job_id}.json")
+
+def _write_job(job_id, **values) -> bool:
+    """
+    Saves job columns in their own transaction, independent of the import's transaction in db.session.
+    Only queued or running jobs are updated, so a job already marked failed (e.g. by a status poll that found
+    it stale) keeps that status. Returns False if the job wasn't updated.
+    """
+    with db.engine.begin() as conn:
+        result = conn.execute(update(_jobs).where(_jobs.c.id == job_id, _jobs.c.status.in_(_ACTIVE_STATUSES)).values(**values))
+    return result.rowcount > 0
+
+def _progress_writes_supported():
+    # SQLite allows one writer at a time, and the import's transaction holds the write lock until it commits:
+    # there the status is only written before and after the import.
+    return db.engine.dialect.name != "sqlite"
+
+def _job_to_json(row):
+    return {
+        "jobId": row.id,
+        "status": row.status,
+        "phase": row.phase,
+        "payloadBytes": row.payload_bytes,
+        "rowsProcessed": row.rows_processed,
+        "totalRows": row.total_rows,
+        "rowsPerSecond": row.rows_per_second,
+        "submittedAt": _isoformat(row.submitted_at),
+        "startedAt": _isoformat(row.started_at),
+        "finishedAt": _isoformat(row.finished_at),
+        "imported": row.imported,
+        "error": row.error,
+    }
+
+
+# --- Stale jobs and cleanup ---
+def _fail_stale_jobs(conn, now, job_id=None):
+    """Marks queued/running jobs without a recent heartbeat as failed (only `job_id` if given)."""
+    stmt = update(_jobs).where(_jobs.c.status.in_(_ACTIVE_STATUSES),
+                               _jobs.c.heartbeat_at < now - timedelta(seconds=IMPORT_JOB_STALE_SECONDS))
+    if job_id is not None:
+        stmt = stmt.where(_jobs.c.id == job_id)
+    conn.execute(stmt.values(status="failed", error=INTERRUPTED_ERROR, finished_at=now))
+
+def _remove_orphaned_payloads(active_ids, now):
+    """Deletes spooled payloads (and partial uploads) on this instance that no queued or running job needs."""
+    try:
+        names = os.listdir(IMPORT_JOB_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        job_id = name.split(".", 1)[0]
+        if not _JOB_ID_PATTERN.match(job_id) or job_id in active_ids:
+            continue
+        path = os.path.join(IMPORT_JOB_DIR, name)
+        try:
+            # Skip recent files: an upload being spooled has no job row yet
+            if now.timestamp() - os.path.getmtime(path) > IMPORT_JOB_STALE_SECONDS:
+                os.remove(path)
+        except OSError:
+            pass
+
+def run_import_job_maintenance():
+    """
+    Fails jobs whose worker stopped (see IMPORT_JOB_STALE_SECONDS), deletes finished jobs older than
+    IMPORT_JOB_RETENTION_SECONDS and removes this instance's orphaned payload files.
+    Runs once per process, on its first use of import jobs. Call inside an app context.
+    """
+    global _maintenance_done
+    if _maintenance_done:
+        return
+    with _maintenance_lock:
+        if _maintenance_done:
+            return
+        now = _utcnow()
+        with db.engine.begin() as conn:
+            _fail_stale_jobs(conn, now)
+            conn.execute(delete(_jobs).where(_jobs.c.finished_at < now - timedelta(seconds=IMPORT_JOB_RETENTION_SECONDS)))
+            active_ids = set(conn.execute(select(_jobs.c.id).where(_jobs.c.status.in_(_ACTIVE_STATUSES))).scalars())
+        _remove_orphaned_payloads(active_ids, now)
+        _maintenance_done = True
+
+
+# --- Locking ---
+def _try_import_lock(lock_file):
+    if lock_file is not None:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+    if db.engine.dialect.name == "postgresql":
+        # Held by db.session's transaction, so it is released when the import commits or rolls back
+        acquired = db.session.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": IMPORT_ADVISORY_LOCK_KEY}).scalar()
+        if not acquired:
+            db.session.rollback()
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            return False
+    return True
+
+@contextmanager
+def _import_lock():
+    """Waits until no other import runs on this host or (PostgreSQL) instance."""
+    lock_file = open(os.path.join(IMPORT_JOB_DIR, "import.lock"), "w") if fcntl is not None else None
+    try:
+        while not _try_import_lock(lock_file):
+            time.sleep(_LOCK_POLL_INTERVAL)
+        yield
+    finally:
+        if lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+
+@contextmanager
+def _heartbeat(app, job_id):
+    """
+    Refreshes the job's heartbeat every HEARTBEAT_INTERVAL seconds from a separate thread while the block runs,
+    so long steps without progress callbacks (parsing, validation, waiting for the lock, the commit) don't
+    make a live job look stale.
+    """
+    stop = threading.Event()
+
+    def beat():
+        with app.app_context():
+            while not stop.wait(HEARTBEAT_INTERVAL):
+                try:
+                    _write_job(job_id, heartbeat_at=_utcnow())
+                except Exception as e:
+                    # E.g. SQLite while the import holds the write lock; a status poll can't mark the job failed then either
+                    app.logger.error(f"Could not refresh the heartbeat of import job {job_id}: {str(e)}")
+
+    thread = threading.Thread(target=beat, name=f"import-heartbeat-{job_id[:8]}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+# --- Jobs ---
+def submit_import_job(stream, app) -> str:
+    """
+    Spools an import payload from `stream` to disk and queues it for a background worker thread.
+    Args:
+        stream: File-like object with the raw JSON request body (e.g. request.stream), read until EOF.
+        app: The Flask application; the worker thread pushes its own app context.
+    Returns:
+        str: The job id to poll with get_import_job().
+    Raises ValueError if the stream is empty, OSError if the payload can't be spooled.
+    """
+    run_import_job_maintenance()
+    os.makedirs(IMPORT_JOB_DIR, exist_ok=True)
+    job_id = uuid.uuid4().hex
+
+    partial_path = _payload_path(job_id) + ".part"
+    payload_bytes = 0
+    with open(partial_path, "wb") as f:
+        while True:
+            chunk = stream.read(_SPOOL_CHUNK_SIZE)
+            if not chunk:
+                break
+            f.write(chunk)
+            payload_bytes += len(chunk)
+    if not payload_bytes:
+        os.remove(partial_path)
+        raise ValueError("No data provided")
+    os.replace(partial_path, _payload_path(job_id))
+
+    now = _utcnow()
+    with db.engine.begin() as conn:
+        conn.execute(_jobs.insert().values(id=job_id, status="queued", payload_bytes=payload_bytes, rows_processed=0,
+                                           submitted_at=now, heartbeat_at=now))
+    _executor.submit(_run_import_job, app, job_id)
+    return job_id
+
+
+def get_import_job(job_id: str):
+    """Returns the status dict for `job_id`, or None if there is no such job."""
+    if not _JOB_ID_PATTERN.match(job_id or ""):
+        return None
+    run_import_job_maintenance()
+    with db.engine.begin() as conn:
+        _fail_stale_jobs(conn, _utcnow(), job_id)
+        row = conn.execute(select(_jobs).where(_jobs.c.id == job_id)).first()
+    return _job_to_json(row) if row else None
+
+
+def _run_import_job(app, job_id):
+    with app.app_context():
+        job = {"rows_processed": 0}
+        try:
+            with _heartbeat(app, job_id), _import_lock():
+                started = time.monotonic()
+                job.update(status="running", phase="parse", started_at=_utcnow())
+                _write_job(job_id, heartbeat_at=_utcnow(), **job)
+
+                with open(_payload_path(job_id)) as f:
+                    try:
+                        data = json.load(f)
+                    except json.JSONDecodeError as jde:
+                        raise ValueError(f"Payload is not valid JSON: {jde}")
+                validate_import_structure(data) # Before counting rows, which needs the expected keys
+                job["total_rows"] = count_import_rows(data)
+
+                progress_writes = _progress_writes_supported()
+                last_write = [0.0]
+                def progress(phase, rows):
+                    job["rows_processed"] += rows
+                    elapsed = time.monotonic() - started
+                    job["rows_per_second"] = round(job["rows_processed"] / elapsed, 1) if elapsed > 0 else None
+                    now = time.monotonic()
+                    if progress_writes and (phase != job["phase"] or now - last_write[0] >= STATUS_WRITE_INTERVAL):
+                        job["phase"] = phase
+                        _write_job(job_id, heartbeat_at=_utcnow(), **job)
+                        last_write[0] = now
+
+                counts = import_application_data(data, progress=progress)
+                job["phase"] = "commit"
+                if progress_writes:
+                    _write_job(job_id, heartbeat_at=_utcnow(), **job)
+                db.session.commit()
+
+                elapsed = time.monotonic() - started
+                job.update(status="succeeded", phase="done", imported=counts, finished_at=_utcnow(),
+                           rows_per_second=round(job["rows_processed"] / elapsed, 1) if elapsed > 0 else None)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Import job {job_id} failed: {str(e)}")
+            job.update(status="failed", error=str(getattr(e, "orig", None) or e), finished_at=_utcnow())
+        finally:
+            db.session.remove()
+            try:
+                if not _write_job(job_id, heartbeat_at=_utcnow(), **job):
+                    app.logger.error(f"Import job {job_id} was marked failed before it finished; its result ({job.get('status')}) was not saved")
+            except Exception as e:
+                app.logger.error(f"Could not save the status of import job {job_id}: {str(e)}")
+            try:
+                os.remove(_payload_path(job_id))
+            except OSError:
+                pass
@@ -0,0 +1,258 @@
+from app import db
+from models.models import Researcher, Lab, Project, ComputeResource, Grant, Note, Tombstone, \
+    ComputeResourceType, GrantStatus, ComputeResourceStatus, RESET_ENTITY_TYPE, SKIP_TOMBSTONES, \
+    project_labs_table, project_compute_resources_table, project_grants_table, grant_co_pis_table
+from services.search_index import rebuild_search_index
+from datetime import datetime
+
+# Rows sent to the database per executemany / bulk insert round trip.
+IMPORT_CHUNK_SIZE = 1000
+
+# Top-level keys of the ApplicationData export that an import payload must contain.
+EXPECTED_KEYS = ["researchers", "labs", "projects", "computeResources", "grants"]
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _parse_datetime(value):
+    """Parses the isoformat() strings written by the export. Accepts a trailing 'Z'."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Invalid date value: {value}")
+
+def _require(record, keys, entity_name):
+    missing = [k for k in keys if record.get(k) in (None, "")]
+    if missing:
+        raise ValueError(f"{entity_name} data missing required fields {missing}: {record}")
+
+def _resolve(id_map, json_id, entity_name, required=False):
+    """Translates an id from the import payload to the id the row received in the database."""
+    if json_id is None or json_id == "":
+        if required:
+            raise ValueError(f"Missing required {entity_name} reference")
+        return None
+    try:
+        return id_map[str(json_id)]
+    except KeyError:
+        raise ValueError(f"{entity_name} with id {json_id} referenced in import data was not found in the payload")
+
+def _insert_entities(model, records, to_mapping, progress=None):
+    """
+    Bulk inserts `records` (payload dicts) in chunks and returns {json_id: db_id}.
+    return_defaults=True makes SQLAlchemy populate each mapping's primary key after the insert.
+    """
+    id_map = {}
+    for chunk in _chunks(records, IMPORT_CHUNK_SIZE):
+        mappings = [to_mapping(record) for record in chunk]
+        db.session.bulk_insert_mappings(model, mappings, return_defaults=True)
+        if progress:
+            progress(model.__tablename__, len(chunk))
+        for record, mapping in zip(chunk, mappings):
+            if record.get("id") is not None:
+                id_map[str(record["id"])] = mapping["id"]
+    return id_map
+
+def _insert_links(table, rows, progress=None):
+    # Deduplicate first: association tables use a composite primary key
+    rows = list({tuple(sorted(row.items())): row for row in rows}.values())
+    for chunk in _chunks(rows, IMPORT_CHUNK_SIZE):
+        db.session.execute(table.insert(), chunk)
+        if progress:
+            progress(table.name, len(chunk))
+    return len(rows)
+
+def validate_import_structure(data):
+    """
+    Checks the top-level shape of an import payload, for the synchronous and asynchronous import alike.
+    Raises ValueError if `data` is empty, not an object or missing one of EXPECTED_KEYS.
+    """
+    if not data:
+        raise ValueError("No data provided")
+    if not isinstance(data, dict):
+        raise ValueError("Invalid data structure. Expected a JSON object.")
+    if not all(key in data for key in EXPECTED_KEYS):
+        raise ValueError("Invalid data structure. Missing one or more top-level keys.")
+
+def count_import_rows(data: dict) -> int:
+    """Total number of rows (entities, notes and relationship links) an import payload will write."""
+    researchers_data = data.get("researchers") or []
+    total = sum(len(data.get(key) or []) for key in EXPECTED_KEYS)
+    total += sum(len(r.get("notes") or []) for r in researchers_data)
+    for p_data in data.get("projects") or []:
+        total += sum(len(p_data.get(key) or []) for key in ("labIds", "computeResourceIds", "grantIds"))
+    total += sum(len(g.get("coPiIds") or []) for g in data.get("grants") or [])
+    return total
+
+
+def clear_all_data():
+    """
+    Deletes every row the import replaces, using one statement per table.
+    Association tables and notes go first, then the circular Lab <-> Researcher
+    foreign keys are nulled so labs and researchers can be deleted.
+    Instead of one tombstone per deleted row, a single reset marker tells sync
+    clients (/api/data/changes) that they need a full resync.
+    """
+    db.session.info[SKIP_TOMBSTONES] = True
+    try:
+        for table in (project_labs_table, project_compute_resources_table, project_grants_table, grant_co_pis_table):
+            db.session.execute(table.delete())
+        Note.query.delete(synchronize_session=False)
+        Project.query.delete(synchronize_session=False)
+        Grant.query.delete(synchronize_session=False)
+        ComputeResource.query.delete(synchronize_session=False)
+        Lab.query.update({Lab.principal_investigator_id: None}, synchronize_session=False)
+        Researcher.query.update({Researcher.lab_id: None}, synchronize_session=False)
+        Lab.query.delete(synchronize_session=False)
+        Researcher.query.delete(synchronize_session=False)
+        # Older tombstones are superseded by the reset marker
+        Tombstone.query.delete(synchronize_session=False)
+    finally:
+        db.session.info.pop(SKIP_TOMBSTONES, None)
+    db.session.add(Tombstone(entity_type=RESET_ENTITY_TYPE))
+
+
+def import_application_data(data: dict, progress=None) -> dict:
+    """
+    Replaces all application data with the contents of an ApplicationData export.
+    Args:
+        data (dict): Payload in the format produced by GET /api/data/export.
+        progress (callable, optional): Called as progress(phase, rows) after each chunk is written,
+                                       where `rows` is the number of rows in that chunk.
+    Returns:
+        dict: Number of rows imported per entity / association.
+    Raises ValueError for structurally invalid data or dangling references.
+    The caller owns the transaction: nothing is committed here.
+    """
+    validate_import_structure(data)
+
+    researchers_data = data.get("researchers") or []
+    labs_data = data.get("labs") or []
+    projects_data = data.get("projects") or []
+    compute_resources_data = data.get("computeResources") or []
+    grants_data = data.get("grants") or []
+
+    if progress:
+        progress("delete", 0)
+    clear_all_data()
+    db.session.flush()
+
+    # Researchers first (lab_id is linked once labs exist)
+    for r_data in researchers_data:
+        _require(r_data, ["name", "email", "department"], "Researcher")
+    researcher_ids = _insert_entities(Researcher, researchers_data, lambda r: {
+        "name": r["name"], "email": r["email"], "department": r["department"], "bio": r.get("bio"),
+    }, progress)
+
+    for l_data in labs_data:
+        _require(l_data, ["name"], "Lab")
+    lab_ids = _insert_entities(Lab, labs_data, lambda l: {
+        "name": l["name"], "description": l.get("description"),
+        "principal_investigator_id": _resolve(researcher_ids, l.get("principalInvestigatorId"), "Principal Investigator"),
+    }, progress)
+
+    # Researcher -> Lab membership, as one bulk UPDATE per chunk
+    lab_memberships = [
+        {"id": researcher_ids[str(r["id"])], "lab_id": _resolve(lab_ids, r.get("labId"), "Lab")}
+        for r in researchers_data if r.get("id") is not None and r.get("labId") not in (None, "")
+    ]
+    for chunk in _chunks(lab_memberships, IMPORT_CHUNK_SIZE):
+        db.session.bulk_update_mappings(Researcher, chunk)
+
+    for cr_data in compute_resources_data:
+        _require(cr_data, ["name", "type", "specification", "status"], "ComputeResource")
+    compute_resource_ids = _insert_entities(ComputeResource, compute_resources_data, lambda cr: {
+        "name": cr["name"], "resource_type": ComputeResourceType(cr["type"]),
+        "specification": cr["specification"], "status": ComputeResourceStatus(cr["status"]),
+        "description": cr.get("description"), "cluster_type": cr.get("clusterType"),
+        "nodes": cr.get("nodes"), "cpus_per_node": cr.get("cpusPerNode"),
+        "gpus_per_node": cr.get("gpusPerNode"), "memory_per_node": cr.get("memoryPerNode"),
+        "storage_per_node": cr.get("storagePerNode"), "network_bandwidth": cr.get("networkBandwidth"),
+    }, progress)
+
+    for g_data in grants_data:
+        _require(g_data, ["title", "agency", "amount", "principalInvestigatorId"], "Grant")
+    grant_ids = _insert_entities(Grant, grants_data, lambda g: {
+        "title": g["title"], "agency": g["agency"], "amount": g["amount"],
+        "status": GrantStatus(g["status"]) if g.get("status") else GrantStatus.PENDING,
+        "description": g.get("description"), "grant_number": g.get("grantNumber"),
+        "proposal_due_date": _parse_datetime(g.get("proposalDueDate")),
+        "award_date": _parse_datetime(g.get("awardDate")),
+        "start_date": _parse_datetime(g.get("startDate")),
+        "end_date": _parse_datetime(g.get("endDate")),
+        "pi_id": _resolve(researcher_ids, g.get("principalInvestigatorId"), "Principal Investigator", required=True),
+    }, progress)
+
+    for p_data in projects_data:
+        _require(p_data, ["name", "leadResearcherId"], "Project")
+    project_ids = _insert_entities(Project, projects_data, lambda p: {
+        "name": p["name"], "description": p.get("description"),
+        "start_date": _parse_datetime(p.get("startDate")),
+        "end_date": _parse_datetime(p.get("endDate")),
+        "pi_id": _resolve(researcher_ids, p.get("leadResearcherId"), "Lead Researcher", required=True),
+    }, progress)
+
+    # Notes are nested under researchers in the export
+    notes_data = []
+    for r_data in researchers_data:
+        for note_data in r_data.get("notes") or []:
+            _require(note_data, ["content"], "Note")
+            notes_data.append({
+                "content": note_data["content"],
+                "researcher_id": researcher_ids[str(r_data["id"])] if r_data.get("id") is not None
+                                 else _resolve(researcher_ids, note_data.get("researcherId"), "Researcher", required=True),
+                "project_id": _resolve(project_ids, note_data.get("projectId"), "Project"),
+                "created_at": _parse_datetime(note_data.get("createdAt")),
+                "updated_at": _parse_datetime(note_data.get("updatedAt")),
+            })
+    for note_mapping in notes_data:
+        if note_mapping["created_at"] is None:
+            del note_mapping["created_at"] # Let the server default apply
+    # bulk_insert_mappings groups mappings with the same keys into one executemany
+    for chunk in _chunks(notes_data, IMPORT_CHUNK_SIZE):
+        db.session.bulk_insert_mappings(Note, chunk)
+        if progress:
+            progress(Note.__tablename__, len(chunk))
+
+    # Many-to-many links, resolved through the id maps and inserted in bulk
+    project_labs, project_compute_resources, project_grants = [], [], []
+    for p_data in projects_data:
+        project_id = project_ids.get(str(p_data.get("id")))
+        if project_id is None:
+            continue
+        project_labs += [{"project_id": project_id, "lab_id": _resolve(lab_ids, lab_id, "Lab", required=True)}
+                         for lab_id in p_data.get("labIds") or []]
+        project_compute_resources += [{"project_id": project_id, "compute_resource_id": _resolve(compute_resource_ids, cr_id, "Compute Resource", required=True)}
+                                      for cr_id in p_data.get("computeResourceIds") or []]
+        project_grants += [{"project_id": project_id, "grant_id": _resolve(grant_ids, grant_id, "Grant", required=True)}
+                           for grant_id in p_data.get("grantIds") or []]
+
+    grant_co_pis = []
+    for g_data in grants_data:
+        grant_id = grant_ids.get(str(g_data.get("id")))
+        if grant_id is None:
+            continue
+        grant_co_pis += [{"grant_id": grant_id, "researcher_id": _resolve(researcher_ids, co_pi_id, "Co-PI Researcher", required=True)}
+                         for co_pi_id in g_data.get("coPiIds") or []]
+
+    # The bulk inserts above bypass the flush listener that maintains the search index
+    rebuild_search_index()
+
+    return {
+        "researchers": len(researchers_data),
+        "labs": len(labs_data),
+        "projects": len(projects_data),
+        "computeResources": len(compute_resources_data),
+        "grants": len(grants_data),
+        "notes": len(notes_data),
+        "projectLabs": _insert_links(project_labs_table, project_labs, progress),
+        "projectComputeResources": _insert_links(project_compute_resources_table, project_compute_resources, progress),
+        "projectGrants": _insert_links(project_grants_table, project_grants, progress),
+        "grantCoPis": _insert_links(grant_co_pis_table, grant_co_pis, progress),
+    }
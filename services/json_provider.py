@@ -0,0 +1,100 @@
+import os
+import json
+import uuid
+import decimal
+import dataclasses
+from datetime import date, datetime, time
+from enum import Enum
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError: # Optional; responses are encoded with the stdlib json module instead
+    orjson = None
+
+# JSON encoding for every response (jsonify, request.get_json, the NDJSON export).
+# JSON_PROVIDER selects it:
+#   "orjson" - OrjsonJSONProvider, several times faster on large payloads (default; needs the orjson package)
+#   "stdlib" - StdlibJSONProvider, Flask's default provider
+# Both produce the same JSON: datetimes/dates/times as ISO 8601, enums (ComputeResourceType, GrantStatus,
+# ComputeResourceStatus, ...) as their value, decimals and UUIDs as strings, keys sorted as Flask does.
+
+JSON_PROVIDER = os.environ.get("JSON_PROVIDER", "orjson").lower()
+
+
+def json_default(o):
+    """Encodes values the json module can't (orjson handles most of these itself)."""
+    if isinstance(o, (datetime, date, time)):
+        return o.isoformat()
+    if isinstance(o, Enum):
+        return o.value
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's provider with ISO 8601 datetimes and enum support."""
+    default = staticmethod(json_default)
+
+    def dumps_compact(self, obj) -> str:
+        """Compact, unsorted single-line JSON, for streamed records (NDJSON lines)."""
+        return json.dumps(obj, default=json_default, separators=(",", ":"))
+
+
+class OrjsonJSONProvider(StdlibJSONProvider):
+    """
+    Encodes and decodes with orjson. Calls with json.dumps/loads keyword arguments, and values orjson
+    can't encode (e.g. integers beyond 64 bits), go to the stdlib implementation.
+    """
+    def _options(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(obj, default=json_default, option=self._options()).decode()
+        except orjson.JSONEncodeError:
+            return super().dumps(obj)
+
+    def dumps_compact(self, obj) -> str:
+        try:
+            return orjson.dumps(obj, default=json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+        except orjson.JSONEncodeError:
+            return super().dumps_compact(obj)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s) # orjson.JSONDecodeError is a ValueError, as Flask's request parsing expects
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Pretty-printed in debug mode unless compact is set, like Flask's provider
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            body = orjson.dumps(obj, default=json_default, option=self._options(indent) | orjson.OPT_APPEND_NEWLINE)
+        except orjson.JSONEncodeError:
+            return super().response(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def create_json_provider(app, provider_name=JSON_PROVIDER):
+    """The provider for `app` selected by `provider_name`; stdlib if orjson is requested but not installed."""
+    if provider_name == "orjson" and orjson is not None:
+        return OrjsonJSONProvider(app)
+    if provider_name == "orjson":
+        print("Warning: orjson is not installed; using the stdlib JSON provider.")
+    elif provider_name != "stdlib":
+        print(f"Warning: unknown JSON_PROVIDER '{provider_name}', using the stdlib JSON provider.")
+    return StdlibJSONProvider(app)
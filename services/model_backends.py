@@ -0,0 +1,188 @@
+import os
+import re
+import json
+import time
+import zlib
+import random
+from collections import Counter
+
+# Model backends for services/gemini_service.py, chosen with GEMINI_MODEL_BACKEND:
+#   "gemini" - the real Gemini API through google-generativeai (default; needs API_KEY)
+#   "fake"   - FakeGenerativeModel below: no network or credentials, deterministic answers
+# Both expose the subset of genai.GenerativeModel the service uses:
+#   generate_content(prompt, generation_config=None, request_options=None, stream=False)
+# returning an object with .parts, .text and .prompt_feedback (an iterable of those when streaming).
+
+GEMINI_MODEL_BACKEND = os.getenv("GEMINI_MODEL_BACKEND", "gemini").lower()
+
+# Fake model timing: every call takes FAKE_MODEL_LATENCY seconds plus up to FAKE_MODEL_JITTER more.
+# The jitter is derived from the prompt, so a given prompt always takes the same time.
+FAKE_MODEL_LATENCY = float(os.getenv("FAKE_MODEL_LATENCY", "0.2"))
+FAKE_MODEL_JITTER = float(os.getenv("FAKE_MODEL_JITTER", "0"))
+FAKE_STREAM_CHUNKS = 4
+
+
+def create_model(backend_name=GEMINI_MODEL_BACKEND, model_name=None, api_key=None):
+    """
+    Builds the model for `backend_name`. Returns None if the Gemini client can't be configured,
+    which the service reports as "model is not configured".
+    """
+    if backend_name == "fake":
+        return FakeGenerativeModel(FAKE_MODEL_LATENCY, FAKE_MODEL_JITTER)
+    if backend_name != "gemini":
+        print(f"Warning: unknown GEMINI_MODEL_BACKEND '{backend_name}', using the Gemini API.")
+    try:
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        return genai.GenerativeModel(model_name)
+    except Exception as e:
+        # Handle cases where API_KEY might be None or invalid at configuration time
+        print(f"Error configuring Gemini API: {e}")
+        return None
+
+
+# --- Fake model ---
+class FakeResponse:
+    """Shaped like the SDK's GenerateContentResponse (or one streamed chunk of it)."""
+    prompt_feedback = None
+
+    def __init__(self, text):
+        self.text = text
+        self.parts = [text] if text else []
+
+
+class FakeStreamResponse:
+    """Iterates over chunks of the answer, spreading the call's latency across them."""
+    prompt_feedback = None
+
+    def __init__(self, text, delay):
+        self.text = text
+        self._delay = delay
+
+    def __iter__(self):
+        size = max(len(self.text) // FAKE_STREAM_CHUNKS, 1)
+        chunks = [self.text[i:i + size] for i in range(0, len(self.text), size)] or [""]
+        for chunk in chunks:
+            time.sleep(self._delay / len(chunks))
+            yield FakeResponse(chunk)
+
+
+class FakeGenerativeModel:
+    """
+    Local stand-in for genai.GenerativeModel. Recognizes the service's prompts and answers each
+    with canned JSON that matches its schema, built from the ids and names in the prompt, after
+    the configured latency. Calls whose latency exceeds the request timeout raise TimeoutError
+    once the timeout has passed, like a hung HTTP request would.
+    """
+    def __init__(self, latency=0.2, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+
+    def generate_content(self, prompt, generation_config=None, request_options=None, stream=False):
+        self.calls += 1
+        delay = self._delay(prompt)
+        timeout = (request_options or {}).get("timeout")
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Fake model call took longer than {timeout:.1f}s")
+        text = self._answer(prompt)
+        if stream:
+            return FakeStreamResponse(text, delay)
+        time.sleep(delay)
+        return FakeResponse(text)
+
+    def _delay(self, prompt):
+        if not self.jitter:
+            return self.latency
+        return self.latency + random.Random(zlib.crc32(prompt.encode("utf-8"))).uniform(0, self.jitter)
+
+    def _answer(self, prompt):
+        for marker, answer in _ANSWERS:
+            if marker in prompt:
+                return answer(prompt)
+        return "This is a response from the local fake model."
+
+
+def _section(prompt, header):
+    """The compact JSON array printed on the line after `header` in a prompt, or []."""
+    match = re.search(rf"^{re.escape(header)}\n(?:---\n)?(\[.*\])$", prompt, re.MULTILINE)
+    if not match:
+        return []
+    try:
+        return json.loads(match.group(1))
+    except ValueError:
+        return []
+
+def _line_value(prompt, label):
+    match = re.search(rf"^\s*-?\s*{re.escape(label)}:?\s*(.*)$", prompt, re.MULTILINE)
+    return match.group(1).strip() if match else "N/A"
+
+def _quoted_text(prompt):
+    match = re.search(r"\n---\n(.*)\n---\n", prompt, re.DOTALL)
+    return match.group(1).strip() if match else prompt
+
+def _fake_summary(prompt):
+    sentences = re.split(r"(?<=[.!?])\s+", _quoted_text(prompt))
+    return " ".join(sentences[:2])
+
+def _fake_notes_analysis(prompt):
+    words = Counter(word for word in re.findall(r"[a-z]{5,}", _quoted_text(prompt).lower()))
+    return json.dumps({
+        "sentiment": "Neutral",
+        "keyThemes": [word for word, _ in words.most_common(3)] or ["general"],
+        "summary": _fake_summary(prompt),
+    })
+
+_SEARCH_SECTIONS = (("Researchers:", "Researcher", "name"), ("Labs:", "Lab", "name"), ("Projects:", "Project", "name"),
+                    ("Compute Resources:", "ComputeResource", "name"), ("Grants:", "Grant", "title"), ("Notes:", "Note", "content"))
+
+def _fake_global_search(prompt):
+    results = []
+    for header, item_type, name_key in _SEARCH_SECTIONS:
+        for item in _section(prompt, header)[:2]:
+            results.append({"id": str(item.get("id")), "type": item_type, "name": str(item.get(name_key, ""))[:40],
+                            "matchContext": f"{item_type} ranked relevant to the query by the local retrieval stage."})
+    return json.dumps(results)
+
+def _fake_external_grants(prompt):
+    keywords = _line_value(prompt, "Keywords")
+    return json.dumps([{
+        "id": f"temp-grant-{i}",
+        "title": f"{keywords} Research Program {i}",
+        "agency": "National Science Foundation",
+        "description": f"Supports university research on {keywords}.",
+        "awardNumber": f"NSF-25-{500 + i}",
+        "amount": "Up to $500,000",
+        "submissionDate": "Rolling Basis",
+        "url": "https://www.nsf.gov/funding/",
+    } for i in range(1, 6)])
+
+def _fake_researcher_matches(prompt):
+    researchers = _section(prompt, "Internal Researchers:")
+    return json.dumps([{
+        "originalId": str(r.get("id")),
+        "name": r.get("name"),
+        "matchReason": f"{r.get('name')}'s work in {r.get('department')} aligns with the grant description.",
+        "research": r.get("research", ""),
+        "matchScore": 90 - 10 * position,
+    } for position, r in enumerate(researchers[:3])])
+
+def _fake_email_draft(prompt):
+    title = _line_value(prompt, "- Title")
+    name = _line_value(prompt, "- Name")
+    return json.dumps({
+        "subject": f"Inquiry regarding {title}",
+        "body": f"Dear Program Officer,\n\nI am writing to express my interest in {title}. "
+                f"Would you be available for a brief call to discuss it?\n\nSincerely,\n{name}",
+    })
+
+# Prompt marker -> answer builder, checked in order
+_ANSWERS = (
+    ("Please provide a concise summary", _fake_summary),
+    ("Analyze the following text", _fake_notes_analysis),
+    ("Please perform a global search", _fake_global_search),
+    ("search for external research grant opportunities", _fake_external_grants),
+    ("identify the most suitable researchers", _fake_researcher_matches),
+    ("draft a professional introductory email", _fake_email_draft),
+)
@@ -0,0 +1,222 @@
+import os
+import time
+import sqlite3
+import threading
+
+# Upstream protection for the Gemini client: a token-bucket rate limiter (per process, or shared
+# by all workers on the host through SQLite) and a circuit breaker that rejects calls immediately
+# while the upstream keeps failing, instead of letting every request wait for its own timeout.
+
+
+class RateLimitExceeded(Exception):
+    """No token will be available within the caller's wait budget."""
+    def __init__(self, retry_after):
+        super().__init__(f"Rate limit exceeded; retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+class CircuitOpenError(Exception):
+    """The circuit breaker is rejecting calls."""
+    def __init__(self, retry_after):
+        super().__init__(f"Upstream marked unhealthy; retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+# HTTP statuses the Google API client reports (exc.code) for failures worth backing off from
+TRANSIENT_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+def is_transient_error(exc) -> bool:
+    """True for timeouts, connection problems, quota (429) and 5xx errors; False for bad requests and the like."""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(exc, "code", None)
+    return isinstance(code, int) and code in TRANSIENT_STATUS_CODES
+
+
+# --- Rate limiting ---
+class _TokenBucketBase:
+    """
+    `rate` tokens per second up to `burst`. acquire() reserves a token and sleeps until it is due,
+    but raises RateLimitExceeded instead if that would take longer than `max_wait`.
+    """
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.throttled = 0 # acquire() calls that had to sleep
+        self.rejected = 0 # acquire() calls that raised
+
+    def acquire(self, max_wait):
+        if self.rate <= 0:
+            return # Disabled
+        wait = self._reserve(max_wait)
+        if wait is None:
+            self.rejected += 1
+            raise RateLimitExceeded(self._time_until_token())
+        if wait > 0:
+            self.throttled += 1
+            time.sleep(wait)
+
+    def stats(self) -> dict:
+        return {"backend": type(self).__name__, "ratePerSecond": self.rate, "burst": self.burst,
+                "throttled": self.throttled, "rejected": self.rejected}
+
+    @staticmethod
+    def _take(tokens, elapsed, rate, burst, max_wait):
+        """Refills, then reserves one token. Returns (new token count, seconds to wait or None if too long)."""
+        tokens = min(burst, tokens + elapsed * rate) - 1
+        wait = -tokens / rate if tokens < 0 else 0.0
+        if wait > max_wait:
+            return tokens + 1, None # Give the token back
+        return tokens, wait
+
+
+class TokenBucket(_TokenBucketBase):
+    """Per-process bucket."""
+    def __init__(self, rate, burst):
+        super().__init__(rate, burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, max_wait):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens, wait = self._take(self._tokens, now - self._updated, self.rate, self.burst, max_wait)
+            self._updated = now
+            return wait
+
+    def _time_until_token(self):
+        return max(-self._tokens, 0) / self.rate + 1 / self.rate
+
+
+class SQLiteTokenBucket(_TokenBucketBase):
+    """Bucket shared by every process using the same database file (one row per bucket name)."""
+    def __init__(self, rate, burst, path, name="gemini"):
+        super().__init__(rate, burst)
+        self.path = path
+        self.name = name
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS token_bucket (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO token_bucket (name, tokens, updated) VALUES (?, ?, ?)", (name, float(burst), time.time()))
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _reserve(self, max_wait):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE") # Take the write lock before reading so processes don't race
+        try:
+            tokens, updated = conn.execute("SELECT tokens, updated FROM token_bucket WHERE name = ?", (self.name,)).fetchone()
+            now = time.time()
+            tokens, wait = self._take(tokens, max(now - updated, 0), self.rate, self.burst, max_wait)
+            conn.execute("UPDATE token_bucket SET tokens = ?, updated = ? WHERE name = ?", (tokens, now, self.name))
+            conn.execute("COMMIT")
+            self._last_tokens = tokens
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _time_until_token(self):
+        return max(-getattr(self, "_last_tokens", 0), 0) / self.rate + 1 / self.rate
+
+
+# --- Circuit breaker ---
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive transient failures.
+    open -> half_open once `reset_timeout` seconds have passed; one trial call is let through.
+    half_open -> closed if the trial succeeds, back to open if it fails.
+    Per process; counts every transition for monitoring.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.rejected = 0
+        self.transitions = {self.OPEN: 0, self.HALF_OPEN: 0, self.CLOSED: 0}
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        if state != self.state:
+            print(f"Gemini circuit breaker: {self.state} -> {state}")
+            self.state = state
+            self.transitions[state] += 1
+
+    def _retry_after(self):
+        return max(self._opened_at + self.reset_timeout - time.monotonic(), 0.0)
+
+    def check(self):
+        """Raises CircuitOpenError while open, without reserving anything. Used before queueing a call."""
+        with self._lock:
+            if self.state == self.OPEN and self._retry_after() > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self._retry_after())
+
+    def before_call(self):
+        """Admits a call or raises CircuitOpenError. In half_open only one trial call is admitted."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if self._retry_after() > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self._retry_after())
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpenError(1.0)
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._trial_in_flight = False
+            self.consecutive_failures = 0
+            self._set_state(self.CLOSED)
+
+    def release(self):
+        """Settles an admitted call that says nothing about upstream health (not sent, or abandoned by the client)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self, exc):
+        """
+        Only transient upstream failures count. Any other error ends the failure streak while closed, but never
+        changes the state: a late 4xx from a call admitted before the breaker opened mustn't close it again.
+        """
+        if not is_transient_error(exc):
+            with self._lock:
+                self._trial_in_flight = False
+                if self.state == self.CLOSED:
+                    self.consecutive_failures = 0
+            return
+        with self._lock:
+            self._trial_in_flight = False
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutiveFailures": self.consecutive_failures,
+            "failureThreshold": self.failure_threshold,
+            "resetTimeoutSeconds": self.reset_timeout,
+            "retryAfterSeconds": round(self._retry_after(), 1) if self.state == self.OPEN else 0,
+            "rejectedCalls": self.rejected,
+            "transitions": {"opened": self.transitions[self.OPEN], "halfOpened": self.transitions[self.HALF_OPEN],
+                            "closed": self.transitions[self.CLOSED]},
+        }
@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# Cache of validated AI results keyed on sha256(function, model name, normalized prompt).
+# Backends (GEMINI_CACHE_BACKEND):
+#   "memory" - in-process LRU (default)
+#   "sqlite" - on-disk store at GEMINI_CACHE_PATH, shared by all gunicorn workers on the host
+#   "none"   - caching disabled
+# Values are stored as JSON, so anything the service returns (str, dict, list) can be cached.
+
+GEMINI_CACHE_BACKEND = os.environ.get("GEMINI_CACHE_BACKEND", "memory").lower()
+GEMINI_CACHE_TTL = float(os.environ.get("GEMINI_CACHE_TTL", "3600")) # Seconds
+GEMINI_CACHE_MAX_ENTRIES = int(os.environ.get("GEMINI_CACHE_MAX_ENTRIES", "1024"))
+GEMINI_CACHE_PATH = os.environ.get("GEMINI_CACHE_PATH", os.path.join(tempfile.gettempdir(), "ucr_gemini_cache.sqlite3"))
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Unicode NFC and collapsed whitespace, so trivially different prompts share an entry."""
+    return " ".join(unicodedata.normalize("NFC", prompt).split())
+
+def make_cache_key(function_name: str, model_name: str, prompt: str) -> str:
+    material = "\x1f".join((function_name, model_name, normalize_prompt(prompt)))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """Thread-safe in-process LRU with per-entry expiry."""
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """
+    On-disk store usable from several processes. Reads refresh accessed_at; when the table
+    grows past max_entries the least recently accessed rows are deleted.
+    """
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._local = threading.local() # sqlite3 connections can't be shared between threads
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS response_cache ("
+                         "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_accessed_at ON response_cache (accessed_at)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL") # Readers don't block the writer
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute("SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO response_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                         (key, value, now + ttl, now))
+            excess = conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute("DELETE FROM response_cache WHERE key IN "
+                             "(SELECT key FROM response_cache ORDER BY expires_at <= ? DESC, accessed_at LIMIT ?)", (now, excess))
+                self.evictions += excess
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM response_cache")
+
+    def size(self):
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """Front end over a backend: JSON encoding, TTL and hit/miss counters (per process)."""
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss."""
+        if self.backend is None:
+            return None
+        try:
+            value = self.backend.get(key)
+        except sqlite3.Error as e:
+            print(f"Response cache read failed: {e}")
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        if self.backend is None or value is None:
+            return
+        try:
+            self.backend.set(key, json.dumps(value), self.ttl)
+        except sqlite3.Error as e:
+            # A cache that can't be written must not fail the request
+            print(f"Response cache write failed: {e}")
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": getattr(self.backend, "evictions", 0),
+            "entries": self.backend.size() if self.backend is not None else 0,
+            "maxEntries": getattr(self.backend, "max_entries", 0),
+            "ttlSeconds": self.ttl,
+        }
+
+
+def create_response_cache(backend_name=GEMINI_CACHE_BACKEND):
+    """Builds the cache configured by the GEMINI_CACHE_* environment variables."""
+    if backend_name == "none":
+        return ResponseCache(None, GEMINI_CACHE_TTL)
+    if backend_name == "sqlite":
+        return ResponseCache(SQLiteCacheBackend(GEMINI_CACHE_PATH, GEMINI_CACHE_MAX_ENTRIES), GEMINI_CACHE_TTL)
+    if backend_name != "memory":
+        print(f"Warning: unknown GEMINI_CACHE_BACKEND '{backend_name}', using the in-process cache.")
+    return ResponseCache(MemoryCacheBackend(GEMINI_CACHE_MAX_ENTRIES), GEMINI_CACHE_TTL)
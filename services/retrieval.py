@@ -0,0 +1,141 @@
+import json
+import math
+import re
+from collections import Counter
+
+# Local retrieval stage for AI prompts: ranks serialized context items against a query with
+# Okapi BM25 and packs the best ones into a prompt under a token budget, so the model only
+# sees what is relevant instead of whichever rows happen to come first.
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Rough size of a token for Gemini-style tokenizers; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+STOPWORDS = frozenset("""
+a about an and are as at be by for from has have in is it its of on or that the this to was were
+what which who with any all do does find me show list my our their there these those
+""".split())
+
+
+# Suffixes stripped by stem(), longest first; (suffix, replacement)
+_SUFFIXES = (("ations", ""), ("ation", ""), ("ings", ""), ("ing", ""), ("ers", ""), ("er", ""),
+             ("ies", "y"), ("ied", "y"), ("ed", ""), ("es", ""), ("s", ""))
+_MIN_STEM_LENGTH = 3
+
+
+def stem(term: str) -> str:
+    """
+    Light suffix stripping so inflected forms share a term: genomics/genomic, sequencer/sequencing,
+    studies/study, models/modeled/model. Not a full stemmer; short words and numbers are kept as they are.
+    """
+    if len(term) <= 4 or not term.isalpha():
+        return term
+    for suffix, replacement in _SUFFIXES:
+        if term.endswith(suffix) and len(term) - len(suffix) >= _MIN_STEM_LENGTH:
+            if suffix == "es" and not term[:-2].endswith(("s", "x", "z", "ch", "sh")):
+                continue # "images" -> "image" (via "s"), but "processes" -> "process"
+            if suffix == "s" and term.endswith(("ss", "us", "is")):
+                return term # "process", "campus", "analysis"
+            return term[:-len(suffix)] + replacement
+    return term
+
+def tokenize(text: str) -> list[str]:
+    return [stem(term) for term in re.findall(r"\w+", text.lower()) if term not in STOPWORDS]
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def _item_text(item: dict) -> str:
+    # Every string value except ids and references (id, principalInvestigatorId, ...)
+    return " ".join(str(value) for key, value in item.items()
+                    if value and not key.lower().endswith("id") and isinstance(value, (str, int, float)))
+
+def rank_context_items(query: str, context_data: dict) -> list[tuple[float, str, dict]]:
+    """
+    Scores every item of every list in `context_data` against `query` with BM25.
+    Args:
+        query (str): The search query.
+        context_data (dict): Lists of serialized items keyed by type (e.g. "researchers").
+    Returns:
+        list[tuple]: (score, type key, item) for items sharing at least one term with the query, best first.
+    """
+    query_terms = set(tokenize(query))
+    if not query_terms:
+        return []
+
+    documents = []
+    for key, items in context_data.items():
+        for item in items or []:
+            if isinstance(item, dict):
+                documents.append((key, item, Counter(tokenize(_item_text(item)))))
+    if not documents:
+        return []
+
+    average_length = sum(sum(terms.values()) for _, _, terms in documents) / len(documents) or 1
+    document_frequency = Counter(term for _, _, terms in documents for term in query_terms if term in terms)
+    idf = {term: math.log(1 + (len(documents) - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    ranked = []
+    for key, item, terms in documents:
+        length = sum(terms.values())
+        score = 0.0
+        for term, term_idf in idf.items():
+            frequency = terms.get(term)
+            if frequency:
+                score += term_idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length))
+        if score > 0:
+            ranked.append((score, key, item))
+    ranked.sort(key=lambda entry: entry[0], reverse=True)
+    return ranked
+
+def fill_with_unranked(ranked, context_data: dict, limit: int = None) -> list[tuple[float, str, dict]]:
+    """
+    Appends the items `ranked` doesn't contain, scored 0, after the ranked ones. They are taken one
+    from each list of `context_data` in turn, in their default order, so every type is represented.
+    BM25 only matches literal terms; the unranked items let the model still judge candidates that are
+    relevant in meaning (synonyms, related fields) when few or no items share a term with the query.
+    Args:
+        ranked (list): Output of rank_context_items.
+        context_data (dict): The lists that were ranked.
+        limit (int, optional): Stop once the result has this many entries.
+    Returns:
+        list[tuple]: (score, type key, item), ranked items first.
+    """
+    filled = list(ranked if limit is None else ranked[:limit])
+    seen = {id(item) for _, _, item in filled}
+    lists = [(key, iter(items or [])) for key, items in context_data.items()]
+    while lists and (limit is None or len(filled) < limit):
+        remaining = []
+        for key, items in lists:
+            for item in items:
+                if isinstance(item, dict) and id(item) not in seen:
+                    filled.append((0.0, key, item))
+                    remaining.append((key, items))
+                    break
+            if limit is not None and len(filled) >= limit:
+                break
+        lists = remaining
+    return filled
+
+def pack_ranked_items(ranked, token_budget: int, top_k: int) -> dict:
+    """
+    Takes items in rank order until `top_k` items or `token_budget` (estimated tokens of their
+    compact JSON) is reached. An item that doesn't fit is skipped so smaller ones can still fill the budget.
+    Returns:
+        dict: Selected items grouped by type key, in rank order.
+    """
+    packed = {}
+    used_tokens = 0
+    selected = 0
+    for _, key, item in ranked:
+        if selected >= top_k:
+            break
+        cost = estimate_tokens(json.dumps(item, separators=(",", ":")))
+        if used_tokens + cost > token_budget:
+            continue
+        packed.setdefault(key, []).append(item)
+        used_tokens += cost
+        selected += 1
+    return packed
@@ -0,0 +1,119 @@
+from app import db
+from models.models import SearchDocument, SEARCHABLE_FIELDS, TRACKED_ENTITY_TYPES
+from sqlalchemy import bindparam, func, insert, literal, select
+import re
+
+# Queries the full-text index maintained in models.models (search_document).
+# SQLite uses FTS5 with BM25 ranking; PostgreSQL uses the GIN-indexed tsvector with ts_rank.
+# Other databases fall back to an unranked LIKE scan.
+
+SEARCHABLE_ENTITY_TYPES = [TRACKED_ENTITY_TYPES[model] for model in SEARCHABLE_FIELDS]
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+_SQLITE_SEARCH_SQL = """
+    SELECT d.entity_type, d.entity_id, d.title,
+           snippet(search_document_fts, 1, '', '', '...', 16) AS snippet,
+           -bm25(search_document_fts, 10.0, 1.0) AS score
+    FROM search_document_fts JOIN search_document d ON d.id = search_document_fts.rowid
+    WHERE search_document_fts MATCH :match AND d.entity_type IN :entity_types
+    ORDER BY bm25(search_document_fts, 10.0, 1.0)
+    LIMIT :limit
+"""
+
+_POSTGRES_SEARCH_SQL = """
+    SELECT d.entity_type, d.entity_id, d.title,
+           ts_headline('english', d.body, q, 'MaxWords=24, MinWords=8') AS snippet,
+           ts_rank(d.tsv, q) AS score
+    FROM search_document d, to_tsquery('english', :match) q
+    WHERE d.tsv @@ q AND d.entity_type IN :entity_types
+    ORDER BY score DESC
+    LIMIT :limit
+"""
+
+
+def _terms(query):
+    return re.findall(r"\w+", query.lower())
+
+def _sqlite_match(terms):
+    # Every term must match; the last one as a prefix so partially typed words still hit.
+    # Terms are quoted so FTS5 operators in user input (AND, NEAR, *, ...) are taken literally.
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def _postgres_match(terms):
+    # \w+ terms contain no tsquery operators, so they can be joined directly
+    return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+
+def search(query: str, entity_types=None, limit: int = DEFAULT_SEARCH_LIMIT) -> list:
+    """
+    Ranked full-text search over researchers, projects, grants and notes.
+    Args:
+        query (str): Free text; all words must match (the last one as a prefix).
+        entity_types (list, optional): Export keys to restrict to (e.g. ["researchers", "notes"]).
+        limit (int): Maximum number of results.
+    Returns:
+        list: Dicts with entity, id, title, snippet and score, best match first.
+    Raises:
+        ValueError: If an entity type is not searchable.
+    """
+    entity_types = list(entity_types or SEARCHABLE_ENTITY_TYPES)
+    unknown = [entity_type for entity_type in entity_types if entity_type not in SEARCHABLE_ENTITY_TYPES]
+    if unknown:
+        raise ValueError(f"Unsupported search type(s): {', '.join(unknown)}. Expected any of: {', '.join(SEARCHABLE_ENTITY_TYPES)}")
+    terms = _terms(query or "")
+    if not terms:
+        return []
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        statement, match = _SQLITE_SEARCH_SQL, _sqlite_match(terms)
+    elif dialect == 'postgresql':
+        statement, match = _POSTGRES_SEARCH_SQL, _postgres_match(terms)
+    else:
+        return _search_like(terms, entity_types, limit)
+
+    rows = db.session.execute(
+        db.text(statement).bindparams(bindparam("entity_types", expanding=True)),
+        {"match": match, "entity_types": entity_types, "limit": limit},
+    )
+    return [
+        {"entity": row.entity_type, "id": row.entity_id, "title": row.title,
+         "snippet": row.snippet, "score": round(float(row.score), 4)}
+        for row in rows
+    ]
+
+def _search_like(terms, entity_types, limit):
+    text = SearchDocument.title + " " + SearchDocument.body
+    documents = SearchDocument.query.filter(SearchDocument.entity_type.in_(entity_types))
+    for term in terms:
+        documents = documents.filter(text.ilike(f"%{term}%"))
+    return [
+        {"entity": d.entity_type, "id": d.entity_id, "title": d.title, "snippet": d.body[:160], "score": 0.0}
+        for d in documents.order_by(SearchDocument.id).limit(limit)
+    ]
+
+def _document_select(model):
+    """INSERT ... SELECT source producing search_document rows straight from the model's table."""
+    title_attr, body_attrs = SEARCHABLE_FIELDS[model]
+    title = func.coalesce(getattr(model, title_attr), '') if title_attr else literal('')
+    body = None
+    for attr in body_attrs:
+        part = func.coalesce(getattr(model, attr), '')
+        body = part if body is None else body.op('||')(' ').op('||')(part)
+    return select(literal(TRACKED_ENTITY_TYPES[model]), model.id, title, func.trim(body))
+
+def rebuild_search_index() -> int:
+    """
+    Rebuilds the whole index with one INSERT ... SELECT per entity type.
+    Used after writes that bypass the ORM flush listener (e.g. the bulk import).
+    The caller commits.
+    Returns:
+        int: Number of indexed documents.
+    """
+    SearchDocument.query.delete(synchronize_session=False)
+    columns = ["entity_type", "entity_id", "title", "body"]
+    for model in SEARCHABLE_FIELDS:
+        db.session.execute(insert(SearchDocument).from_select(columns, _document_select(model)))
+    return db.session.query(func.count(SearchDocument.id)).scalar()
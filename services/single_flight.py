@@ -0,0 +1,58 @@
+import threading
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+# Request coalescing: while a call for a key is in flight, further callers with the same key
+# wait on that call's future instead of starting their own. Nothing is kept once it finishes;
+# results that should outlive the call belong in the response cache.
+
+
+class _Call:
+    def __init__(self, future):
+        self.future = future
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Thread-safe; one instance is shared by every caller in the process."""
+    def __init__(self):
+        self.coalesced = 0 # Callers that joined a call already in flight
+        self._calls = {}
+        self._lock = threading.RLock() # Re-entrant: a done callback can fire inside join()
+
+    def join(self, key, start):
+        """
+        Returns the in-flight call for `key`, starting it with start() (which must return a
+        concurrent.futures.Future) if there is none. Pass the returned call to wait().
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call(start())
+                self._calls[key] = call
+                call.future.add_done_callback(lambda _, key=key, call=call: self._forget(key, call))
+            else:
+                self.coalesced += 1
+            call.waiters += 1
+            return call
+
+    def wait(self, call, timeout):
+        """
+        Waits up to `timeout` seconds for the call's result; exceptions from the call propagate.
+        A caller that times out stops waiting; the call is cancelled only if nobody else is waiting.
+        """
+        try:
+            return call.future.result(timeout=timeout)
+        except FuturesTimeoutError:
+            with self._lock:
+                call.waiters -= 1
+                if call.waiters == 0:
+                    call.future.cancel()
+            raise
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def _forget(self, key, call):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
@@ -0,0 +1,131 @@
+import json
+import re
+
+# Structured (JSON) answers from the model, parsed and validated in one place.
+# The model is asked for JSON (and, where the SDK supports it, called in JSON response mode),
+# but replies may still arrive wrapped in a ```json fence or behind a sentence of prose.
+# extract_json() finds the first JSON value in one pass and ignores whatever surrounds it;
+# the declared schemas below then check the shape the calling function relies on.
+
+# Longest piece of a malformed reply that is sent back to the model for repair
+REPAIR_MAX_CHARS = 8000
+
+_decoder = json.JSONDecoder()
+# Start of the first JSON object or array, optionally preceded by a markdown fence
+_JSON_START = re.compile(r"```(?:json)?\s*([\[{])|([\[{])", re.IGNORECASE)
+
+
+class StructuredOutputError(ValueError):
+    """The reply contains no JSON value, or one that doesn't match the declared schema."""
+    def __init__(self, message, text=""):
+        super().__init__(message)
+        self.text = text
+
+
+def extract_json(text: str):
+    """
+    Returns the first JSON object or array in `text`, skipping a leading fence or prose and
+    ignoring anything after the value (closing fence, trailing remarks).
+    Raises StructuredOutputError if there is none.
+    """
+    text = (text or "").strip()
+    position = 0
+    while True:
+        match = _JSON_START.search(text, position)
+        if match is None:
+            raise StructuredOutputError("No JSON object or array found in the response.", text)
+        start = match.start(1) if match.group(1) else match.start(2)
+        try:
+            value, _ = _decoder.raw_decode(text, start)
+            return value
+        except json.JSONDecodeError as e:
+            if match.group(1) or start == 0 or _JSON_START.search(text, start + 1) is None:
+                # The answer itself is broken (fenced, or the whole reply); a bracket inside it isn't the answer
+                raise StructuredOutputError(f"Invalid JSON: {e}", text)
+        position = start + 1 # A bracket in the leading prose; try the next one
+
+
+# --- Schemas ---
+class ObjectSchema:
+    """
+    A JSON object. `required` maps keys to the Python type their value must have (object for any);
+    a missing key or wrong type fails validation. Keys in `expected` are only logged when missing.
+    """
+    def __init__(self, name, required=None, expected=()):
+        self.name = name
+        self.required = required or {}
+        self.expected = tuple(expected)
+
+    def validate(self, value, text=""):
+        if not isinstance(value, dict):
+            raise StructuredOutputError(f"Expected a JSON object for {self.name}, got {type(value).__name__}.", text)
+        missing = [key for key in self.required if key not in value]
+        if missing:
+            raise StructuredOutputError(f"{self.name} is missing required keys: {', '.join(missing)}.", text)
+        for key, expected_type in self.required.items():
+            if not isinstance(value[key], expected_type):
+                raise StructuredOutputError(f"{self.name} '{key}' should be {_type_name(expected_type)}, got {type(value[key]).__name__}.", text)
+        missing = [key for key in self.expected if key not in value]
+        if missing:
+            print(f"Warning: {self.name} missing some expected keys ({', '.join(missing)}): {value}")
+        return value
+
+    def describe(self) -> str:
+        keys = [f'"{key}" ({_type_name(expected_type)})' for key, expected_type in self.required.items()]
+        keys += [f'"{key}"' for key in self.expected if key not in self.required]
+        return f"a JSON object with the keys {', '.join(keys)}"
+
+
+class ArraySchema:
+    """
+    A JSON array of `items`. Items that fail validation are skipped with a warning,
+    so one bad entry doesn't cost the whole answer.
+    """
+    def __init__(self, name, items):
+        self.name = name
+        self.items = items
+
+    def validate(self, value, text=""):
+        if not isinstance(value, list):
+            raise StructuredOutputError(f"Expected a JSON array for {self.name}, got {type(value).__name__}.", text)
+        validated = []
+        for item in value:
+            try:
+                validated.append(self.items.validate(item, text))
+            except StructuredOutputError as e:
+                print(f"Warning: Skipping invalid {self.items.name}: {e} Item: {item}")
+        return validated
+
+    def describe(self) -> str:
+        return f"a JSON array (possibly empty) where each element is {self.items.describe()}"
+
+
+def _type_name(expected_type) -> str:
+    return {str: "string", list: "array", dict: "object", int: "integer", float: "number"}.get(expected_type, "any")
+
+
+def parse_structured_output(text: str, schema):
+    """
+    Extracts the JSON value from a model reply and validates it against `schema`.
+    Returns:
+        The validated value (for arrays, only the valid items).
+    Raises StructuredOutputError if no valid JSON is found or its shape doesn't match.
+    """
+    return schema.validate(extract_json(text), text)
+
+
+def build_repair_prompt(text: str, error: StructuredOutputError, schema) -> str:
+    """
+    A short follow-up prompt that asks the model to fix its own malformed reply. It carries only
+    the broken output and the error, not the original context, so it is much cheaper than a retry.
+    """
+    if len(text) > REPAIR_MAX_CHARS:
+        text = text[:REPAIR_MAX_CHARS] + "..."
+    return f"""The following response was supposed to be {schema.describe()}, but it could not be used: {error}
+
+Response:
+---
+{text}
+---
+
+Return only the corrected JSON, keeping the original content. Do not add any explanation or markdown."""
@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import create_app, db
+from models.models import Researcher
+from services import context_snapshot
+
+
+@pytest.fixture
+def flask_app(tmp_path, monkeypatch):
+    """An app on a file database, with an empty snapshot cache of its own."""
+    monkeypatch.setattr(context_snapshot, "CONTEXT_SNAPSHOT_DIR", str(tmp_path / "snapshot"))
+    monkeypatch.setattr(context_snapshot, "_snapshot", {"version": None, "context": None, "built_at": 0.0})
+    flask_app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'app.db'}", "BLUEPRINTS": "api"})
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+
+
+def researcher_names():
+    return [r["name"] for r in context_snapshot.get_search_context()["researchers"]]
+
+
+def test_orm_commit_changes_version_and_context(flask_app):
+    assert researcher_names() == []
+    version = context_snapshot.current_version()
+
+    db.session.add(Researcher(name="Ada", email="ada@example.edu", department="Physics"))
+    db.session.commit()
+
+    assert context_snapshot.current_version() != version
+    assert researcher_names() == ["Ada"]
+
+
+def test_read_only_commit_keeps_version(flask_app):
+    version = context_snapshot.current_version()
+    Researcher.query.all()
+    db.session.commit()
+    assert context_snapshot.current_version() == version
+
+
+def test_write_from_another_instance_invalidates_snapshot(flask_app):
+    assert researcher_names() == []
+
+    # Another instance commits a researcher and then records a new data version, through its own connection
+    other = create_engine(flask_app.config["SQLALCHEMY_DATABASE_URI"])
+    with other.begin() as conn:
+        conn.execute(text("INSERT INTO researcher (name, email, department) VALUES ('Grace', 'grace@example.edu', 'Physics')"))
+    with other.begin() as conn:
+        conn.execute(text("INSERT INTO data_version DEFAULT VALUES"))
+    other.dispose()
+    db.session.commit() # End the read transaction, as the end of a request does
+
+    assert researcher_names() == ["Grace"]
+
+
+def test_snapshot_older_than_max_age_is_rebuilt(flask_app, monkeypatch):
+    assert researcher_names() == []
+
+    # A write made outside the app leaves the version unchanged
+    other = create_engine(flask_app.config["SQLALCHEMY_DATABASE_URI"])
+    with other.begin() as conn:
+        conn.execute(text("INSERT INTO researcher (name, email, department) VALUES ('Grace', 'grace@example.edu', 'Physics')"))
+    other.dispose()
+    db.session.commit()
+    assert researcher_names() == []
+
+    monkeypatch.setattr(context_snapshot, "CONTEXT_SNAPSHOT_MAX_AGE", 0.000001)
+    assert researcher_names() == ["Grace"]
@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app, db
+from benchmarks.fixtures import seed_database
+
+
+@contextmanager
+def count_statements(engine):
+    """Collects the SQL statements `engine` executes inside the block."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def export_statement_count(researchers, query_string=""):
+    """Statements issued by GET /api/data/export on a fresh database seeded with `researchers` researchers (and grants)."""
+    flask_app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "BLUEPRINTS": "export"})
+    with flask_app.app_context():
+        db.create_all()
+        seed_database(researchers)
+        engine = db.engine
+    client = flask_app.test_client()
+    with count_statements(engine) as statements:
+        response = client.get("/api/data/export" + query_string)
+        body = response.get_data()
+    assert response.status_code == 200
+    assert body
+    return len(statements)
+
+
+@pytest.mark.parametrize("query_string", ["", "?format=ndjson"])
+def test_export_statement_count_does_not_grow_with_rows(query_string):
+    # 10x the grants (and researchers, projects, notes, co-PIs); below EXPORT_BATCH_SIZE so NDJSON reads one batch each
+    small = export_statement_count(20, query_string)
+    large = export_statement_count(200, query_string)
+    assert small == large
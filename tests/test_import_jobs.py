@@ -0,0 +1,64 @@
+import io
+import json
+import time
+
+import pytest
+from sqlalchemy import update
+
+from app import create_app, db
+from models.models import ImportJob
+from services import import_jobs
+
+EMPTY_PAYLOAD = json.dumps({"researchers": [], "labs": [], "projects": [], "computeResources": [], "grants": []}).encode()
+
+
+@pytest.fixture
+def flask_app(tmp_path, monkeypatch):
+    """An app on a file database with short stale/heartbeat intervals and a slow import step."""
+    monkeypatch.setattr(import_jobs, "IMPORT_JOB_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(import_jobs, "IMPORT_JOB_STALE_SECONDS", 0.5)
+    monkeypatch.setattr(import_jobs, "HEARTBEAT_INTERVAL", 0.1)
+    monkeypatch.setattr(import_jobs, "_maintenance_done", True)
+
+    def slow_import(data, progress=None):
+        time.sleep(1.5) # Longer than IMPORT_JOB_STALE_SECONDS, without progress callbacks
+        return {}
+    monkeypatch.setattr(import_jobs, "import_application_data", slow_import)
+
+    flask_app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'app.db'}", "BLUEPRINTS": "export"})
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+
+
+def wait_until_finished(job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = import_jobs.get_import_job(job_id)
+        if status["status"] not in ("queued", "running"):
+            return status
+        time.sleep(0.1)
+    raise AssertionError(f"Import job {job_id} did not finish")
+
+
+def test_heartbeat_keeps_slow_job_alive(flask_app):
+    job_id = import_jobs.submit_import_job(io.BytesIO(EMPTY_PAYLOAD), flask_app)
+
+    time.sleep(1.0) # Past IMPORT_JOB_STALE_SECONDS, while the import is still running
+    assert import_jobs.get_import_job(job_id)["status"] == "running"
+    assert wait_until_finished(job_id)["status"] == "succeeded"
+
+
+def test_failed_job_is_not_resurrected(flask_app):
+    job_id = import_jobs.submit_import_job(io.BytesIO(EMPTY_PAYLOAD), flask_app)
+
+    time.sleep(0.5)
+    with db.engine.begin() as conn: # As a status poll does for a stale job
+        conn.execute(update(ImportJob.__table__).where(ImportJob.__table__.c.id == job_id)
+                     .values(status="failed", error=import_jobs.INTERRUPTED_ERROR))
+
+    import_jobs._executor.submit(lambda: None).result() # The single worker thread has finished the job
+    status = import_jobs.get_import_job(job_id)
+    assert status["status"] == "failed"
+    assert status["error"] == import_jobs.INTERRUPTED_ERROR
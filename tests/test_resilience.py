@@ -0,0 +1,76 @@
+import pytest
+
+from services import gemini_service
+from services.resilience import CircuitBreaker, CircuitOpenError, TokenBucket
+
+
+class UpstreamError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure(UpstreamError(503))
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_late_client_error_keeps_breaker_open():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    open_breaker(breaker)
+
+    breaker.record_failure(UpstreamError(400)) # A call admitted before the breaker opened
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_client_error_ends_failure_streak_while_closed():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.before_call()
+    breaker.record_failure(UpstreamError(503))
+    breaker.before_call()
+    breaker.record_failure(UpstreamError(400))
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.consecutive_failures == 0
+
+
+def test_client_error_frees_half_open_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    open_breaker(breaker)
+    breaker.before_call() # The trial call
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record_failure(UpstreamError(400))
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call() # Another trial is admitted
+
+
+def test_open_breaker_rejects_before_rate_limiter(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    limiter = TokenBucket(rate=1, burst=1)
+    monkeypatch.setattr(gemini_service, "circuit_breaker", breaker)
+    monkeypatch.setattr(gemini_service, "rate_limiter", limiter)
+    open_breaker(breaker)
+
+    for _ in range(3):
+        with pytest.raises(gemini_service.GeminiUnavailableError):
+            gemini_service._admit_call(timeout=5)
+    assert limiter.throttled == 0 and limiter.rejected == 0
+    assert breaker.rejected == 3
+
+
+def test_rate_limited_trial_is_released(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    limiter = TokenBucket(rate=0.001, burst=1)
+    monkeypatch.setattr(gemini_service, "circuit_breaker", breaker)
+    monkeypatch.setattr(gemini_service, "rate_limiter", limiter)
+    limiter.acquire(max_wait=0) # Uses up the only token
+    open_breaker(breaker)
+
+    with pytest.raises(gemini_service.GeminiUnavailableError):
+        gemini_service._admit_call(timeout=0.1) # Admitted as the trial, then rate limited
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call() # The trial slot is free again